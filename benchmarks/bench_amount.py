@@ -0,0 +1,105 @@
+"""
+Microbenchmark and golden check for ReceiptParser.extract_total_amount.
+
+Runs the current single-scan extractor and the original 15-pattern loop over
+the same corpus, fails if any result differs, and prints per-message cost.
+
+Usage:
+    python -m benchmarks.bench_amount --messages 2000 --padding-kb 50
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from src.parser.receipt_parser import ReceiptParser
+
+
+LEGACY_PATTERNS = [
+    r'total\s*:?\s*Rp\s*([\d.,]+)', r'Total\s*:?\s*Rp\s*([\d.,]+)', r'TOTAL\s*:?\s*Rp\s*([\d.,]+)',
+    r'total\s+paid\s*:?\s*Rp\s*([\d.,]+)', r'Total\s+Paid\s*:?\s*Rp\s*([\d.,]+)',
+    r'TOTAL\s+PAID\s*:?\s*Rp\s*([\d.,]+)', r'Rp\s*([\d.,]+)\s*\(?total\)?',
+    r'amount\s*:?\s*Rp\s*([\d.,]+)', r'Amount\s*:?\s*Rp\s*([\d.,]+)',
+    r'total\s*:?\s*([\d.,]+)', r'Total\s*:?\s*([\d.,]+)', r'TOTAL\s*:?\s*([\d.,]+)',
+    r'Rp\s*([\d.,]+)', r'IDR\s*([\d.,]+)', r'Rupiah\s*([\d.,]+)',
+]
+
+
+def legacy_extract_total_amount(text):
+    """The original pattern loop, kept verbatim as the golden reference."""
+    if not text:
+        return None
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            amount_str = match.group(1)
+            if '.' in amount_str and ',' in amount_str:
+                amount_str = amount_str.replace('.', '').replace(',', '.')
+            elif '.' in amount_str and ',' not in amount_str:
+                parts = amount_str.split('.')
+                if len(parts) > 1 and len(parts[-1]) <= 2:
+                    amount_str = amount_str.replace(',', '')
+                else:
+                    amount_str = amount_str.replace('.', '').replace(',', '.')
+            else:
+                amount_str = amount_str.replace(',', '')
+            try:
+                return float(amount_str)
+            except ValueError:
+                continue
+    return None
+
+
+FRAGMENTS = [
+    'Total', 'TOTAL', 'total paid', 'Total Paid:', 'Subtotal', 'Amount', 'amount:', 'Rp', 'rp',
+    'IDR', 'Rupiah', 'IDRp', 'amountotal', '(total)', ':', ' ', '  ', '\n', '<td>', '</td>',
+    '12.500', '1.250.000,00', '99,5', '7.5', '.', ',', '3', 'Diskon', 'Saldo', 'voucher', '&nbsp;',
+]
+
+
+def fuzz_text(rng, length):
+    return ''.join(rng.choice(FRAGMENTS) + rng.choice(['', ' ', '']) for _ in range(length))
+
+
+def receipt_text(rng, padding_kb):
+    amount = f"{rng.randint(1000, 5000000):,}".replace(',', '.')
+    filler = '<tr><td style="padding:4px">Produk &amp; layanan</td><td>1x</td></tr>' * (padding_kb * 16)
+    label = rng.choice(['Total Pembayaran', 'Total Paid', 'Amount', 'Nominal', 'Total'])
+    return f"<html><body><table>{filler}<tr><td>{label}</td><td>Rp {amount}</td></tr></table></body></html>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--padding-kb', type=int, default=50, help='HTML size per receipt')
+    parser.add_argument('--fuzz', type=int, default=20000, help='Random fragments for the golden check')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    golden = [fuzz_text(rng, rng.randint(1, 12)) for _ in range(args.fuzz)]
+    corpus = [receipt_text(rng, args.padding_kb) for _ in range(args.messages)]
+
+    receipt_parser = ReceiptParser()
+    mismatches = [
+        text for text in golden + corpus
+        if receipt_parser.extract_total_amount(text) != legacy_extract_total_amount(text)
+    ]
+    if mismatches:
+        print(f"❌ {len(mismatches)} results differ from the legacy extractor, e.g. {mismatches[0]!r}")
+        sys.exit(1)
+    print(f"✅ Identical results on {len(golden) + len(corpus)} texts")
+
+    for name, extract in (('legacy', legacy_extract_total_amount),
+                          ('single-scan', receipt_parser.extract_total_amount)):
+        started = time.perf_counter()
+        for text in corpus:
+            extract(text)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>12}: {elapsed / len(corpus) * 1e6:8.1f} µs/message")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare blocking imaplib fetches with the pipelined asyncio client.
+
+Both runs go through EmailFilter (SELECT, UID SEARCH, header FETCH) and
+process_emails_batch against the asyncio fake server, whose latency models
+a network round trip: pipelined commands overlap instead of queueing.
+
+Usage:
+    python -m benchmarks.bench_async --emails 1000 --latency 0.02 --depths 1,4,8
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.bench_fetch import make_receipt
+from benchmarks.fake_imap_async import AsyncFakeIMAPServer
+from main import process_emails_batch
+from src.config.email_filters import EMAIL_FILTERS
+from src.email.connector import EmailConnector
+from src.email.fetcher import BatchFetcher, PipelinedFetcher
+from src.email.filter import EmailFilter
+from src.email.parser import EmailParser
+from src.parser.receipt_parser import ReceiptParser
+
+
+def run(server, client, batch_size, depth=None):
+    connector = EmailConnector('127.0.0.1', server.port, use_ssl=False, client=client)
+    config = dict(EMAIL_FILTERS, date_range_days=30, sender_search_mode='or')
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.connect('bench@example.com', 'secret')
+        mail = connector.get_connection()
+        server.command_counts.clear()
+
+        started = time.perf_counter()
+        email_filter = EmailFilter(config)
+        email_ids = email_filter.get_filtered_emails(mail, max_emails=len(server.mailbox.messages))
+        if depth is None:
+            fetcher = BatchFetcher(batch_size, use_uid=email_filter.use_uid)
+        else:
+            fetcher = PipelinedFetcher(batch_size, use_uid=email_filter.use_uid, depth=depth)
+        records = process_emails_batch(
+            mail, email_ids, EmailParser(), ReceiptParser(),
+            headers=email_filter.headers, fetcher=fetcher
+        )
+        elapsed = time.perf_counter() - started
+
+        connector.disconnect()
+    return elapsed, records, sum(server.command_counts.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='Round-trip seconds per command')
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--depths', default='1,4,8', help='FETCH commands in flight for the asyncio client')
+    args = parser.parse_args()
+
+    messages = [make_receipt(i) for i in range(args.emails)]
+
+    with AsyncFakeIMAPServer(messages, latency=args.latency) as server:
+        print(f"{'client':>14} {'seconds':>9} {'records':>8} {'commands':>9} {'msg/s':>8} {'speedup':>8}")
+        elapsed, baseline_records, commands = run(server, 'imaplib', args.batch_size)
+        baseline = elapsed
+        print(f"{'imaplib':>14} {elapsed:>9.3f} {len(baseline_records):>8} {commands:>9} "
+              f"{len(baseline_records) / elapsed:>8.0f} {1.0:>7.1f}x")
+
+        mismatches = 0
+        for depth in (int(depth) for depth in args.depths.split(',')):
+            elapsed, records, commands = run(server, 'asyncio', args.batch_size, depth)
+            label = f'asyncio d={depth}'
+            print(f"{label:>14} {elapsed:>9.3f} {len(records):>8} {commands:>9} "
+                  f"{len(records) / elapsed:>8.0f} {baseline / elapsed:>7.1f}x")
+            if records != baseline_records:
+                mismatches += 1
+
+    if mismatches:
+        print(f"❌ {mismatches} asyncio runs produced different records")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the original regex HTML cleaner with the single-pass html_to_text.
+
+Runs both over generated ShopeePay/GoPay/Tokopedia-style receipts and reports
+throughput and tracemalloc peak per message. The corpus is synthetic; the
+layouts mimic those providers (inline CSS, tracking scripts, nested tables).
+
+Usage:
+    python -m benchmarks.bench_clean --messages 200 --padding-kb 300
+"""
+
+import argparse
+import html
+import random
+import re
+import time
+import tracemalloc
+
+from src.email.parser import html_to_text
+
+
+def legacy_clean(body_content):
+    """The original clean_raw_message body, kept as the baseline."""
+    cleaned_text = html.unescape(body_content)
+    cleaned_text = re.sub(r'<[^>]+>', '', cleaned_text)
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
+    cleaned_text = re.sub(r'\n\s*\n', '\n', cleaned_text)
+    return cleaned_text.strip()
+
+
+STYLE = '<style type="text/css">' + ''.join(
+    f'.c{i} {{ font-family: Helvetica, Arial; padding: {i % 9}px; color: #{i:06x}; }}\n' for i in range(300)
+) + '</style>'
+
+SCRIPT = '<script>window.dataLayer = window.dataLayer || []; function t(e) { return e && e.id < 3; }</script>'
+
+LAYOUTS = {
+    'ShopeePay': ('noreply@shopee.co.id', 'Total Pembayaran', 'Kopi Kenangan &amp; Co.'),
+    'GoPay': ('no-reply@gojek.com', 'Total Bayar', 'GoFood &#8211; Warung Makan'),
+    'Tokopedia': ('noreply@tokopedia.com', 'Total Tagihan', 'Toko Elektronik&nbsp;Jaya'),
+}
+
+
+def make_receipt_html(rng, provider, padding_kb):
+    """Build one receipt body of roughly `padding_kb` KB."""
+    _, total_label, merchant = LAYOUTS[provider]
+    amount = f"{rng.randint(1000, 5000000):,}".replace(',', '.')
+    row = (
+        '<tr><td class="c{0}" style="padding:4px 8px;border-bottom:1px solid #eee">'
+        '<span style="font-weight:600">Produk #{0}</span>&nbsp;&middot;&nbsp;1x</td>'
+        '<td align="right" style="white-space:nowrap">Rp&nbsp;{0}.000</td></tr>\n'
+    )
+    rows = []
+    size = 0
+    index = 0
+    while size < padding_kb * 1024:
+        rows.append(row.format(index % 300))
+        size += len(rows[-1])
+        index += 1
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8">{STYLE}{SCRIPT}</head>'
+        f'<body><!-- {provider} receipt --><table width="100%"><tr><td><h1>{provider}</h1>'
+        f'<p>Merchant: {merchant}</p></td></tr>{"".join(rows)}'
+        f'<tr><td><b>{total_label}</b></td><td>Rp {amount}</td></tr></table></body></html>'
+    )
+
+
+def measure(clean, corpus):
+    """Return (seconds, average tracemalloc peak in bytes) for cleaning the corpus."""
+    started = time.perf_counter()
+    for body in corpus:
+        clean(body)
+    elapsed = time.perf_counter() - started
+
+    peaks = []
+    for body in corpus[:20]:
+        tracemalloc.start()
+        clean(body)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return elapsed, sum(peaks) / len(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--padding-kb', type=int, default=300, help='HTML size per receipt')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    providers = sorted(LAYOUTS)
+    corpus = [make_receipt_html(rng, providers[i % len(providers)], args.padding_kb) for i in range(args.messages)]
+    total_mb = sum(len(body) for body in corpus) / 1024 / 1024
+
+    print(f"{args.messages} messages, {total_mb:.1f} MB of HTML")
+    print(f"{'cleaner':>12} {'seconds':>9} {'MB/s':>8} {'peak KB/msg':>12}")
+    results = {}
+    for name, clean in (('regex', legacy_clean), ('single-pass', html_to_text)):
+        elapsed, peak = measure(clean, corpus)
+        results[name] = elapsed
+        print(f"{name:>12} {elapsed:>9.3f} {total_mb / elapsed:>8.1f} {peak / 1024:>12.0f}")
+    print(f"speedup: {results['regex'] / results['single-pass']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
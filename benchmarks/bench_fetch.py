@@ -0,0 +1,77 @@
+"""
+Compare one-FETCH-per-email against batched sequence-set FETCH.
+
+Usage:
+    python -m benchmarks.bench_fetch --emails 1000 --latency 0.005
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta
+
+from benchmarks.fake_imap import FakeIMAPServer
+from main import process_emails_batch
+from src.email.connector import EmailConnector
+from src.email.parser import EmailParser
+from src.parser.receipt_parser import ReceiptParser
+
+
+def make_receipt(index, padding_kb=0):
+    """Build an HTML e-wallet receipt, optionally padded with `padding_kb` KB of markup."""
+    message = EmailMessage()
+    message['From'] = 'ShopeePay <noreply@shopee.co.id>'
+    message['To'] = 'user@example.com'
+    message['Subject'] = f'Bukti Pembayaran ShopeePay #{index}'
+    message['Date'] = format_datetime(datetime.now().astimezone() - timedelta(minutes=index))
+    message['Message-ID'] = f'<receipt-{index}@shopee.co.id>'
+    message.set_content(f'Total Pembayaran Rp {10000 + index * 7:,}'.replace(',', '.'))
+    padding = '<tr><td style="padding:4px">Produk &amp; layanan</td><td>1x</td></tr>' * (padding_kb * 16)
+    message.add_alternative(
+        f'<html><body><table>{padding}<tr><td>Total</td>'
+        f'<td>Rp {10000 + index * 7:,}</td></tr></table></body></html>'.replace(',', '.'),
+        subtype='html',
+    )
+    return message.as_bytes().replace(b'\n', b'\r\n')
+
+
+def run(server, email_ids, batch_size):
+    connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.connect('bench@example.com', 'secret')
+        mail = connector.get_connection()
+        mail.select('INBOX')
+        server.command_counts.clear()
+
+        started = time.perf_counter()
+        records = process_emails_batch(mail, email_ids, EmailParser(), ReceiptParser(), batch_size)
+        elapsed = time.perf_counter() - started
+
+        connector.disconnect()
+    return elapsed, len(records), sum(server.command_counts.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added per command')
+    parser.add_argument('--batch-sizes', default='1,10,50,200')
+    args = parser.parse_args()
+
+    messages = [make_receipt(i) for i in range(args.emails)]
+    email_ids = [str(i).encode() for i in range(1, args.emails + 1)]
+
+    with FakeIMAPServer(messages, latency=args.latency) as server:
+        baseline = None
+        print(f"{'batch':>6} {'seconds':>9} {'records':>8} {'commands':>9} {'speedup':>8}")
+        for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+            elapsed, count, commands = run(server, email_ids, batch_size)
+            baseline = baseline or elapsed
+            print(f"{batch_size:>6} {elapsed:>9.3f} {count:>8} {commands:>9} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare full RFC822 fetches with BODYSTRUCTURE + text-part-only fetches.
+
+Receipts carry an inline logo and a PDF invoice; the partial mode should
+move far fewer bytes and still produce identical records.
+
+Usage:
+    python -m benchmarks.bench_partial --emails 200 --attachment-kb 2000 --latency 0.005
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime
+
+from benchmarks.fake_imap import FakeIMAPServer
+from main import process_emails_batch
+from src.email.connector import EmailConnector
+from src.email.fetcher import BatchFetcher
+from src.email.parser import EmailParser
+from src.parser.receipt_parser import ReceiptParser
+
+
+def make_receipt_with_attachments(index, attachment_kb):
+    """Build a receipt whose layout rotates through common MIME shapes."""
+    amount = f'{10000 + index * 7:,}'.replace(',', '.')
+    message = EmailMessage()
+    message['From'] = 'Tokopedia <noreply@tokopedia.com>'
+    message['To'] = 'user@example.com'
+    message['Subject'] = f'Invoice Tokopedia #{index}'
+    message['Date'] = format_datetime(datetime.now().astimezone() - timedelta(minutes=index))
+    message['Message-ID'] = f'<invoice-{index}@tokopedia.com>'
+
+    layout = index % 4
+    if layout == 3:
+        # Plain single-part message
+        message.set_content(f'Total Tagihan Rp {amount}\nTerima kasih sudah belanja.')
+        return message.as_bytes().replace(b'\n', b'\r\n')
+
+    if layout != 2:
+        message.set_content(f'Total Tagihan Rp {amount}', charset='utf-8', cte='quoted-printable')
+    html = f'<html><body><img src="cid:logo"><p>Total Tagihan</p><p>Rp&nbsp;{amount}</p></body></html>'
+    if layout == 2:
+        # HTML only, base64 encoded
+        message.set_content(html, subtype='html', cte='base64')
+    else:
+        message.add_alternative(html, subtype='html')
+    message.add_attachment(os.urandom(2048), maintype='image', subtype='png', filename='logo.png')
+    message.add_attachment(
+        os.urandom(attachment_kb * 1024), maintype='application', subtype='pdf', filename=f'invoice-{index}.pdf'
+    )
+    if layout == 1:
+        # Forwarded copy of the original notification as message/rfc822
+        forwarded = EmailMessage()
+        forwarded['Subject'] = 'Fwd'
+        forwarded.set_content(f'Forwarded: Total Rp {amount}')
+        message.add_attachment(forwarded)
+    return message.as_bytes().replace(b'\n', b'\r\n')
+
+
+def run(server, email_ids, text_only):
+    connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.connect('bench@example.com', 'secret')
+        mail = connector.get_connection()
+        mail.select('INBOX')
+        server.command_counts.clear()
+        bytes_before = server.bytes_sent
+
+        started = time.perf_counter()
+        fetcher = BatchFetcher(50, text_only=text_only)
+        records = process_emails_batch(mail, email_ids, EmailParser(), ReceiptParser(), fetcher=fetcher)
+        elapsed = time.perf_counter() - started
+
+        connector.disconnect()
+    return elapsed, records, sum(server.command_counts.values()), server.bytes_sent - bytes_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=200)
+    parser.add_argument('--attachment-kb', type=int, default=2000, help='PDF invoice size per email')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added per command')
+    args = parser.parse_args()
+
+    messages = [make_receipt_with_attachments(i, args.attachment_kb) for i in range(args.emails)]
+    email_ids = [str(i).encode() for i in range(1, args.emails + 1)]
+
+    with FakeIMAPServer(messages, latency=args.latency) as server:
+        print(f"{'mode':>8} {'seconds':>9} {'MB sent':>9} {'commands':>9} {'records':>8}")
+        results = {}
+        for mode, text_only in (('full', False), ('partial', True)):
+            elapsed, records, commands, sent = run(server, email_ids, text_only)
+            results[mode] = (sent, records)
+            print(f"{mode:>8} {elapsed:>9.3f} {sent / 1024 / 1024:>9.2f} {commands:>9} {len(records):>8}")
+
+    full_sent, full_records = results['full']
+    partial_sent, partial_records = results['partial']
+    fields = ('email_id', 'subject', 'from', 'date', 'raw', 'total_amount')
+    mismatches = sum(
+        1 for full, partial in zip(full_records, partial_records)
+        if any(full[field] != partial[field] for field in fields)
+    )
+    print(f"bytes reduction: {full_sent / partial_sent:.0f}x, mismatched records: {mismatches}")
+    if mismatches or len(full_records) != len(partial_records):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare inline parsing against the process-pool parsing pipeline.
+
+Usage:
+    python -m benchmarks.bench_pipeline --emails 500 --padding-kb 200 --workers 0,2,4
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.bench_fetch import make_receipt
+from benchmarks.fake_imap import FakeIMAPServer
+from main import process_emails_batch
+from src.email.connector import EmailConnector
+from src.email.fetcher import BatchFetcher
+from src.email.parser import EmailParser
+from src.parser.pipeline import ParsePipeline
+from src.parser.receipt_parser import ReceiptParser
+
+
+def run(server, email_ids, workers, batch_size, queue_size):
+    connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.connect('bench@example.com', 'secret')
+        mail = connector.get_connection()
+        mail.select('INBOX')
+
+        pipeline = ParsePipeline(workers, queue_size) if workers else None
+        started = time.perf_counter()
+        records = process_emails_batch(
+            mail, email_ids, EmailParser(), ReceiptParser(),
+            fetcher=BatchFetcher(batch_size, use_uid=True), pipeline=pipeline
+        )
+        elapsed = time.perf_counter() - started
+
+        connector.disconnect()
+    return elapsed, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--padding-kb', type=int, default=200, help='HTML size per receipt')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added per command')
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--queue-size', type=int, default=200)
+    parser.add_argument('--workers', default='0,2,4')
+    args = parser.parse_args()
+
+    messages = [make_receipt(i, args.padding_kb) for i in range(args.emails)]
+    email_ids = [str(i).encode() for i in range(1, args.emails + 1)]
+
+    with FakeIMAPServer(messages, latency=args.latency) as server:
+        baseline = expected = None
+        print(f"{'workers':>8} {'seconds':>9} {'records':>8} {'speedup':>8}")
+        for workers in (int(count) for count in args.workers.split(',')):
+            elapsed, records = run(server, email_ids, workers, args.batch_size, args.queue_size)
+            amounts = [(record['email_id'], record['total_amount']) for record in records]
+            expected = expected or amounts
+            baseline = baseline or elapsed
+            note = '' if amounts == expected else '  (results differ!)'
+            print(f"{workers or 'inline':>8} {elapsed:>9.3f} {len(records):>8} {baseline / elapsed:>7.1f}x{note}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare body fetching over one connection against a connection pool.
+
+Usage:
+    python -m benchmarks.bench_pool --emails 1000 --latency 0.02 --pool-sizes 1,2,4,8
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.bench_fetch import make_receipt
+from benchmarks.fake_imap import FakeIMAPServer
+from main import process_emails_batch
+from src.email.connector import EmailConnector
+from src.email.fetcher import BatchFetcher
+from src.email.parser import EmailParser
+from src.parser.receipt_parser import ReceiptParser
+
+
+def run(server, email_ids, pool_size, batch_size):
+    connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.connect('bench@example.com', 'secret')
+        mail = connector.get_connection()
+        mail.select('INBOX')
+
+        started = time.perf_counter()
+        pool = None
+        if pool_size > 1:
+            pool = connector.open_pool(pool_size, 'INBOX', batch_size)
+            fetcher = pool
+        else:
+            fetcher = BatchFetcher(batch_size, use_uid=True)
+        records = process_emails_batch(
+            mail, email_ids, EmailParser(), ReceiptParser(), fetcher=fetcher
+        )
+        elapsed = time.perf_counter() - started
+
+        if pool is not None:
+            pool.close()
+        connector.disconnect()
+    return elapsed, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds added per command')
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument('--pool-sizes', default='1,2,4,8')
+    args = parser.parse_args()
+
+    messages = [make_receipt(i) for i in range(args.emails)]
+    email_ids = [str(i).encode() for i in range(1, args.emails + 1)]
+
+    with FakeIMAPServer(messages, latency=args.latency) as server:
+        baseline = expected = None
+        print(f"{'pool':>5} {'seconds':>9} {'records':>8} {'speedup':>8}")
+        for pool_size in (int(size) for size in args.pool_sizes.split(',')):
+            elapsed, records = run(server, email_ids, pool_size, args.batch_size)
+            order = [record['email_id'] for record in records]
+            expected = expected or order
+            baseline = baseline or elapsed
+            note = '' if order == expected else '  (order differs!)'
+            print(f"{pool_size:>5} {elapsed:>9.3f} {len(records):>8} {baseline / elapsed:>7.1f}x{note}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Time each stage of a full run against a synthetic corpus and save JSON results.
+
+Stages: search (sender UID SEARCH), header filter (header FETCH + subject
+match), fetch (bodies), parse (EmailParser + ReceiptParser) and export
+(CSV + SQLite). Each stage reports its median time over --repeat runs plus
+the IMAP commands and bytes it caused. Results are written to
+benchmarks/results/ (or --output) and can be compared with an earlier
+file via --compare.
+
+Usage:
+    python -m benchmarks.bench_suite --emails 1000 --latency 0.005
+    python -m benchmarks.bench_suite --emails 1000 --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import contextlib
+import email
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_imap import FakeIMAPServer
+from src.config.email_filters import EMAIL_FILTERS
+from src.email.connector import EmailConnector
+from src.email.fetcher import BatchFetcher
+from src.email.filter import EmailFilter
+from src.email.parser import EmailParser
+from src.parser.receipt_parser import ReceiptParser
+from src.storage.csv_exporter import CSVExporter
+from src.storage.sqlite_store import SQLiteStore
+
+
+STAGES = ('search', 'header_filter', 'fetch', 'parse', 'export')
+
+
+def git_revision():
+    """Current commit and whether the tree has local changes, if run inside git."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+class StageTimer:
+    """Records wall time, IMAP commands and bytes sent for each named stage."""
+
+    def __init__(self, server):
+        self.server = server
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        commands = sum(self.server.command_counts.values())
+        sent = self.server.bytes_sent
+        started = time.perf_counter()
+        result = {}
+        yield result
+        result['seconds'] = time.perf_counter() - started
+        result['commands'] = sum(self.server.command_counts.values()) - commands
+        result['bytes'] = self.server.bytes_sent - sent
+        self.stages[name] = result
+
+
+def run_once(server, expected_by_id, args, directory):
+    """Run every stage once; returns (stage results, amount accuracy)."""
+    config = dict(EMAIL_FILTERS, sender_search_mode=args.search_mode, date_range_days=30)
+    connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+    timer = StageTimer(server)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.connect('bench@example.com', 'secret')
+        mail = connector.get_connection()
+        email_filter = EmailFilter(config)
+        email_filter.select_mailbox(mail, email_filter.mailbox)
+
+        # filter_by_sender also prefetches headers in combined modes; run
+        # only its searches here so the header FETCH lands in its own stage
+        with timer.stage('search') as stage:
+            cutoff_date = datetime.now() - timedelta(days=email_filter.date_range_days)
+            found = set()
+            for _, criteria in email_filter.sender_queries(mail, cutoff_date):
+                found.update(email_filter.search(mail, criteria))
+            candidates = sorted(found, key=int)
+            stage['items'] = len(candidates)
+
+        with timer.stage('header_filter') as stage:
+            email_ids = email_filter.filter_by_subject(mail, candidates)
+            stage['items'] = len(email_ids)
+
+        with timer.stage('fetch') as stage:
+            fetcher = BatchFetcher(args.batch_size, use_uid=email_filter.use_uid)
+            fetched = list(fetcher.fetch_messages(mail, email_ids))
+            stage['items'] = len(fetched)
+
+        connector.disconnect()
+
+        with timer.stage('parse') as stage:
+            email_parser, receipt_parser = EmailParser(), ReceiptParser()
+            records = []
+            for email_id, raw_email in fetched:
+                email_message = email.message_from_bytes(raw_email)
+                email_info = email_parser.extract_email_info(email_message, email_filter.headers.get(email_id))
+                records.append(receipt_parser.parse_receipt_data(email_info))
+            stage['items'] = len(records)
+
+        with timer.stage('export') as stage:
+            csv_path = os.path.join(directory, 'receipts.csv')
+            db_path = os.path.join(directory, 'receipts.db')
+            for path in (csv_path, db_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            CSVExporter(csv_path).save_records(records)
+            store = SQLiteStore(db_path)
+            store.save_records(records)
+            store.close()
+            stage['items'] = len(records)
+
+    correct = sum(
+        1 for record in records
+        if expected_by_id.get(record['email_id'], {}).get('amount') == record['total_amount']
+    )
+    receipts = sum(1 for info in expected_by_id.values() if info['is_receipt'])
+    accuracy = {
+        'receipts': receipts,
+        'records': len(records),
+        'amounts_correct': correct,
+        'amount_accuracy': round(correct / receipts, 4) if receipts else None,
+    }
+    return timer.stages, accuracy
+
+
+def summarize(runs):
+    """Median of each stage metric across runs."""
+    summary = {}
+    for name in STAGES:
+        samples = [stages[name] for stages in runs]
+        summary[name] = {
+            'seconds': round(statistics.median(sample['seconds'] for sample in samples), 6),
+            'seconds_min': round(min(sample['seconds'] for sample in samples), 6),
+            'items': samples[0]['items'],
+            'commands': samples[0]['commands'],
+            'bytes': samples[0]['bytes'],
+        }
+    return summary
+
+
+def print_comparison(previous, current):
+    print(f"\nCompared with {previous.get('commit') or 'unknown'} ({previous.get('timestamp', '?')}):")
+    print(f"{'stage':>14} {'before':>9} {'after':>9} {'change':>8}")
+    for name in STAGES + ('total',):
+        if name == 'total':
+            before, after = previous.get('total_seconds'), current['total_seconds']
+        else:
+            before = previous.get('stages', {}).get(name, {}).get('seconds')
+            after = current['stages'][name]['seconds']
+        if not before:
+            print(f"{name:>14} {'-':>9} {after:>9.3f} {'-':>8}")
+            continue
+        print(f"{name:>14} {before:>9.3f} {after:>9.3f} {(after - before) / before:>+8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=1000, help='Receipts in the corpus')
+    parser.add_argument('--noise-ratio', type=float, default=0.3, help='Extra non-receipt emails per receipt')
+    parser.add_argument('--html-kb', type=int, default=8, help='HTML size per receipt')
+    parser.add_argument('--attachment-kb', type=int, default=200, help='PDF size for receipts with attachments')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added per command')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--search-mode', default='or', choices=('per_domain', 'or'))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<timestamp>-<commit>.json)')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    args = parser.parse_args()
+
+    messages, expected = generate_corpus(
+        args.emails, args.seed, args.noise_ratio, args.html_kb, args.attachment_kb
+    )
+    expected_by_id = {info['message_id']: info for info in expected}
+    commit, dirty = git_revision()
+
+    runs = []
+    with FakeIMAPServer(messages, latency=args.latency) as server, tempfile.TemporaryDirectory() as directory:
+        for _ in range(max(1, args.repeat)):
+            stages, accuracy = run_once(server, expected_by_id, args, directory)
+            runs.append(stages)
+
+    summary = summarize(runs)
+    total = sum(stage['seconds'] for stage in summary.values())
+    result = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'params': vars(args),
+        'corpus': {'messages': len(messages), 'bytes': sum(len(raw) for raw in messages)},
+        'stages': summary,
+        'total_seconds': round(total, 6),
+        'emails_per_second': round(summary['parse']['items'] / total, 1) if total else None,
+        'accuracy': accuracy,
+    }
+
+    print(f"{'stage':>14} {'seconds':>9} {'items':>7} {'commands':>9} {'MB sent':>8}")
+    for name, stage in summary.items():
+        print(f"{name:>14} {stage['seconds']:>9.3f} {stage['items']:>7} {stage['commands']:>9} "
+              f"{stage['bytes'] / 1024 / 1024:>8.2f}")
+    print(f"{'total':>14} {total:>9.3f}   ({result['emails_per_second']} emails/s, "
+          f"{accuracy['amounts_correct']}/{accuracy['receipts']} amounts correct)")
+
+    output = args.output
+    if not output:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join('benchmarks', 'results', f"{stamp}-{commit or 'nogit'}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(result, file, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            print_comparison(json.load(file), result)
+
+
+if __name__ == '__main__':
+    main()
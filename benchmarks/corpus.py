@@ -0,0 +1,210 @@
+"""
+Synthetic corpus of Indonesian e-wallet and bank receipts for benchmarks.
+
+Messages rotate through the MIME shapes seen in real inboxes (plain text,
+multipart/alternative, HTML-only, attachments, forwarded message/rfc822),
+several charsets and transfer encodings, and are mixed with promotional
+mail that the sender/subject filters should drop. The corpus is
+deterministic for a given seed.
+"""
+
+import argparse
+import os
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime
+
+
+# (wallet, sender, subject template, label for the total, merchants)
+WALLETS = (
+    ('ShopeePay', 'ShopeePay <noreply@shopee.co.id>', 'Bukti Pembayaran ShopeePay #{ref}', 'Total Pembayaran',
+     ('Kopi Kenangan', 'Indomaret Point', 'Toko Sepatu Bandung')),
+    ('GoPay', 'GoPay <no-reply@gojek.com>', 'Your GoPay receipt {ref}', 'Total payment',
+     ('GoFood - Sate Khas Senayan', 'GoRide', 'GoMart Alfamidi')),
+    ('OVO', 'OVO <noreply@ovo.id>', 'OVO Payment Receipt {ref}', 'Total Bayar',
+     ('Grab Transport', 'Café Olé Kemang', 'Bakmi GM – Grand Indonesia')),
+    ('DANA', 'DANA <no-reply@dana.id>', 'Transaksi DANA Berhasil {ref}', 'Total',
+     ('PLN Prabayar', 'Telkomsel Pulsa', 'BPJS Kesehatan')),
+    ('BCA', 'BCA <bca@bca.co.id>', 'Bukti Transaksi BCA {ref}', 'Jumlah',
+     ('Transfer ke ANDI WIJAYA', 'Pembayaran Kartu Kredit', 'Virtual Account Tokopedia')),
+    ('Tokopedia', 'Tokopedia <noreply@tokopedia.com>', 'Tagihan Pembelian Tokopedia INV/{ref}', 'Total Tagihan',
+     ('Official Store Xiaomi', 'Toko Buku Gramedia', 'Dapur Nusantara')),
+)
+
+# Promotional mail from known senders and unrelated senders; never parsed
+NOISE = (
+    ('ShopeePay <promo@shopee.co.id>', 'Flash sale 12.12 mulai jam 12 siang!'),
+    ('Gojek <news@gojek.com>', 'Diskon 50% GoFood khusus hari ini'),
+    ('Medium Daily Digest <noreply@medium.com>', 'Stories for you'),
+    ('GitHub <notifications@github.com>', '[repo] New issue opened'),
+)
+
+# (charset, transfer encoding) pairs used for the text parts
+ENCODINGS = (
+    ('utf-8', 'quoted-printable'),
+    ('utf-8', 'base64'),
+    ('iso-8859-1', 'quoted-printable'),
+    ('windows-1252', '8bit'),
+    ('us-ascii', '7bit'),
+)
+
+LAYOUTS = ('plain', 'alternative', 'html', 'attachments', 'forwarded')
+
+
+def format_idr(amount):
+    """Format an integer amount the Indonesian way, e.g. 1.234.567."""
+    return f'{amount:,}'.replace(',', '.')
+
+
+def receipt_lines(wallet, label, merchant, amount, reference, when, voucher=0):
+    lines = [
+        (f'Pembayaran {wallet}', ''),
+        ('Merchant', merchant),
+        ('Tanggal Transaksi', when.strftime('%d %b %Y %H:%M WIB')),
+        ('No. Referensi', reference),
+        ('Metode Pembayaran', wallet),
+    ]
+    if voucher:
+        # A second Rp figure ahead of the total, as on receipts with a promo applied
+        lines.append(('Voucher', f'-Rp{format_idr(voucher)}'))
+    lines.append((label, f'Rp{format_idr(amount)}'))
+    return lines
+
+
+def render_text(lines):
+    return '\n'.join(f'{key}: {value}' if value else key for key, value in lines)
+
+
+def render_html(lines, html_kb):
+    rows = ''.join(
+        f'<tr><td style="color:#555;padding:4px 8px">{key}</td>'
+        f'<td style="text-align:right;font-weight:bold">{value}</td></tr>'
+        for key, value in lines
+    )
+    # Promo banners and tracking pixels make real receipts HTML-heavy
+    filler = ('<tr><td colspan="2" style="padding:2px"><a href="https://example.com/promo?utm_source=email">'
+              'Nikmati cashback hingga 30% &amp; gratis ongkir</a></td></tr>')
+    padding = filler * max(0, html_kb * 1024 // len(filler))
+    return (f'<html><head><meta charset="utf-8"><style>td{{font-family:Arial}}</style></head>'
+            f'<body><table>{rows}{padding}</table><img src="cid:logo" width="1" height="1"></body></html>')
+
+
+def set_text(message, text, charset, cte, subtype='plain'):
+    # Characters outside a legacy charset would not survive the encoding
+    text = text.encode(charset, errors='replace').decode(charset)
+    message.set_content(text, subtype=subtype, charset=charset, cte=cte)
+
+
+def make_receipt(rng, index, now, html_kb=8, attachment_kb=200):
+    """Build one receipt; returns (raw bytes, expected values)."""
+    wallet, sender, subject, label, merchants = WALLETS[index % len(WALLETS)]
+    layout = LAYOUTS[(index // len(WALLETS)) % len(LAYOUTS)]
+    charset, cte = ENCODINGS[index % len(ENCODINGS)]
+    # 7bit only carries ASCII, so pair it with a plain-ASCII merchant name
+    merchant = merchants[rng.randrange(len(merchants))]
+    if charset == 'us-ascii':
+        merchant = merchant.replace('é', 'e')
+    amount = rng.choice((rng.randrange(5, 500) * 1000, rng.randrange(10_000, 5_000_000)))
+    reference = f'{rng.randrange(10 ** 11, 10 ** 12)}'
+    when = now - timedelta(minutes=rng.randrange(1, 7 * 24 * 60))
+    voucher = rng.choice((0, 0, rng.randrange(1, 20) * 1000))
+    lines = receipt_lines(wallet, label, merchant, amount, reference, when, voucher)
+
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = 'user@example.com'
+    message['Subject'] = subject.format(ref=reference)
+    message['Date'] = format_datetime(when)
+    message['Message-ID'] = f'<receipt-{index}-{reference}@{sender.split("@")[1].rstrip(">")}>'
+
+    if layout == 'plain':
+        set_text(message, render_text(lines), charset, cte)
+    elif layout == 'html':
+        set_text(message, render_html(lines, html_kb), charset, cte, subtype='html')
+    else:
+        set_text(message, render_text(lines), charset, cte)
+        message.add_alternative(render_html(lines, html_kb), subtype='html')
+        if layout in ('attachments', 'forwarded'):
+            message.add_attachment(rng.randbytes(2048), maintype='image', subtype='png', filename='logo.png')
+            message.add_attachment(
+                rng.randbytes(attachment_kb * 1024), maintype='application', subtype='pdf',
+                filename=f'receipt-{reference}.pdf'
+            )
+        if layout == 'forwarded':
+            forwarded = EmailMessage()
+            forwarded['Subject'] = f'Fwd: {subject.format(ref=reference)}'
+            forwarded.set_content(f'Pesan diteruskan dari {wallet}.')
+            message.add_attachment(forwarded)
+
+    expected = {
+        # What survives the part's charset ('–' is not in Latin-1)
+        'message_id': message['Message-ID'], 'wallet': wallet,
+        'merchant': merchant.encode(charset, errors='replace').decode(charset),
+        'amount': float(amount), 'reference': reference, 'layout': layout, 'charset': charset,
+        'is_receipt': True,
+    }
+    return message.as_bytes().replace(b'\n', b'\r\n'), expected
+
+
+def make_noise(rng, index, now, html_kb=8):
+    """Build one promotional email that the receipt filters should skip."""
+    sender, subject = NOISE[index % len(NOISE)]
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = 'user@example.com'
+    message['Subject'] = subject
+    message['Date'] = format_datetime(now - timedelta(minutes=rng.randrange(1, 7 * 24 * 60)))
+    message['Message-ID'] = f'<noise-{index}@example.com>'
+    message.set_content('Jangan lewatkan promo terbaru kami!')
+    message.add_alternative(render_html([('Promo', 'Diskon besar')], html_kb), subtype='html')
+    expected = {'message_id': message['Message-ID'], 'is_receipt': False}
+    return message.as_bytes().replace(b'\n', b'\r\n'), expected
+
+
+def generate_corpus(count, seed=0, noise_ratio=0.3, html_kb=8, attachment_kb=200):
+    """Return (messages, expected) for `count` receipts plus interleaved noise.
+
+    `noise_ratio` is the share of extra non-receipt emails relative to
+    `count`; expected[i] describes messages[i].
+    """
+    rng = random.Random(seed)
+    now = datetime.now().astimezone().replace(microsecond=0)
+    messages, expected = [], []
+    noise_count = int(count * noise_ratio)
+    noise_every = count / noise_count if noise_count else None
+    next_noise = noise_every
+
+    for index in range(count):
+        raw, info = make_receipt(rng, index, now, html_kb, attachment_kb)
+        messages.append(raw)
+        expected.append(info)
+        while next_noise is not None and index + 1 >= next_noise and noise_count:
+            raw, info = make_noise(rng, len(expected), now, html_kb)
+            messages.append(raw)
+            expected.append(info)
+            noise_count -= 1
+            next_noise += noise_every
+
+    return messages, expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic receipt corpus as .eml files')
+    parser.add_argument('directory')
+    parser.add_argument('--emails', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    messages, expected = generate_corpus(args.emails, args.seed)
+    for index, raw in enumerate(messages):
+        with open(os.path.join(args.directory, f'{index:05d}.eml'), 'wb') as file:
+            file.write(raw)
+    layouts = Counter(info.get('layout', 'noise') for info in expected)
+    print(f"Wrote {len(messages)} emails to {args.directory}: {dict(layouts)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,522 @@
+"""
+In-process fake IMAP server for benchmarks.
+
+Implements the small IMAP4rev1 subset the CLI uses (LOGIN, SELECT, SEARCH,
+FETCH including BODYSTRUCTURE and numbered body sections, and their UID variants) over plain TCP, with an optional per-command
+delay to simulate network round-trip latency. The threaded server also
+supports IDLE: deliver() adds a message and pushes EXISTS to idling
+clients (other clients see it in the response to their next command),
+and drop_connections() simulates a network drop.
+"""
+
+import email
+import re
+import socket
+import socketserver
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+
+
+_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def tokenize(text):
+    """Tokenize IMAP command arguments into atoms, strings and nested lists."""
+    stack = [[]]
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == ' ':
+            i += 1
+        elif char == '(':
+            stack.append([])
+            i += 1
+        elif char == ')':
+            group = stack.pop()
+            stack[-1].append(group)
+            i += 1
+        elif char == '"':
+            value = []
+            i += 1
+            while i < len(text) and text[i] != '"':
+                if text[i] == '\\':
+                    i += 1
+                value.append(text[i])
+                i += 1
+            stack[-1].append(''.join(value))
+            i += 1
+        else:
+            start = i
+            while i < len(text) and text[i] not in ' ()':
+                if text[i] == '[':
+                    i = text.index(']', i)
+                i += 1
+            stack[-1].append(text[start:i])
+    return stack[0]
+
+
+def parse_sequence_set(message_set, maximum):
+    """Expand an IMAP sequence set like '1:3,7,9:*' into a set of numbers."""
+    numbers = set()
+    for part in message_set.split(','):
+        if ':' in part:
+            start, end = part.split(':')
+            start = maximum if start == '*' else int(start)
+            end = maximum if end == '*' else int(end)
+            numbers.update(range(min(start, end), max(start, end) + 1))
+        else:
+            numbers.add(maximum if part == '*' else int(part))
+    return numbers
+
+
+def imap_date(value):
+    """Parse an IMAP date such as 01-Jan-2025."""
+    day, month, year = value.split('-')
+    return datetime(int(year), _MONTHS.index(month.title()) + 1, int(day)).date()
+
+
+def part_body(part):
+    """Return the still transfer-encoded body bytes of a MIME part."""
+    if part.get_content_type() == 'message/rfc822':
+        return part.get_payload(0).as_bytes()
+    # get_payload() decodes 8bit text by its charset; serializing gives back the stored bytes
+    raw = part.as_bytes(policy=part.policy.clone(linesep='\r\n'))
+    return raw.split(b'\r\n\r\n', 1)[1] if b'\r\n\r\n' in raw else b''
+
+
+class FakeMessage:
+    """A stored message with its UID and pre-parsed headers."""
+
+    def __init__(self, uid, raw):
+        self.uid = uid
+        self.raw = raw
+        self.headers = BytesHeaderParser().parsebytes(raw)
+        self._message = None
+        try:
+            self.date = parsedate_to_datetime(self.headers['date']).date()
+        except Exception:
+            self.date = datetime.now().date()
+
+    def header_fields(self, names):
+        """Return the raw header block restricted to the given field names."""
+        wanted = {name.lower() for name in names}
+        header_block = self.raw.split(b'\r\n\r\n', 1)[0]
+        lines = []
+        keep = False
+        for line in header_block.split(b'\r\n'):
+            if line[:1] in (b' ', b'\t'):
+                if keep:
+                    lines.append(line)
+                continue
+            name = line.split(b':', 1)[0].decode('ascii', errors='ignore').lower()
+            keep = name in wanted
+            if keep:
+                lines.append(line)
+        return b'\r\n'.join(lines) + b'\r\n\r\n'
+
+    @property
+    def message(self):
+        """The fully parsed message, built on first use."""
+        if self._message is None:
+            self._message = email.message_from_bytes(self.raw)
+        return self._message
+
+    def part(self, section):
+        """Return the MIME part addressed by a numeric section like '2.1'."""
+        part = self.message
+        for index in section.split('.'):
+            index = int(index)
+            if part.get_content_type() == 'message/rfc822':
+                part = part.get_payload(0)
+            if part.is_multipart():
+                part = part.get_payload(index - 1)
+            elif index != 1:
+                raise ValueError(f'No part {section}')
+        return part
+
+    def bodystructure(self, part=None):
+        """Render the IMAP BODYSTRUCTURE of the message (or one of its parts)."""
+        part = self.message if part is None else part
+        if part.get_content_maintype() == 'multipart':
+            children = ''.join(self.bodystructure(child) for child in part.get_payload())
+            return f'({children} "{part.get_content_subtype().upper()}")'
+
+        params = ' '.join(f'"{name.upper()}" "{value}"' for name, value in (part.get_params() or [])[1:])
+        body = part_body(part)
+        lines = body.count(b'\n')
+        encoding = part.get('Content-Transfer-Encoding', '7BIT').upper()
+        fields = (
+            f'"{part.get_content_maintype().upper()}" "{part.get_content_subtype().upper()}" '
+            f'{"(" + params + ")" if params else "NIL"} NIL NIL "{encoding}" {len(body)}'
+        )
+        if part.get_content_maintype() == 'text':
+            fields += f' {lines}'
+        elif part.get_content_type() == 'message/rfc822':
+            envelope = '(' + ' '.join(['NIL'] * 10) + ')'
+            fields += f' {envelope} {self.bodystructure(part.get_payload(0))} {lines}'
+        return f'({fields})'
+
+
+class FakeMailbox:
+    """Holds messages for the fake server; safe to share between connections."""
+
+    def __init__(self, messages=(), uidvalidity=1, first_uid=1):
+        self.uidvalidity = uidvalidity
+        self.messages = []
+        self.next_uid = first_uid
+        self.lock = threading.Lock()
+        for raw in messages:
+            self.add_message(raw)
+
+    def add_message(self, raw):
+        """Append a message and return its UID."""
+        with self.lock:
+            message = FakeMessage(self.next_uid, raw)
+            self.messages.append(message)
+            self.next_uid += 1
+            return message.uid
+
+
+def unquote_literal(line, match, literal):
+    """Inline a client literal into its command line as a quoted string."""
+    quoted = literal.replace(b'\\', b'\\\\').replace(b'"', b'\\"')
+    return line[:match.start()] + b'"' + quoted + b'"'
+
+
+CLIENT_LITERAL_RE = re.compile(rb'\{(\d+)\}\r\n$')
+
+
+class FakeIMAPSession:
+    """Executes the commands of one client connection, independent of the transport.
+
+    `write` sends raw bytes to the client; the threaded and asyncio servers
+    each supply their own.
+    """
+
+    def __init__(self, server, write):
+        self.server = server
+        self.mailbox = server.mailbox
+        self._write = write
+        # Pushed EXISTS notifications come from other threads
+        self._lock = threading.RLock()
+        # Message count last reported to this client (None until SELECT)
+        self.reported_exists = None
+        self.idle_tag = None
+
+    def send(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with self._lock:
+            self._write(data)
+            self.server.bytes_sent += len(data)
+
+    def report_exists(self):
+        """Send EXISTS if messages arrived since the client last heard the count."""
+        with self.mailbox.lock:
+            count = len(self.mailbox.messages)
+        with self._lock:
+            if self.reported_exists is not None and count > self.reported_exists:
+                self.send(f'* {count} EXISTS\r\n')
+                self.reported_exists = count
+
+    def greet(self):
+        self.send('* OK Fake IMAP server ready\r\n')
+
+    def execute(self, line):
+        """Run one command line; returns False once the client has logged out."""
+        if self.idle_tag is not None:
+            # Only DONE is accepted while idling
+            if line.strip().upper() == 'DONE':
+                self.server.idle_sessions.discard(self)
+                tag, self.idle_tag = self.idle_tag, None
+                self.send(f'{tag} OK IDLE terminated\r\n')
+            return True
+        parts = line.split(' ', 2)
+        if len(parts) < 2:
+            return True
+        tag, command = parts[0], parts[1].upper()
+        args = parts[2] if len(parts) > 2 else ''
+        use_uid = False
+        if command == 'UID':
+            use_uid = True
+            command, _, args = args.partition(' ')
+            command = command.upper()
+
+        self.server.command_counts[('UID ' if use_uid else '') + command] += 1
+        handler = getattr(self, f'cmd_{command.lower().replace("-", "_")}', None)
+        if command != 'SELECT':
+            # Like real servers, report new mail in the response to whatever command comes next
+            self.report_exists()
+
+        if handler is None:
+            self.send(f'{tag} BAD Unknown command {command}\r\n')
+            return True
+        try:
+            return handler(tag, args, use_uid) is not False
+        except Exception as e:
+            self.send(f'{tag} BAD {e}\r\n')
+            return True
+
+    def cmd_capability(self, tag, args, use_uid):
+        self.send(f"* CAPABILITY {' '.join(self.server.capabilities)}\r\n")
+        self.send(f'{tag} OK CAPABILITY completed\r\n')
+
+    def cmd_login(self, tag, args, use_uid):
+        self.send(f"* CAPABILITY {' '.join(self.server.capabilities)}\r\n")
+        self.send(f'{tag} OK LOGIN completed\r\n')
+
+    def cmd_noop(self, tag, args, use_uid):
+        self.send(f'{tag} OK NOOP completed\r\n')
+
+    def cmd_idle(self, tag, args, use_uid):
+        if getattr(self.server, 'idle_sessions', None) is None:
+            raise ValueError('IDLE not supported')
+        self.send('+ idling\r\n')
+        self.idle_tag = tag
+        self.server.idle_sessions.add(self)
+        self.report_exists()
+
+    def cmd_logout(self, tag, args, use_uid):
+        self.send('* BYE Logging out\r\n')
+        self.send(f'{tag} OK LOGOUT completed\r\n')
+        return False
+
+    def cmd_select(self, tag, args, use_uid):
+        with self.mailbox.lock, self._lock:
+            self.reported_exists = len(self.mailbox.messages)
+            self.send(f'* {self.reported_exists} EXISTS\r\n')
+            self.send('* 0 RECENT\r\n')
+            self.send(f'* OK [UIDVALIDITY {self.mailbox.uidvalidity}] UIDs valid\r\n')
+            self.send(f'* OK [UIDNEXT {self.mailbox.next_uid}] Predicted next UID\r\n')
+        self.send(f'{tag} OK [READ-WRITE] SELECT completed\r\n')
+
+    cmd_examine = cmd_select
+
+    def resolve(self, message_set, use_uid):
+        """Return the (sequence number, message) pairs addressed by a set."""
+        messages = self.mailbox.messages
+        if not messages:
+            return []
+        if use_uid:
+            uids = parse_sequence_set(message_set, messages[-1].uid)
+            return [(i, m) for i, m in enumerate(messages, 1) if m.uid in uids]
+        numbers = parse_sequence_set(message_set, len(messages))
+        return [(i, messages[i - 1]) for i in sorted(numbers) if 1 <= i <= len(messages)]
+
+    def matches(self, criteria, seq, message):
+        """Evaluate a list of search keys (implicitly ANDed) against a message."""
+        keys = list(criteria)
+        while keys:
+            if not self.match_key(keys, seq, message):
+                return False
+        return True
+
+    def match_key(self, keys, seq, message):
+        """Pop one search key (with its arguments) off `keys` and evaluate it."""
+        key = keys.pop(0)
+        if isinstance(key, list):
+            return self.matches(key, seq, message)
+        name = key.upper()
+        if name == 'ALL':
+            return True
+        if name == 'OR':
+            left = self.match_key(keys, seq, message)
+            right = self.match_key(keys, seq, message)
+            return left or right
+        if name == 'NOT':
+            return not self.match_key(keys, seq, message)
+        if name in ('FROM', 'SUBJECT', 'TO'):
+            value = str(message.headers.get(name.lower(), '')).lower()
+            return keys.pop(0).lower() in value
+        if name == 'SINCE':
+            return message.date >= imap_date(keys.pop(0))
+        if name == 'BEFORE':
+            return message.date < imap_date(keys.pop(0))
+        if name == 'UID':
+            last = self.mailbox.messages[-1].uid
+            return message.uid in parse_sequence_set(keys.pop(0), last)
+        if name == 'X-GM-RAW':
+            return self.matches_gmail_query(keys.pop(0), message)
+        if re.match(r'^[\d:*,]+$', name):
+            return seq in parse_sequence_set(name, len(self.mailbox.messages))
+        raise ValueError(f'Unsupported search key {key}')
+
+    def matches_gmail_query(self, query, message):
+        """Evaluate the from:(a OR b) after:YYYY/MM/DD subset of Gmail search."""
+        senders = re.search(r'from:\(([^)]*)\)|from:(\S+)', query)
+        if senders:
+            values = (senders.group(1) or senders.group(2)).split(' OR ')
+            sender = str(message.headers.get('from', '')).lower()
+            if not any(value.strip().lower() in sender for value in values):
+                return False
+        after = re.search(r'after:(\d{4})/(\d{1,2})/(\d{1,2})', query)
+        if after:
+            if message.date < datetime(*map(int, after.groups())).date():
+                return False
+        return True
+
+    def cmd_search(self, tag, args, use_uid):
+        criteria = tokenize(args)
+        if criteria and isinstance(criteria[0], str) and criteria[0].upper() == 'CHARSET':
+            criteria = criteria[2:]
+        with self.mailbox.lock:
+            hits = [
+                str(message.uid if use_uid else seq)
+                for seq, message in enumerate(self.mailbox.messages, 1)
+                if self.matches(criteria, seq, message)
+            ]
+        self.send(f"* SEARCH {' '.join(hits)}\r\n".replace(' \r\n', '\r\n'))
+        self.send(f'{tag} OK SEARCH completed\r\n')
+
+    def fetch_item(self, item, message):
+        """Render one FETCH data item as (name, value bytes)."""
+        name = item.upper()
+        if name == 'UID':
+            return b'UID %d' % message.uid
+        if name == 'RFC822':
+            return b'RFC822 {%d}\r\n' % len(message.raw) + message.raw
+        if name == 'RFC822.SIZE':
+            return b'RFC822.SIZE %d' % len(message.raw)
+        if name == 'BODYSTRUCTURE':
+            return b'BODYSTRUCTURE ' + message.bodystructure().encode('utf-8')
+        if name.startswith('BODY[') or name.startswith('BODY.PEEK['):
+            section = item[item.index('[') + 1:item.rindex(']')]
+            data = self.body_section(section, message)
+            label = 'BODY[' + section + ']'
+            return label.encode('ascii') + b' {%d}\r\n' % len(data) + data
+        raise ValueError(f'Unsupported fetch item {item}')
+
+    def body_section(self, section, message):
+        """Return the bytes of a BODY[section] request."""
+        upper = section.upper()
+        if upper == '':
+            return message.raw
+        if upper == 'HEADER':
+            return message.raw.split(b'\r\n\r\n', 1)[0] + b'\r\n\r\n'
+        if upper == 'TEXT':
+            parts = message.raw.split(b'\r\n\r\n', 1)
+            return parts[1] if len(parts) > 1 else b''
+        if upper.startswith('HEADER.FIELDS'):
+            names = tokenize(section[len('HEADER.FIELDS'):])[0]
+            return message.header_fields(names)
+        if re.match(r'^\d+(\.\d+)*$', section):
+            return part_body(message.part(section))
+        raise ValueError(f'Unsupported section {section}')
+
+    def cmd_fetch(self, tag, args, use_uid):
+        message_set, _, items = args.partition(' ')
+        items = tokenize(items)
+        items = items[0] if items and isinstance(items[0], list) else items
+        if use_uid and not any(item.upper() == 'UID' for item in items):
+            items = ['UID'] + items
+
+        with self.mailbox.lock:
+            selected = self.resolve(message_set, use_uid)
+        for seq, message in selected:
+            rendered = b' '.join(self.fetch_item(item, message) for item in items)
+            self.send(b'* %d FETCH (' % seq + rendered + b')\r\n')
+        self.send(f'{tag} OK FETCH completed\r\n')
+
+
+class FakeIMAPHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection of the threaded server."""
+
+    def setup(self):
+        super().setup()
+        # Avoid Nagle/delayed-ACK stalls skewing latency measurements
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.session = FakeIMAPSession(self.server, self.write)
+        self.server.connections.add(self.connection)
+
+    def finish(self):
+        self.server.idle_sessions.discard(self.session)
+        self.server.connections.discard(self.connection)
+        super().finish()
+
+    def write(self, data):
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def read_command(self):
+        """Read one command line, resolving any client literals."""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        while True:
+            match = CLIENT_LITERAL_RE.search(line)
+            if not match:
+                break
+            self.session.send('+ Ready for literal\r\n')
+            literal = self.rfile.read(int(match.group(1)))
+            line = unquote_literal(line, match, literal) + self.rfile.readline()
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def handle(self):
+        self.session.greet()
+        while True:
+            line = self.read_command()
+            if line is None:
+                return
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            if self.session.execute(line) is False:
+                return
+
+
+class FakeIMAPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Threaded fake IMAP server bound to localhost on an ephemeral port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, messages=(), latency=0.0, capabilities=('IMAP4rev1',),
+                 host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeIMAPHandler)
+        self.mailbox = messages if isinstance(messages, FakeMailbox) else FakeMailbox(messages)
+        self.latency = latency
+        self.capabilities = list(capabilities)
+        self.command_counts = Counter()
+        self.bytes_sent = 0
+        # Sessions in IDLE and open client sockets, for deliver() and drop_connections()
+        self.idle_sessions = set()
+        self.connections = set()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def deliver(self, raw):
+        """Add a message as if it had just arrived, pushing EXISTS to idling clients; returns its UID."""
+        uid = self.mailbox.add_message(raw)
+        for session in list(self.idle_sessions):
+            session.report_exists()
+        return uid
+
+    def drop_connections(self):
+        """Cut every open client connection, as a network failure would."""
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
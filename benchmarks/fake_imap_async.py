@@ -0,0 +1,125 @@
+"""
+Asyncio fake IMAP server for benchmarking pipelined clients.
+
+Shares the command handling of `FakeIMAPSession` with the threaded server,
+but `latency` is applied per command from the moment it arrives rather
+than serially, so commands a client pipelines overlap the way they do over
+a real network round trip. Responses still go out in command order.
+"""
+
+import asyncio
+import threading
+from collections import Counter
+
+from benchmarks.fake_imap import CLIENT_LITERAL_RE, FakeIMAPSession, FakeMailbox, unquote_literal
+
+
+class AsyncFakeIMAPServer:
+    """Fake IMAP server running its own event loop in a daemon thread.
+
+    Offers the same start/stop/port/command_counts/bytes_sent interface as
+    FakeIMAPServer, so benchmarks can swap one for the other.
+    """
+
+    def __init__(self, messages=(), latency=0.0, capabilities=('IMAP4rev1',),
+                 host='127.0.0.1', port=0):
+        self.mailbox = messages if isinstance(messages, FakeMailbox) else FakeMailbox(messages)
+        self.latency = latency
+        self.capabilities = list(capabilities)
+        self.command_counts = Counter()
+        self.bytes_sent = 0
+        self.host = host
+        self._requested_port = port
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._writers = set()
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def _read_command(self, reader, writer, session):
+        """Read one command line, resolving any client literals."""
+        line = await reader.readline()
+        if not line:
+            return None
+        while True:
+            match = CLIENT_LITERAL_RE.search(line)
+            if not match:
+                break
+            session.send('+ Ready for literal\r\n')
+            await writer.drain()
+            literal = await reader.readexactly(int(match.group(1)))
+            line = unquote_literal(line, match, literal) + await reader.readline()
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    async def _respond(self, queue, writer, session):
+        """Execute queued commands in order, each no earlier than arrival + latency."""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            arrived, line = item
+            delay = arrived + self.latency - self._loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if session.execute(line) is False:
+                await writer.drain()
+                return
+            await writer.drain()
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        session = FakeIMAPSession(self, writer.write)
+        session.greet()
+        queue = asyncio.Queue()
+        responder = asyncio.create_task(self._respond(queue, writer, session))
+        try:
+            while not responder.done():
+                line = await self._read_command(reader, writer, session)
+                if line is None:
+                    break
+                await queue.put((self._loop.time(), line))
+            await queue.put(None)
+            await responder
+        except (ConnectionError, asyncio.IncompleteReadError):
+            responder.cancel()
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        async def serve():
+            self._server = await asyncio.start_server(self._handle, self.host, self._requested_port)
+            started.set()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        async def shutdown():
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
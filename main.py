@@ -4,100 +4,506 @@ E-Receipt Parser CLI - Refactored Version
 Clean orchestration using class-based architecture
 """
 
+import argparse
+import contextlib
 import email
+import sys
+import time
 
 # Import our refactored modules
 from src.config.email_filters import EMAIL_FILTERS
+from src.email.archive import ARCHIVE_FORMATS, MailArchive
 from src.email.connector import EmailConnector
+from src.email.fetcher import BatchFetcher, PipelinedFetcher
 from src.email.filter import EmailFilter
-from src.email.parser import EmailParser
+from src.email.parser import EmailParser, decode_mime_header
+from src.email.watcher import MailboxWatcher
+from src.parser.pipeline import ParsePipeline
 from src.parser.receipt_parser import ReceiptParser
 from src.storage.csv_exporter import CSVExporter
-from src.utils.helpers import display_welcome_message, display_email_info, input_credentials
+from src.storage.message_cache import MessageCache
+from src.storage.parquet_exporter import ParquetExporter
+from src.storage.sqlite_store import SQLiteStore
+from src.storage.sync_state import SyncStateStore
+from src.utils.helpers import display_welcome_message, input_credentials
+from src.utils.metrics import Profiler, RunMetrics, TimedFetcher
+from src.utils.progress import ProgressReporter, QuietStdout
 
 
-def process_emails_batch(mail, email_ids, email_parser, receipt_parser):
-    """Process emails in batch and return structured data for CSV export."""
-    email_records = []
-    
-    print(f"\n📊 Processing {len(email_ids)} emails for data extraction...")
-    
-    for i, email_id in enumerate(email_ids, 1):
+def parse_emails_inline(fetcher, mail, email_ids, email_parser, receipt_parser, headers):
+    """Yield (email_id, EmailRecord or exception), parsing each email as it arrives."""
+    for email_id, raw_email in fetcher.fetch_messages(mail, email_ids):
         try:
-            # Fetch email data
-            status, msg_data = mail.fetch(email_id, '(RFC822)')
+            email_message = email.message_from_bytes(raw_email)
             
-            if status == 'OK':
-                email_message = email.message_from_bytes(msg_data[0][1])
-                
-                # Extract email info
-                email_info = email_parser.extract_email_info(email_message)
-                
-                # Parse receipt data (add total amount)
-                receipt_data = receipt_parser.parse_receipt_data(email_info)
-                
-                email_records.append(receipt_data)
-                
-                # Display progress (keep existing display functionality)
-                display_email_info(i, receipt_data)
-                
+            # Extract email info
+            email_info = email_parser.extract_email_info(email_message, headers.get(email_id))
+            
+            # Parse receipt data (add total amount)
+            yield email_id, receipt_parser.parse_receipt_data(email_info)
+        
         except Exception as e:
-            print(f"{i:2d}. Error processing email: {e}")
-            print(f"    {'-'*50}")
+            yield email_id, e
+
+
+def iter_email_records(mail, email_ids, email_parser, receipt_parser, batch_size=1, headers=None,
+                       use_uid=False, fetcher=None, store=None, pipeline=None, cache=None, metrics=None,
+                       progress=None):
+    """Yield a receipt record for each email as soon as it is parsed.
+    
+    `headers` maps email ids to headers prefetched by EmailFilter; `use_uid`
+    must match how the ids were searched. A preconfigured `fetcher` can be
+    passed instead of `batch_size`/`use_uid` to inspect its missing_ids later.
+    With a `store` (SQLiteStore), emails whose Message-ID is already stored
+    are skipped before their bodies are fetched. With a `cache` (a
+    MessageCache scope), cached emails are read from disk before any FETCH
+    and only the rest are downloaded. With a `pipeline`
+    (ParsePipeline), parsing runs in worker processes alongside the fetch.
+    With `metrics` (RunMetrics), time spent waiting on the fetcher is
+    recorded as the 'fetch' stage, the rest as 'parse', and emails that fail
+    or yield no amount are counted per sender domain and subject pattern. `progress` (a
+    ProgressReporter) decides how each email is reported; by default every
+    email is listed with display_email_info.
+    """
+    headers = headers or {}
+    progress = progress or ProgressReporter('detail')
+    parsed = 0
+    # Time the consumer spends between records (e.g. writing them) is not parsing
+    paused = 0.0
+    
+    if store is not None and headers:
+        message_ids = {
+            email_id: headers[email_id]['Message-ID']
+            for email_id in email_ids if email_id in headers
+        }
+        stored = store.stored_message_ids(message_ids.values())
+        if stored:
+            skipped = [email_id for email_id in email_ids if message_ids.get(email_id) in stored]
+            email_ids = [email_id for email_id in email_ids if message_ids.get(email_id) not in stored]
+            print(f"\n⏭️  Skipping {len(skipped)} emails already stored")
+    
+    print(f"\n📊 Processing {len(email_ids)} emails for data extraction...")
+    
+    # Fetch emails `batch_size` at a time (1 = one round-trip per email)
+    fetcher = fetcher or BatchFetcher(batch_size, use_uid=use_uid)
+    if cache is not None:
+        fetcher = cache.wrap(fetcher)
+    if metrics is not None:
+        fetcher = TimedFetcher(fetcher, metrics)
+    started = time.perf_counter()
+    progress.start(len(email_ids))
     
-    return email_records
+    if pipeline is not None:
+        results = pipeline.run(fetcher, mail, email_ids, headers)
+    else:
+        results = parse_emails_inline(fetcher, mail, email_ids, email_parser, receipt_parser, headers)
+    
+    for i, (email_id, receipt_data) in enumerate(results, 1):
+        if isinstance(receipt_data, Exception):
+            progress.failed(i, email_id, receipt_data)
+            if metrics is not None:
+                email_headers = headers.get(email_id) or {}
+                metrics.record_parse_failure(
+                    email_headers.get('from'), decode_mime_header(email_headers.get('subject')).strip(), 'error'
+                )
+            continue
+        
+        parsed += 1
+        if metrics is not None and not receipt_data.total_amount:
+            metrics.record_parse_failure(receipt_data.sender, receipt_data.subject, 'no_amount')
+        
+        progress.parsed(i, receipt_data)
+        yielded = time.perf_counter()
+        yield receipt_data
+        paused += time.perf_counter() - yielded
+    
+    progress.finish()
+    if metrics is not None:
+        # With a pipeline the fetch overlaps parsing, so this is a lower bound
+        elapsed = time.perf_counter() - started - paused
+        metrics.add_stage_time('parse', max(0.0, elapsed - fetcher.seconds), parsed)
+
+
+def process_emails_batch(mail, email_ids, email_parser, receipt_parser, batch_size=1, headers=None,
+                         use_uid=False, fetcher=None, store=None, pipeline=None, cache=None, metrics=None,
+                         progress=None):
+    """Process emails in batch and return structured data for CSV export.
+    
+    Collects iter_email_records into a list; see it for the arguments.
+    """
+    return list(iter_email_records(
+        mail, email_ids, email_parser, receipt_parser, batch_size, headers, use_uid,
+        fetcher, store, pipeline, cache, metrics, progress
+    ))
+
+
+def save_email_records(email_records, csv_exporter, sqlite_store=None, replace=False, metrics=None,
+                       parquet_exporter=None):
+    """Write records to CSV (and SQLite/Parquet when enabled) as they arrive.
+    
+    `email_records` may be any iterable, typically iter_email_records, so
+    rows reach the disk while later emails are still being fetched and
+    memory stays flat. With `replace` the CSV and Parquet outputs are
+    rewritten and stored SQLite rows are overwritten. Export and fetch
+    errors are raised, so code after a call only runs once every record is
+    saved.
+    """
+    export_seconds = 0.0
+    
+    with contextlib.ExitStack() as streams:
+        csv_stream = streams.enter_context(csv_exporter.open_stream(replace=replace))
+        sqlite_stream = streams.enter_context(sqlite_store.open_stream(replace)) if sqlite_store is not None else None
+        parquet_stream = (
+            streams.enter_context(parquet_exporter.open_stream(replace=replace))
+            if parquet_exporter is not None else None
+        )
+        
+        for record in email_records:
+            started = time.perf_counter()
+            written = csv_stream.write(record)
+            if sqlite_stream is not None:
+                sqlite_stream.write(record)
+            # Parquet part files are append-only; the CSV's Message-ID index keeps them free of repeats
+            if parquet_stream is not None and written:
+                parquet_stream.write(record)
+            export_seconds += time.perf_counter() - started
+    
+    if metrics is not None:
+        metrics.add_stage_time('export', export_seconds, csv_stream.count)
+    if not csv_stream.count and not csv_stream.skipped:
+        print("\n⚠️  No valid email records extracted for CSV export")
+
+
+def process_archive(path, archive_format, email_filter, email_parser, receipt_parser,
+                    csv_exporter, sqlite_store=None, pipeline=None, metrics=None, progress=None,
+                    parquet_exporter=None):
+    """Run the filter/parse/export chain over an mbox, Maildir or .eml directory."""
+    try:
+        archive = MailArchive(path, archive_format)
+    except Exception as e:
+        print(f"❌ Error opening archive {path}: {e}")
+        return
+    
+    try:
+        with metrics.stage('search') if metrics is not None else contextlib.nullcontext({}) as stage:
+            filtered_emails = email_filter.filter_archive(archive)
+            stage['items'] = len(filtered_emails)
+        
+        if filtered_emails:
+            email_records = iter_email_records(
+                None, filtered_emails, email_parser, receipt_parser,
+                headers=email_filter.headers,
+                fetcher=archive,
+                store=sqlite_store,
+                pipeline=pipeline,
+                metrics=metrics,
+                progress=progress
+            )
+            save_email_records(
+                email_records, csv_exporter, sqlite_store, metrics=metrics, parquet_exporter=parquet_exporter
+            )
+        else:
+            print("\n📭 No e-receipt emails found with current filters.")
+    finally:
+        archive.close()
+
+
+def reparse_cache(message_cache, email_parser, receipt_parser, csv_exporter, sqlite_store=None, pipeline=None,
+                  metrics=None, progress=None, parquet_exporter=None):
+    """Re-parse every cached email into the CSV/SQLite/Parquet output, without touching the network.
+    
+    The fresh records replace the rows with the same Message-ID; rows of
+    emails that are not in the cache (evicted, skipped or never fetched)
+    are kept.
+    """
+    reader = message_cache.reader()
+    cached_emails = reader.keys()
+    if not cached_emails:
+        print(f"\n📭 No cached emails found in {message_cache.directory}")
+        return
+    
+    print(f"\n🗄️  Re-parsing {len(cached_emails)} cached emails")
+    email_records = iter_email_records(
+        None, cached_emails, email_parser, receipt_parser,
+        fetcher=reader,
+        pipeline=pipeline,
+        metrics=metrics,
+        progress=progress
+    )
+    save_email_records(
+        email_records, csv_exporter, sqlite_store, replace=True, metrics=metrics, parquet_exporter=parquet_exporter
+    )
+
+
+def save_sync_progress(sync_state, account, email_filter, missing_ids=()):
+    """Record the highest examined UID, stopping short of emails that failed to fetch."""
+    last_uid = email_filter.highest_uid
+    if last_uid is None:
+        return
+    
+    if missing_ids:
+        last_uid = min(last_uid, min(int(uid) for uid in missing_ids) - 1)
+        print(f"⚠️  {len(missing_ids)} emails could not be fetched, they will be retried next run")
+    
+    if last_uid > 0:
+        sync_state.update(account, email_filter.mailbox, email_filter.uidvalidity, last_uid)
+        sync_state.save()
+
+
+def sync_mailbox(mail, account, email_connector, email_filter, email_parser, receipt_parser, csv_exporter,
+                 sync_state, fetcher, sqlite_store=None, message_cache=None, pipeline=None, metrics=None,
+                 progress=None, parquet_exporter=None, full_sync=False):
+    """Run the search/fetch/parse/export chain over the emails that arrived since the saved sync state."""
+    pool = None
+    try:
+        # Resume from the last processed UID unless a full scan is requested
+        state = None if full_sync else sync_state.get(account, email_filter.mailbox)
+        
+        # Get filtered e-receipt emails
+        with metrics.stage('search') if metrics is not None else contextlib.nullcontext({}) as stage:
+            filtered_emails = email_filter.get_filtered_emails(
+                mail, MAX_PROCESS_EMAILS,
+                last_uid=state['last_uid'] if state else None,
+                uidvalidity=state['uidvalidity'] if state else None
+            )
+            stage['items'] = len(filtered_emails)
+        
+        # Process emails and save to CSV
+        if filtered_emails and EMAIL_FILTERS['connection_pool_size'] > 1:
+            # Fetch bodies over several connections at once
+            with metrics.stage('connect') if metrics is not None else contextlib.nullcontext({}):
+                pool = email_connector.open_pool(
+                    EMAIL_FILTERS['connection_pool_size'], email_filter.mailbox,
+                    EMAIL_FILTERS['fetch_batch_size'], EMAIL_FILTERS['partial_body_fetch']
+                )
+            fetcher = pool
+        
+        # Keep a local copy of every fetched email for --reparse
+        cache = None
+        if message_cache is not None and email_filter.uidvalidity is not None:
+            cache = message_cache.scope(
+                f"{account}:{email_filter.mailbox}", email_filter.uidvalidity,
+                'text' if EMAIL_FILTERS['partial_body_fetch'] else 'rfc822'
+            )
+        
+        if filtered_emails:
+            # Batch process emails for data extraction
+            email_records = iter_email_records(
+                mail, filtered_emails, email_parser, receipt_parser,
+                headers=email_filter.headers,
+                fetcher=fetcher,
+                store=sqlite_store,
+                pipeline=pipeline,
+                cache=cache,
+                metrics=metrics,
+                progress=progress
+            )
+            
+            # Save to CSV (and SQLite when enabled)
+            save_email_records(
+                email_records, csv_exporter, sqlite_store, metrics=metrics, parquet_exporter=parquet_exporter
+            )
+        else:
+            print("\n📭 No e-receipt emails found with current filters.")
+        
+        # Remember progress so the next run only looks at new UIDs; not reached if saving failed
+        missing_ids = cache.missing_ids if cache is not None else fetcher.missing_ids
+        save_sync_progress(sync_state, account, email_filter, missing_ids)
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Extract e-receipts from your mailbox into CSV.")
+    parser.add_argument('--full-sync', action='store_true',
+                        help="ignore saved sync state and rescan the whole date_range_days window")
+    parser.add_argument('--state-file', default=EMAIL_FILTERS['sync_state_file'],
+                        help="where UIDVALIDITY and the last processed UID are stored")
+    parser.add_argument('--archive', metavar='PATH',
+                        help="process an mbox file, Maildir or directory of .eml files instead of IMAP")
+    parser.add_argument('--archive-format', choices=ARCHIVE_FORMATS,
+                        help="archive layout (detected from PATH by default)")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and process new receipts as they arrive (IMAP IDLE)")
+    parser.add_argument('--reparse', action='store_true',
+                        help="re-parse the local message cache into the CSV/SQLite/Parquet output, offline")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('-q', '--quiet', action='store_true',
+                        help="only print warnings and errors (no progress line)")
+    output.add_argument('--details', action='store_true',
+                        help="list every matched and parsed email instead of a progress line")
+    parser.add_argument('--events', metavar='PATH',
+                        help="append JSON-lines progress events to PATH ('-' for stdout) for log shipping")
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help="write per-stage timings and counters at the end of the run "
+                             "(JSON, or a Prometheus textfile when PATH ends in .prom)")
+    parser.add_argument('--metrics-format', choices=('json', 'prometheus'),
+                        help="override the format picked from the --metrics-file extension")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="run under cProfile, save the stats to PATH and print the hot spots")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="trace allocations with tracemalloc and report the peak and top lines")
+    return parser.parse_args(argv)
+
 
 MAX_PROCESS_EMAILS = 1000
 
-def main():
+def main(argv=None):
     """Main function orchestrating the email fetching process."""
+    args = parse_args(argv)
+    metrics = RunMetrics()
+    profiler = Profiler(args.profile, args.trace_memory).start()
+    progress = ProgressReporter(
+        'quiet' if args.quiet else 'detail' if args.details else 'progress', events=args.events
+    )
+    progress.event('run_started', argv=list(argv) if argv is not None else sys.argv[1:])
+    output = contextlib.ExitStack()
+    if args.quiet:
+        output.enter_context(contextlib.redirect_stdout(QuietStdout(sys.stdout)))
+    
     try:
         # Display welcome message
         display_welcome_message()
         
         # Initialize all components
-        email_connector = EmailConnector()
-        email_filter = EmailFilter(EMAIL_FILTERS)
+        imap_client = EMAIL_FILTERS['imap_client']
+        if args.watch and imap_client == 'asyncio':
+            # IDLE is implemented on top of imaplib's socket
+            print("ℹ️  --watch uses the imaplib client, ignoring settings.imap_client: asyncio")
+            imap_client = 'imaplib'
+        email_connector = EmailConnector(client=imap_client, metrics=metrics)
+        email_filter = EmailFilter(EMAIL_FILTERS, verbose=args.details)
+        # Parse failures are labeled with the subject pattern that selected the email
+        metrics.subject_matcher = email_filter.subject_matcher
         email_parser = EmailParser()
         receipt_parser = ReceiptParser()
         csv_exporter = CSVExporter()
+        sqlite_store = SQLiteStore(EMAIL_FILTERS['sqlite_path']) if EMAIL_FILTERS['sqlite_path'] else None
+        parquet_exporter = None
+        if EMAIL_FILTERS['parquet_dir']:
+            if ParquetExporter.available():
+                parquet_exporter = ParquetExporter(EMAIL_FILTERS['parquet_dir'], EMAIL_FILTERS['parquet_row_group_size'])
+            else:
+                print("⚠️  settings.parquet_dir is set but pyarrow is not installed, skipping Parquet export")
+        sync_state = SyncStateStore(args.state_file)
+        message_cache = None
+        if EMAIL_FILTERS['cache_dir']:
+            message_cache = MessageCache(EMAIL_FILTERS['cache_dir'], EMAIL_FILTERS['cache_max_mb'] * 1024 * 1024)
+        if imap_client == 'asyncio':
+            fetcher = PipelinedFetcher(
+                EMAIL_FILTERS['fetch_batch_size'], use_uid=email_filter.use_uid,
+                text_only=EMAIL_FILTERS['partial_body_fetch'], depth=EMAIL_FILTERS['pipeline_depth']
+            )
+        else:
+            fetcher = BatchFetcher(
+                EMAIL_FILTERS['fetch_batch_size'], use_uid=email_filter.use_uid,
+                text_only=EMAIL_FILTERS['partial_body_fetch']
+            )
+        pipeline = None
+        if EMAIL_FILTERS['parse_workers']:
+            pipeline = ParsePipeline(EMAIL_FILTERS['parse_workers'], EMAIL_FILTERS['parse_queue_size'])
+        
+        # Offline backfill from an exported archive, no IMAP credentials needed
+        if args.archive:
+            try:
+                process_archive(
+                    args.archive, args.archive_format, email_filter, email_parser, receipt_parser,
+                    csv_exporter, sqlite_store, pipeline, metrics, progress, parquet_exporter
+                )
+            finally:
+                if sqlite_store is not None:
+                    sqlite_store.close()
+            print("\n✅ Email processing completed!")
+            return
+        
+        # Re-run the parsers over cached emails, no IMAP credentials needed
+        if args.reparse:
+            if message_cache is None:
+                print("❌ --reparse needs settings.cache_dir to be set")
+                return
+            try:
+                reparse_cache(
+                    message_cache, email_parser, receipt_parser, csv_exporter, sqlite_store, pipeline, metrics,
+                    progress, parquet_exporter
+                )
+            finally:
+                message_cache.close()
+                if sqlite_store is not None:
+                    sqlite_store.close()
+            print("\n✅ Email processing completed!")
+            return
         
         # Get user credentials
         email_address, password = input_credentials()
         
         # Connect to email server
-        if not email_connector.connect(email_address, password):
+        with metrics.stage('connect'):
+            connected = email_connector.connect(email_address, password)
+        if not connected:
             return
         
         mail = email_connector.get_connection()
         
         try:
-            # Get filtered e-receipt emails
-            filtered_emails = email_filter.get_filtered_emails(mail, MAX_PROCESS_EMAILS)
-            
-            # Process emails and save to CSV
-            if filtered_emails:
-                # Batch process emails for data extraction
-                email_records = process_emails_batch(mail, filtered_emails, email_parser, receipt_parser)
+            if args.watch:
+                full_sync = args.full_sync
+                
+                def on_new_mail(connection):
+                    nonlocal full_sync
+                    sync_mailbox(
+                        connection, email_address, email_connector, email_filter, email_parser, receipt_parser,
+                        csv_exporter, sync_state, fetcher, sqlite_store, message_cache, pipeline, metrics, progress,
+                        parquet_exporter, full_sync=full_sync
+                    )
+                    full_sync = False
                 
-                # Save to CSV
-                if email_records:
-                    csv_exporter.save_records(email_records)
-                else:
-                    print("\n⚠️  No valid email records extracted for CSV export")
+                watcher = MailboxWatcher(
+                    email_connector, idle_timeout=EMAIL_FILTERS['watch_idle_timeout'],
+                    poll_interval=EMAIL_FILTERS['watch_poll_interval'],
+                    max_backoff=EMAIL_FILTERS['watch_max_backoff']
+                )
+                print(f"\n👀 Watching {email_filter.mailbox} for new receipts (Ctrl+C to stop)")
+                try:
+                    watcher.run(on_new_mail, mail)
+                except KeyboardInterrupt:
+                    print("\n👋 Stopped watching")
             else:
-                print("\n📭 No e-receipt emails found with current filters.")
+                sync_mailbox(
+                    mail, email_address, email_connector, email_filter, email_parser, receipt_parser, csv_exporter,
+                    sync_state, fetcher, sqlite_store, message_cache, pipeline, metrics, progress, parquet_exporter,
+                    full_sync=args.full_sync
+                )
             
             # Close connection
         except Exception as e:
             print(f"❌ Error in main process: {e}")
         finally:
             email_connector.disconnect()
+            if message_cache is not None:
+                message_cache.close()
+            if sqlite_store is not None:
+                sqlite_store.close()
         print("\n✅ Email processing completed!")
         
     except Exception as e:
         print(f"❌ Error in main process: {e}")
+    finally:
+        profiler.stop(metrics)
+        if args.metrics_file:
+            try:
+                metrics.write(args.metrics_file, args.metrics_format)
+            except Exception as e:
+                print(f"⚠️  Error writing metrics: {e}")
+        summary = metrics.summary()
+        progress.event(
+            'run_finished', seconds=summary['total_seconds'], emails_per_second=summary['messages_per_second'],
+            imap_commands=summary['imap_commands_total'], bytes_fetched=summary['bytes_fetched']
+        )
+        progress.close()
+        output.close()
 
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -3,6 +3,30 @@ import os
 from typing import Dict, Any, Optional
 
 
+# Defaults for the `settings` section, used when a key is missing from YAML
+DEFAULT_SETTINGS = {
+    'date_range_days': 10,
+    'max_emails': 1000,
+    'fetch_batch_size': 50,
+    'partial_body_fetch': False,
+    'imap_client': 'imaplib',
+    'pipeline_depth': 4,
+    'connection_pool_size': 1,
+    'parse_workers': 0,
+    'parse_queue_size': 200,
+    'sender_search_mode': 'or',
+    'sender_search_chunk_size': 10,
+    'sync_state_file': 'sync_state.json',
+    'watch_idle_timeout': 540,
+    'watch_poll_interval': 60,
+    'watch_max_backoff': 300,
+    'sqlite_path': '',
+    'parquet_dir': '',
+    'parquet_row_group_size': 10000,
+    'cache_dir': '',
+    'cache_max_mb': 500,
+}
+
 class ConfigManager:
     """Manages configuration loading from YAML files with fallback support."""
     
@@ -25,12 +49,13 @@ class ConfigManager:
                 return None
             
             # Convert to EMAIL_FILTERS format
+            settings = yaml_data.get('settings') or {}
             config = {
                 'sender_domains': yaml_data.get('sender_domains', []),
                 'subject_patterns': yaml_data.get('subject_patterns', []),
-                'date_range_days': yaml_data.get('settings', {}).get('date_range_days', 10),
-                'max_emails': yaml_data.get('settings', {}).get('max_emails', 1000)
             }
+            for key, default in DEFAULT_SETTINGS.items():
+                config[key] = settings.get(key, default)
             
             # Validate required fields
             if not config['sender_domains']:
@@ -46,6 +71,19 @@ class ConfigManager:
             print(f"   - {len(config['subject_patterns'])} subject patterns")
             print(f"   - Date range: {config['date_range_days']} days")
             print(f"   - Max emails: {config['max_emails']}")
+            print(f"   - Fetch batch size: {config['fetch_batch_size']}")
+            print(f"   - Partial body fetch: {'on' if config['partial_body_fetch'] else 'off'}")
+            print(f"   - IMAP client: {config['imap_client']}"
+                  + (f" (pipeline depth {config['pipeline_depth']})" if config['imap_client'] == 'asyncio' else ''))
+            print(f"   - Connection pool size: {config['connection_pool_size']}")
+            print(f"   - Parse workers: {config['parse_workers'] or 'inline'}")
+            print(f"   - SQLite database: {config['sqlite_path'] or 'off'}")
+            print(f"   - Parquet export: {config['parquet_dir'] or 'off'}")
+            print(f"   - Message cache: {config['cache_dir'] or 'off'} (max {config['cache_max_mb']} MB)")
+            print(f"   - Watch mode: IDLE renewed every {config['watch_idle_timeout']}s, "
+                  f"reconnect backoff up to {config['watch_max_backoff']}s")
+            print(f"   - Sender search: {config['sender_search_mode']} "
+                  f"({config['sender_search_chunk_size']} domains per query)")
             
             return config
             
@@ -1,7 +1,7 @@
 # Email filtering configuration
 # Try to load from YAML first, fallback to hardcoded values
 
-from .config_manager import ConfigManager
+from .config_manager import ConfigManager, DEFAULT_SETTINGS
 
 # Initialize config manager
 config_manager = ConfigManager()
@@ -47,7 +47,6 @@ else:
             r'.*dana.*transfer.*', r'.*linkaja.*'
         ],
         
-        'date_range_days': 10,  # Only process emails from last 10 days
-        'max_emails': 1000
+        **DEFAULT_SETTINGS,  # date_range_days, max_emails, fetch/search tuning
     }
     print("📋 Using fallback hardcoded configuration") 
\ No newline at end of file
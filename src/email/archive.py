@@ -0,0 +1,137 @@
+import mmap
+import os
+import re
+
+
+ARCHIVE_FORMATS = ('mbox', 'maildir', 'eml')
+
+# mboxrd quotes body lines starting with 'From ' as '>From '
+_QUOTED_FROM_RE = re.compile(rb'\n>(>*From )')
+
+
+def detect_format(path):
+    """Guess the archive format from the path layout."""
+    if os.path.isdir(path):
+        if os.path.isdir(os.path.join(path, 'cur')) or os.path.isdir(os.path.join(path, 'new')):
+            return 'maildir'
+        return 'eml'
+    return 'mbox'
+
+
+def _header_end(data, start, end):
+    """Find the end of the header block (first blank line) in data[start:end]."""
+    candidates = [pos for pos in (data.find(b'\n\n', start, end), data.find(b'\n\r\n', start, end)) if pos != -1]
+    return min(candidates) + 1 if candidates else end
+
+
+def _message_end(data, start):
+    """End offset of the mbox message whose headers begin at `start` (the next 'From ' line)."""
+    next_separator = data.find(b'\nFrom ', max(start - 1, 0))
+    return len(data) if next_separator == -1 else next_separator + 1
+
+
+class MailArchive:
+    """Reads messages from an mbox file, a Maildir or a directory of .eml files.
+
+    Headers are read first so EmailFilter can reject messages before their
+    bodies are touched. mbox files are memory-mapped and scanned for 'From '
+    separators, so memory use doesn't grow with the archive size. Exposes the
+    BatchFetcher fetch_messages/missing_ids interface for process_emails_batch.
+    """
+
+    def __init__(self, path, archive_format=None):
+        self.path = path
+        self.format = archive_format or detect_format(path)
+        if self.format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {self.format}")
+        self.missing_ids = []
+        self._file = None
+        self._mmap = None
+
+    def _open_mbox(self):
+        if self._mmap is None:
+            self._file = open(self.path, 'rb')
+            if os.fstat(self._file.fileno()).st_size == 0:
+                self._mmap = b''
+            else:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _iter_mbox_headers(self):
+        data = self._open_mbox()
+        size = len(data)
+        pos = 0 if data[:5] == b'From ' else data.find(b'\nFrom ')
+
+        while pos != -1 and pos < size:
+            if data[pos:pos + 1] == b'\n':
+                pos += 1
+            end = _message_end(data, pos + 1)
+
+            # Skip the 'From sender date' separator line itself. Nothing is kept per
+            # message: read_message finds the end again from the start offset
+            start = data.find(b'\n', pos, end) + 1 or end
+            yield start, data[start:_header_end(data, start, end)]
+
+            pos = end - 1 if end < size else -1
+
+    def _message_files(self):
+        if self.format == 'maildir':
+            folders = [os.path.join(self.path, name) for name in ('cur', 'new')]
+            for folder in folders:
+                if os.path.isdir(folder):
+                    for name in sorted(os.listdir(folder)):
+                        if not name.startswith('.'):
+                            yield os.path.join(folder, name)
+        else:
+            for root, dirs, files in os.walk(self.path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith('.eml'):
+                        yield os.path.join(root, name)
+
+    def _iter_file_headers(self):
+        for filename in self._message_files():
+            header_lines = []
+            try:
+                with open(filename, 'rb') as file:
+                    for line in file:
+                        if line in (b'\n', b'\r\n'):
+                            break
+                        header_lines.append(line)
+            except OSError as e:
+                print(f"  ⚠️  Error reading {filename}: {e}")
+                continue
+            yield filename, b''.join(header_lines)
+
+    def iter_headers(self):
+        """Yield (message key, raw header bytes) for every message in the archive."""
+        if self.format == 'mbox':
+            return self._iter_mbox_headers()
+        return self._iter_file_headers()
+
+    def read_message(self, key):
+        """Return the full raw bytes of one message."""
+        if self.format == 'mbox':
+            data = self._open_mbox()
+            return _QUOTED_FROM_RE.sub(rb'\n\1', data[key:_message_end(data, key)])
+        with open(key, 'rb') as file:
+            return file.read()
+
+    def fetch_messages(self, mail, keys):
+        """Yield (key, raw bytes) one message at a time; `mail` is unused."""
+        self.missing_ids = []
+        for key in keys:
+            try:
+                yield key, self.read_message(key)
+            except Exception as e:
+                print(f"  ⚠️  Error reading message {key}: {e}")
+                self.missing_ids.append(key)
+
+    def close(self):
+        """Release the memory map and file handle."""
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
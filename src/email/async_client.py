@@ -0,0 +1,294 @@
+import asyncio
+import imaplib
+import ssl
+import threading
+from collections import deque
+
+
+# Responses that belong to the mailbox rather than one command; kept for response()
+MAILBOX_RESPONSES = ('EXISTS', 'RECENT', 'EXPUNGE', 'FLAGS', 'CAPABILITY')
+
+IMAPError = imaplib.IMAP4.error
+
+
+def quote(argument):
+    """Quote a string argument the way imaplib does."""
+    argument = argument.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{argument}"'
+
+
+class PendingCommand:
+    """A tagged command waiting for its completion response."""
+
+    def __init__(self, tag, name, future):
+        self.tag = tag
+        self.name = name
+        self.future = future
+        self.untagged = {}
+
+
+class AsyncIMAPClient:
+    """Minimal asyncio IMAP client that pipelines tagged commands.
+
+    Commands are written as soon as they are issued, so several can be in
+    flight on one connection. Results have the imaplib (status, data) shape,
+    which lets BatchFetcher and parse_fetch_response consume them unchanged.
+    Untagged responses are attributed to the oldest outstanding command,
+    which relies on the server answering commands in order; only pipeline
+    commands that do not depend on each other.
+    """
+
+    def __init__(self, host, port=993, use_ssl=True, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.ssl_context = ssl_context
+        self.capabilities = ()
+        self.untagged_responses = {}
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = deque()
+        self._tag_number = 0
+        self._error = None
+
+    async def connect(self):
+        """Open the connection, read the greeting and load the capabilities."""
+        context = None
+        if self.use_ssl:
+            context = self.ssl_context or ssl.create_default_context()
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+
+        greeting = await self._reader.readline()
+        if not greeting.startswith((b'* OK', b'* PREAUTH')):
+            raise IMAPError(f'Unexpected greeting: {greeting!r}')
+
+        self._reader_task = asyncio.create_task(self._read_responses())
+        await self.capability()
+        return self
+
+    async def _read_line(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError('IMAP server closed the connection')
+        return line.rstrip(b'\r\n')
+
+    def _store_untagged(self, command, name, value):
+        if command is not None:
+            command.untagged.setdefault(name, []).append(value)
+        if command is None or name in MAILBOX_RESPONSES:
+            self.untagged_responses.setdefault(name, []).append(value)
+
+    def _store_code(self, text):
+        code = imaplib.Response_code.match(text)
+        if code:
+            self.untagged_responses.setdefault(code.group('type').decode('ascii'), []).append(code.group('data'))
+
+    async def _read_untagged(self, line):
+        """Read the rest of an untagged response, storing it in imaplib's data shape."""
+        match = imaplib.Untagged_status.match(line)
+        if match:
+            name = match.group('type').decode('ascii')
+            data = match.group('data')
+            if match.group('data2'):
+                data += b' ' + match.group('data2')
+        else:
+            match = imaplib.Untagged_response.match(line)
+            if not match:
+                return
+            name = match.group('type').decode('ascii')
+            data = match.group('data') or b''
+
+        command = self._pending[0] if self._pending else None
+        if name in ('OK', 'NO', 'BAD', 'BYE'):
+            self._store_code(data)
+        elif name == 'CAPABILITY':
+            self.capabilities = tuple(data.decode('ascii').upper().split())
+
+        # Literals arrive as (line, bytes) pairs followed by the closing line
+        while True:
+            literal = imaplib.Literal.match(data)
+            if not literal:
+                break
+            value = await self._reader.readexactly(int(literal.group('size')))
+            self._store_untagged(command, name, (data, value))
+            data = await self._read_line()
+        self._store_untagged(command, name, data)
+
+    async def _read_responses(self):
+        try:
+            while True:
+                line = await self._read_line()
+                if line.startswith(b'* '):
+                    await self._read_untagged(line)
+                    continue
+                if line.startswith(b'+'):
+                    continue
+
+                tag, _, rest = line.partition(b' ')
+                tag = tag.decode('ascii', errors='replace')
+                if not self._pending or self._pending[0].tag != tag:
+                    raise IMAPError(f'Unexpected response: {line!r}')
+                command = self._pending.popleft()
+                status, _, text = rest.partition(b' ')
+                self._store_code(text)
+                if not command.future.done():
+                    command.future.set_result((status.decode('ascii'), command.untagged, text))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error = e
+            while self._pending:
+                command = self._pending.popleft()
+                if not command.future.done():
+                    command.future.set_exception(IMAPError(f'Connection lost: {e}'))
+
+    async def command(self, name, *args):
+        """Send a command and wait for its (status, data) result.
+
+        Several command() calls may be awaited concurrently; they share the
+        connection and complete in the order they were sent.
+        """
+        if self._error is not None:
+            raise IMAPError(f'Connection lost: {self._error}')
+        self._tag_number += 1
+        tag = f'A{self._tag_number:04d}'
+        future = asyncio.get_running_loop().create_future()
+        words = [tag, name] + [arg.decode('ascii') if isinstance(arg, bytes) else str(arg) for arg in args if arg is not None]
+        self._pending.append(PendingCommand(tag, name, future))
+        self._writer.write(' '.join(words).encode('utf-8') + b'\r\n')
+        await self._writer.drain()
+
+        status, untagged, text = await future
+        if status == 'BAD':
+            raise IMAPError(f'{name} command error: {status} [{text.decode(errors="replace")}]')
+        if status != 'OK':
+            return status, [text]
+        # UID FETCH / UID SEARCH answer with FETCH / SEARCH responses
+        response_name = str(args[0]).upper() if name == 'UID' and args else name
+        return status, untagged.get(response_name, [None])
+
+    async def capability(self):
+        return await self.command('CAPABILITY')
+
+    async def login(self, user, password):
+        status, data = await self.command('LOGIN', quote(user), quote(password))
+        if status != 'OK':
+            raise IMAPError(data[-1])
+        if 'CAPABILITY' not in self.untagged_responses:
+            await self.capability()
+        return status, data
+
+    async def select(self, mailbox='INBOX', readonly=False):
+        self.untagged_responses = {}
+        status, _ = await self.command('EXAMINE' if readonly else 'SELECT', quote(mailbox))
+        return status, self.untagged_responses.get('EXISTS', [None])
+
+    async def uid(self, command, *args):
+        return await self.command('UID', command.upper(), *args)
+
+    async def fetch(self, message_set, message_parts):
+        return await self.command('FETCH', message_set, message_parts)
+
+    async def search(self, charset, *criteria):
+        if charset:
+            return await self.command('SEARCH', 'CHARSET', charset, *criteria)
+        return await self.command('SEARCH', *criteria)
+
+    async def noop(self):
+        return await self.command('NOOP')
+
+    def response(self, code):
+        """Pop a saved untagged response or response code, like imaplib."""
+        return code, self.untagged_responses.pop(code.upper(), [None])
+
+    async def logout(self):
+        try:
+            result = await self.command('LOGOUT')
+        except IMAPError:
+            result = ('BYE', [None])
+        await self.close()
+        return result
+
+    async def close(self):
+        """Close the socket without a LOGOUT."""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+
+class BlockingIMAPClient:
+    """imaplib-compatible facade over AsyncIMAPClient.
+
+    The event loop runs in a daemon thread, so the blocking callers
+    (EmailFilter, BatchFetcher, ConnectionPool) can use it like an
+    imaplib.IMAP4 object. submit() returns a concurrent Future instead of
+    waiting, which is how PipelinedFetcher keeps several FETCHes in flight.
+    """
+
+    def __init__(self, host, port=993, use_ssl=True, ssl_context=None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.client = AsyncIMAPClient(host, port, use_ssl, ssl_context)
+        try:
+            self._run(self.client.connect())
+        except Exception:
+            self._stop_loop()
+            raise
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        if not self._thread.is_alive():
+            self._loop.close()
+
+    @property
+    def capabilities(self):
+        return self.client.capabilities
+
+    def submit(self, name, *args):
+        """Send a command without waiting; returns a Future of (status, data)."""
+        return asyncio.run_coroutine_threadsafe(self.client.command(name, *args), self._loop)
+
+    def login(self, user, password):
+        return self._run(self.client.login(user, password))
+
+    def select(self, mailbox='INBOX', readonly=False):
+        return self._run(self.client.select(mailbox, readonly))
+
+    def uid(self, command, *args):
+        return self._run(self.client.uid(command, *args))
+
+    def fetch(self, message_set, message_parts):
+        return self._run(self.client.fetch(message_set, message_parts))
+
+    def search(self, charset, *criteria):
+        return self._run(self.client.search(charset, *criteria))
+
+    def noop(self):
+        return self._run(self.client.noop())
+
+    def response(self, code):
+        return self.client.response(code)
+
+    def logout(self):
+        try:
+            return self._run(self.client.logout())
+        finally:
+            self._stop_loop()
+
+    def shutdown(self):
+        """Close the connection without a LOGOUT."""
+        try:
+            self._run(self.client.close())
+        finally:
+            self._stop_loop()
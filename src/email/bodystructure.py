@@ -0,0 +1,109 @@
+import hashlib
+
+
+def _upper(value):
+    return value.upper() if isinstance(value, str) else ''
+
+
+def _params(value):
+    """Turn a BODYSTRUCTURE parameter list ['CHARSET', 'utf-8', ...] into a dict."""
+    if not isinstance(value, list):
+        return {}
+    params = {}
+    for index in range(0, len(value) - 1, 2):
+        if isinstance(value[index], str) and isinstance(value[index + 1], str):
+            params[value[index].upper()] = value[index + 1]
+    return params
+
+
+def walk_parts(structure, section=''):
+    """Yield (section, part structure) for every leaf part, in email.walk() order.
+
+    `structure` is a BODYSTRUCTURE value as returned by parse_fetch_response.
+    Parts of an attached message/rfc822 are numbered under the attachment.
+    """
+    if not isinstance(structure, list) or not structure:
+        return
+
+    if isinstance(structure[0], list):
+        # Multipart: child parts come first, then the subtype and extension data
+        for index, child in enumerate(structure, 1):
+            if not isinstance(child, list):
+                break
+            yield from walk_parts(child, f'{section}.{index}' if section else str(index))
+        return
+
+    section = section or '1'
+    yield section, structure
+
+    if _upper(structure[0]) == 'MESSAGE' and _upper(structure[1]) == 'RFC822' and len(structure) > 8:
+        inner = structure[8]
+        if isinstance(inner, list) and inner:
+            yield from walk_parts(inner, section if isinstance(inner[0], list) else f'{section}.1')
+
+
+class TextPart:
+    """A text part picked from a BODYSTRUCTURE: its section and how it is encoded."""
+
+    def __init__(self, section, structure):
+        self.section = section
+        self.content_type = f"{structure[0]}/{structure[1]}".lower()
+        self.charset = _params(structure[2]).get('CHARSET')
+        self.encoding = structure[5] if len(structure) > 5 and isinstance(structure[5], str) else '7BIT'
+        size = structure[6] if len(structure) > 6 else None
+        self.size = int(size) if isinstance(size, str) and size.isdigit() else 0
+
+    def mime_headers(self):
+        """Content-Type/Content-Transfer-Encoding lines describing this part."""
+        content_type = self.content_type
+        if self.charset:
+            content_type += '; charset="%s"' % self.charset.replace('"', '')
+        return (
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Transfer-Encoding: {self.encoding.lower()}\r\n"
+        ).encode('ascii', errors='ignore')
+
+
+def select_text_parts(structure):
+    """Pick the parts EmailParser.extract_email_info reads: text/plain, else text/html.
+
+    A single-part message is always read whole, whatever its type.
+    """
+    parts = list(walk_parts(structure))
+    if len(parts) == 1 and isinstance(structure, list) and not isinstance(structure[0], list):
+        return [TextPart(*parts[0])]
+
+    text_parts = [TextPart(section, part) for section, part in parts]
+    plain = [part for part in text_parts if part.content_type == 'text/plain' and part.size > 0]
+    if plain:
+        return plain
+    return [part for part in text_parts if part.content_type == 'text/html' and part.size > 0]
+
+
+def build_partial_message(header, parts):
+    """Rebuild a small RFC822 message from fetched headers and (TextPart, body bytes) pairs.
+
+    The transfer encoding and charset of each part are restored from the
+    BODYSTRUCTURE, so the email package decodes it like the full message.
+    """
+    header = header.rstrip(b'\r\n')
+    lines = [header + b'\r\n'] if header else []
+    lines.append(b'MIME-Version: 1.0\r\n')
+
+    if len(parts) == 1:
+        part, body = parts[0]
+        lines += [part.mime_headers(), b'\r\n', body]
+        return b''.join(lines)
+
+    # Derived from the content, not random, so a message rebuilds to the same
+    # bytes in every run (and in the message cache)
+    digest = hashlib.sha1(header)
+    for part, body in parts:
+        digest.update(part.mime_headers())
+        digest.update(body)
+    boundary = ('=_partial_' + digest.hexdigest()).encode('ascii')
+    lines.append(b'Content-Type: multipart/mixed; boundary="' + boundary + b'"\r\n\r\n')
+    for part, body in parts:
+        lines += [b'--' + boundary + b'\r\n', part.mime_headers(), b'\r\n', body, b'\r\n']
+    lines.append(b'--' + boundary + b'--\r\n')
+    return b''.join(lines)
@@ -1,27 +1,51 @@
 import imaplib
 import getpass
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils.helpers import chunked
+from ..utils.metrics import InstrumentedConnection
+from .async_client import BlockingIMAPClient
+from .fetcher import BatchFetcher
 
 
 class EmailConnector:
     """Handles IMAP connections and authentication."""
     
-    def __init__(self, host="imap.gmail.com", port=993, use_ssl=True):
+    def __init__(self, host="imap.gmail.com", port=993, use_ssl=True, client='imaplib', metrics=None):
         self.host = host
         self.port = port
         self.use_ssl = use_ssl
+        # 'imaplib' or 'asyncio' (pipelining client behind an imaplib-style facade)
+        self.client = client
+        # Optional RunMetrics; every connection opened here then counts its commands
+        self.metrics = metrics
         self.connection = None
+        self._credentials = None
+    
+    def open_connection(self):
+        """Open and authenticate a new IMAP connection with the stored credentials."""
+        if self.client == 'asyncio':
+            connection = BlockingIMAPClient(self.host, self.port, use_ssl=self.use_ssl)
+        elif self.use_ssl:
+            connection = imaplib.IMAP4_SSL(self.host, self.port)
+        else:
+            connection = imaplib.IMAP4(self.host, self.port)
+        
+        if self.metrics is not None:
+            connection = InstrumentedConnection(connection, self.metrics)
+        
+        connection.login(*self._credentials)
+        return connection
     
     def connect(self, email_address, password):
         """Connect to email server and authenticate."""
         print("\nConnecting to email server...")
         
         try:
-            if self.use_ssl:
-                self.connection = imaplib.IMAP4_SSL(self.host, self.port)
-            else:
-                self.connection = imaplib.IMAP4(self.host, self.port)
-            
-            self.connection.login(email_address, password)
+            self._credentials = (email_address, password)
+            self.connection = self.open_connection()
             print("✅ Successfully connected to email server!")
             return True
             
@@ -41,4 +65,126 @@ class EmailConnector:
     
     def get_connection(self):
         """Get the current IMAP connection."""
-        return self.connection
\ No newline at end of file
+        return self.connection
+    
+    def open_pool(self, size, mailbox='INBOX', batch_size=50, text_only=False):
+        """Open a pool of `size` extra connections for concurrent fetching."""
+        pool = ConnectionPool(self, size, mailbox, batch_size, text_only=text_only)
+        pool.open()
+        return pool
+
+
+class ConnectionPool:
+    """Fetches messages concurrently over several authenticated IMAP connections.
+    
+    Exposes the same fetch_messages/missing_ids interface as BatchFetcher, so
+    it can be passed to process_emails_batch as the fetcher. Ids must be UIDs.
+    """
+    
+    def __init__(self, connector, size, mailbox='INBOX', batch_size=50, max_retries=2, text_only=False):
+        self.connector = connector
+        self.size = max(1, int(size))
+        self.mailbox = mailbox
+        self.batch_size = max(1, int(batch_size or 1))
+        self.max_retries = max_retries
+        self.text_only = text_only
+        self.missing_ids = []
+        # Idle connections; None marks a slot that needs a (re)connect
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+    
+    def _open_one(self):
+        connection = self.connector.open_connection()
+        connection.select(self.mailbox)
+        return connection
+    
+    def open(self):
+        """Open all pool connections in parallel; failed slots reconnect on use."""
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            futures = [executor.submit(self._open_one) for _ in range(self.size)]
+        
+        opened = 0
+        for future in futures:
+            try:
+                self._idle.put(future.result())
+                opened += 1
+            except Exception as e:
+                print(f"  ⚠️  Error opening pooled connection: {e}")
+                self._idle.put(None)
+        
+        print(f"✅ Opened {opened}/{self.size} pooled connections")
+        return opened
+    
+    def _discard(self, connection):
+        """Drop a broken connection without waiting for a clean LOGOUT."""
+        try:
+            connection.shutdown()
+        except Exception:
+            pass
+    
+    def _fetch_chunk(self, chunk):
+        """Fetch one chunk on a pooled connection, replacing it if it breaks."""
+        results = {}
+        pending = list(chunk)
+        
+        for attempt in range(self.max_retries + 1):
+            connection = self._idle.get()
+            try:
+                if connection is None:
+                    connection = self._open_one()
+                
+                fetcher = BatchFetcher(self.batch_size, use_uid=True, text_only=self.text_only)
+                results.update(fetcher.fetch_messages(connection, pending))
+                pending = fetcher.missing_ids
+                
+                if pending:
+                    # Distinguish a dead connection from ids that really are gone
+                    connection.noop()
+            except Exception as e:
+                print(f"  ⚠️  Pooled connection failed (attempt {attempt + 1}): {e}")
+                if connection is not None:
+                    self._discard(connection)
+                connection = None
+            finally:
+                self._idle.put(connection)
+            
+            if not pending or connection is not None:
+                break
+        
+        with self._lock:
+            self.missing_ids.extend(pending)
+        return [(email_id, results[email_id]) for email_id in chunk if email_id in results]
+    
+    def fetch_messages(self, mail, email_ids):
+        """Yield (email_id, raw RFC822 bytes) in input order, fetching chunks concurrently.
+        
+        `mail` is unused; it keeps the BatchFetcher call signature.
+        """
+        self.missing_ids = []
+        chunks = list(chunked(list(email_ids), self.batch_size))
+        
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            # Keep a bounded number of chunks in flight to cap memory use
+            in_flight = []
+            chunk_iter = iter(chunks)
+            for chunk in chunk_iter:
+                in_flight.append(executor.submit(self._fetch_chunk, chunk))
+                if len(in_flight) >= self.size * 2:
+                    break
+            
+            while in_flight:
+                future = in_flight.pop(0)
+                next_chunk = next(chunk_iter, None)
+                if next_chunk is not None:
+                    in_flight.append(executor.submit(self._fetch_chunk, next_chunk))
+                yield from future.result()
+    
+    def close(self):
+        """Log out of every pooled connection."""
+        while not self._idle.empty():
+            connection = self._idle.get_nowait()
+            if connection is not None:
+                try:
+                    connection.logout()
+                except Exception:
+                    pass
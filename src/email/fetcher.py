@@ -0,0 +1,306 @@
+import re
+from collections import deque
+
+from ..utils.helpers import chunked
+from .bodystructure import build_partial_message, select_text_parts
+
+
+# Headers prefetched for every candidate; reused later by EmailParser
+HEADER_FIELDS = ('SUBJECT', 'FROM', 'DATE', 'MESSAGE-ID')
+
+
+_OPEN = object()
+_CLOSE = object()
+_LITERAL = object()
+
+_LITERAL_RE = re.compile(rb'\{(\d+)\}$')
+_ATOM_END = b' ()\r\n'
+
+
+def compress_sequence_set(email_ids):
+    """Build a compact IMAP sequence set such as '1:50,72,90:120' from ids."""
+    numbers = sorted({int(email_id) for email_id in email_ids})
+    if not numbers:
+        return ''
+
+    ranges = []
+    start = previous = numbers[0]
+    for number in numbers[1:]:
+        if number == previous + 1:
+            previous = number
+            continue
+        ranges.append(f"{start}:{previous}" if previous != start else str(start))
+        start = previous = number
+    ranges.append(f"{start}:{previous}" if previous != start else str(start))
+
+    return ','.join(ranges)
+
+
+def _tokenize(line, tokens):
+    """Append the tokens of one IMAP response line to `tokens`."""
+    i = 0
+    length = len(line)
+
+    while i < length:
+        char = line[i:i + 1]
+
+        if char in b' \r\n':
+            i += 1
+        elif char == b'(':
+            tokens.append(_OPEN)
+            i += 1
+        elif char == b')':
+            tokens.append(_CLOSE)
+            i += 1
+        elif char == b'"':
+            # Quoted string with backslash escapes
+            value = bytearray()
+            i += 1
+            while i < length and line[i:i + 1] != b'"':
+                if line[i:i + 1] == b'\\':
+                    i += 1
+                value += line[i:i + 1]
+                i += 1
+            tokens.append(value.decode('utf-8', errors='replace'))
+            i += 1
+        elif char == b'{' and _LITERAL_RE.search(line, i):
+            # Literal marker, the data follows as a separate response element
+            tokens.append(_LITERAL)
+            break
+        else:
+            start = i
+            while i < length and line[i:i + 1] not in _ATOM_END:
+                if line[i:i + 1] == b'[':
+                    # Section specs like BODY[HEADER.FIELDS (SUBJECT)] contain spaces
+                    close = line.find(b']', i)
+                    i = close if close != -1 else length - 1
+                i += 1
+            atom = line[start:i].decode('ascii', errors='replace')
+            tokens.append(None if atom.upper() == 'NIL' else atom)
+
+
+def _parse_list(tokens, pos):
+    """Parse tokens up to the matching close paren into a nested list."""
+    values = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        pos += 1
+        if token is _CLOSE:
+            return values, pos
+        if token is _OPEN:
+            value, pos = _parse_list(tokens, pos)
+            values.append(value)
+        else:
+            values.append(token)
+    return values, pos
+
+
+def parse_fetch_response(data):
+    """Split an imaplib FETCH response into (message number, items) pairs.
+
+    imaplib returns literals as (prefix, bytes) tuples followed by the rest of
+    the line as plain bytes, so one multi-message response is a flat list that
+    has to be stitched back together per message. Item names are uppercased,
+    e.g. {'UID': '42', 'RFC822': b'...'}.
+    """
+    tokens = []
+    for part in data or []:
+        if isinstance(part, tuple):
+            _tokenize(part[0], tokens)
+            if tokens and tokens[-1] is _LITERAL:
+                tokens[-1] = part[1]
+            else:
+                tokens.append(part[1])
+        elif isinstance(part, bytes):
+            _tokenize(part, tokens)
+
+    results = []
+    pos = 0
+    while pos < len(tokens):
+        number = tokens[pos]
+        pos += 1
+        if not isinstance(number, str) or not number.isdigit():
+            continue
+        if pos >= len(tokens) or tokens[pos] is not _OPEN:
+            continue
+
+        values, pos = _parse_list(tokens, pos + 1)
+        items = {}
+        for index in range(0, len(values) - 1, 2):
+            name = values[index]
+            if isinstance(name, str):
+                items[name.upper()] = values[index + 1]
+        results.append((int(number), items))
+
+    return results
+
+
+class BatchFetcher:
+    """Fetches many messages per IMAP command using compressed sequence sets.
+    
+    With `text_only`, fetch_messages downloads the BODYSTRUCTURE first and
+    then only the text parts EmailParser reads, skipping attachments.
+    """
+
+    def __init__(self, batch_size=50, use_uid=False, text_only=False):
+        self.batch_size = max(1, int(batch_size or 1))
+        self.use_uid = use_uid
+        self.text_only = text_only
+        # Ids the server did not return during the last fetch
+        self.missing_ids = []
+        # FETCH commands that raised during the last fetch (connection errors)
+        self.errors = 0
+
+    def _fetch_chunk(self, mail, chunk, items):
+        """Run one FETCH for `chunk`; return {int id: items}, recording missing ids."""
+        message_set = compress_sequence_set(chunk)
+
+        try:
+            if self.use_uid:
+                status, data = mail.uid('FETCH', message_set, items)
+            else:
+                status, data = mail.fetch(message_set, items)
+        except Exception as e:
+            print(f"  ⚠️  Error fetching {message_set}: {e}")
+            self.missing_ids.extend(chunk)
+            self.errors += 1
+            return {}
+
+        return self._collect(chunk, message_set, status, data)
+
+    def _collect(self, chunk, message_set, status, data):
+        """Index a FETCH response by id, recording the ids it lacks."""
+        if status != 'OK':
+            print(f"  ⚠️  FETCH {message_set} failed: {status}")
+            self.missing_ids.extend(chunk)
+            return {}
+
+        fetched_by_id = {}
+        for number, fetched in parse_fetch_response(data):
+            key = fetched.get('UID') if self.use_uid else number
+            if key is not None:
+                fetched_by_id.setdefault(int(key), {}).update(fetched)
+
+        self.missing_ids.extend(email_id for email_id in chunk if int(email_id) not in fetched_by_id)
+        return fetched_by_id
+
+    def fetch(self, mail, email_ids, items='(RFC822)'):
+        """Yield (email_id, fetched items) in input order, one FETCH per chunk."""
+        self.missing_ids = []
+        self.errors = 0
+
+        for chunk in chunked(list(email_ids), self.batch_size):
+            fetched_by_id = self._fetch_chunk(mail, chunk, items)
+            for email_id in chunk:
+                fetched = fetched_by_id.get(int(email_id))
+                if fetched is not None:
+                    yield email_id, fetched
+
+    def fetch_text_parts(self, mail, email_ids):
+        """Yield (email_id, raw bytes) holding only the headers and text parts.
+        
+        Each chunk costs one BODYSTRUCTURE FETCH plus one FETCH per distinct
+        set of part sections (usually one or two).
+        """
+        self.missing_ids = []
+        self.errors = 0
+        header_item = f"BODY.PEEK[HEADER.FIELDS ({' '.join(HEADER_FIELDS)})]"
+
+        for chunk in chunked(list(email_ids), self.batch_size):
+            structures = self._fetch_chunk(mail, chunk, '(BODYSTRUCTURE)')
+
+            # Messages with the same layout are fetched together
+            parts_by_id = {}
+            groups = {}
+            for email_id in chunk:
+                fetched = structures.get(int(email_id))
+                if fetched is None:
+                    continue
+                parts = select_text_parts(fetched.get('BODYSTRUCTURE'))
+                parts_by_id[email_id] = parts
+                sections = tuple(part.section for part in parts)
+                groups.setdefault(sections, []).append(email_id)
+
+            bodies = {}
+            for sections, group_ids in groups.items():
+                items = ' '.join([header_item] + [f'BODY.PEEK[{section}]' for section in sections])
+                bodies.update(self._fetch_chunk(mail, group_ids, f'({items})'))
+
+            for email_id in chunk:
+                fetched = bodies.get(int(email_id))
+                if fetched is None:
+                    continue
+                header = next(
+                    (value for name, value in fetched.items()
+                     if name.startswith('BODY[HEADER') and isinstance(value, bytes)),
+                    b''
+                )
+                parts = [
+                    (part, fetched.get(f'BODY[{part.section}]') or b'')
+                    for part in parts_by_id[email_id]
+                ]
+                yield email_id, build_partial_message(header, parts)
+
+    def fetch_messages(self, mail, email_ids):
+        """Yield (email_id, raw RFC822 bytes) for each message that was returned."""
+        if self.text_only:
+            yield from self.fetch_text_parts(mail, email_ids)
+            return
+        for email_id, fetched in self.fetch(mail, email_ids, '(RFC822)'):
+            raw_email = fetched.get('RFC822')
+            if isinstance(raw_email, bytes):
+                yield email_id, raw_email
+
+
+class PipelinedFetcher(BatchFetcher):
+    """BatchFetcher that keeps up to `depth` chunk FETCHes in flight on one connection.
+
+    Needs a connection with submit() (BlockingIMAPClient); on a plain
+    imaplib connection it fetches one chunk at a time like BatchFetcher.
+    Results keep the input order.
+    """
+
+    def __init__(self, batch_size=50, use_uid=False, text_only=False, depth=4):
+        super().__init__(batch_size, use_uid, text_only)
+        self.depth = max(1, int(depth or 1))
+
+    def _submit(self, mail, chunk, items):
+        message_set = compress_sequence_set(chunk)
+        if self.use_uid:
+            return message_set, mail.submit('UID', 'FETCH', message_set, items)
+        return message_set, mail.submit('FETCH', message_set, items)
+
+    def _wait(self, chunk, message_set, future):
+        try:
+            status, data = future.result()
+        except Exception as e:
+            print(f"  ⚠️  Error fetching {message_set}: {e}")
+            self.missing_ids.extend(chunk)
+            self.errors += 1
+            return {}
+        return self._collect(chunk, message_set, status, data)
+
+    def fetch(self, mail, email_ids, items='(RFC822)'):
+        """Yield (email_id, fetched items) in input order, pipelining the chunk FETCHes."""
+        if not hasattr(mail, 'submit'):
+            yield from super().fetch(mail, email_ids, items)
+            return
+        self.missing_ids = []
+        self.errors = 0
+
+        in_flight = deque()
+        for chunk in chunked(list(email_ids), self.batch_size):
+            in_flight.append((chunk,) + self._submit(mail, chunk, items))
+            if len(in_flight) < self.depth:
+                continue
+            yield from self._drain_one(in_flight)
+        while in_flight:
+            yield from self._drain_one(in_flight)
+
+    def _drain_one(self, in_flight):
+        chunk, message_set, future = in_flight.popleft()
+        fetched_by_id = self._wait(chunk, message_set, future)
+        for email_id in chunk:
+            fetched = fetched_by_id.get(int(email_id))
+            if fetched is not None:
+                yield email_id, fetched
@@ -1,43 +1,216 @@
-import re
 from datetime import datetime, timedelta
+from email.message import Message
+from email.parser import BytesHeaderParser
+
+from ..utils.helpers import chunked
+from ..utils.metrics import imap_stage
+from .fetcher import HEADER_FIELDS, BatchFetcher
+from .parser import decode_mime_header
+from .subject_matcher import SubjectMatcher
+
+
+# Sender search modes:
+#   per_domain - one UID SEARCH per domain
+#   or         - one nested OR FROM query per chunk of domains
+#   gmail      - one X-GM-RAW query per chunk (falls back to `or` elsewhere)
+SENDER_SEARCH_MODES = ('per_domain', 'or', 'gmail')
+
+
+def build_or_query(keys):
+    """Combine search keys into one nested IMAP OR expression."""
+    if len(keys) == 1:
+        return keys[0]
+    return f"OR {keys[0]} {build_or_query(keys[1:])}"
+
+
+def quote(value):
+    """Quote a string for use in an IMAP command."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def header_fields(headers):
+    """Copy only the HEADER_FIELDS of a parsed header block, like the IMAP prefetch returns."""
+    kept = Message()
+    for name, value in headers.raw_items():
+        if name.upper() in HEADER_FIELDS:
+            kept.set_raw(name, value)
+    return kept
 
 
 class EmailFilter:
     """Manages email filtering logic."""
     
-    def __init__(self, config):
+    def __init__(self, config, verbose=False):
         self.config = config
+        # Print every subject match (one line per email)
+        self.verbose = verbose
         self.sender_domains = config['sender_domains']
         self.subject_patterns = config['subject_patterns']
+        self.subject_matcher = SubjectMatcher(self.subject_patterns)
         self.date_range_days = config['date_range_days']
+        self.sender_search_mode = config.get('sender_search_mode', 'or')
+        if self.sender_search_mode not in SENDER_SEARCH_MODES:
+            print(f"⚠️  Unknown sender_search_mode {self.sender_search_mode!r}, using 'or'")
+            self.sender_search_mode = 'or'
+        self.sender_search_chunk_size = config.get('sender_search_chunk_size', 10)
+        # UIDs stay stable across reconnects, sequence numbers do not
+        self.use_uid = True
+        self.fetcher = BatchFetcher(config.get('fetch_batch_size', 50), use_uid=self.use_uid)
+        self.headers = {}
+        
+        # Mailbox state from the last SELECT and the highest UID examined
+        self.mailbox = 'INBOX'
+        self.uidvalidity = None
+        self.uidnext = None
+        self.highest_uid = None
+    
+    def select_mailbox(self, mail, mailbox='INBOX'):
+        """Select a mailbox and remember its UIDVALIDITY/UIDNEXT."""
+        mail.select(mailbox)
+        self.mailbox = mailbox
+        self.uidvalidity = self._response_number(mail, 'UIDVALIDITY')
+        self.uidnext = self._response_number(mail, 'UIDNEXT')
+        return self.uidvalidity
+    
+    @staticmethod
+    def _response_number(mail, code):
+        """Read a numeric untagged response code (e.g. UIDVALIDITY) left by SELECT."""
+        try:
+            _, values = mail.response(code)
+            return int(values[-1]) if values and values[-1] is not None else None
+        except Exception:
+            return None
     
-    def filter_by_sender(self, mail):
+    def search(self, mail, criteria):
+        """Run a UID SEARCH and return the matching UIDs."""
+        status, messages = mail.uid('SEARCH', None, criteria)
+        if status == 'OK' and messages and messages[0]:
+            return messages[0].split()
+        return []
+    
+    def sender_queries(self, mail, cutoff_date, since_uid=None):
+        """Build (label, criteria) pairs for the configured sender search mode.
+        
+        With `since_uid` only UIDs above it are searched instead of the date window.
+        """
+        date_str = cutoff_date.strftime("%d-%b-%Y")
+        window = f'UID {since_uid + 1}:*' if since_uid is not None else f'SINCE "{date_str}"'
+        mode = self.sender_search_mode
+        
+        if mode == 'per_domain':
+            return [
+                (domain, f'(FROM {quote(domain)} {window})')
+                for domain in self.sender_domains
+            ]
+        
+        capabilities = getattr(mail, 'capabilities', ()) or ()
+        if mode == 'gmail' and 'X-GM-EXT-1' not in capabilities:
+            print("  ⚠️  Server does not support X-GM-RAW, using OR search")
+            mode = 'or'
+        
+        queries = []
+        for chunk in chunked(self.sender_domains, self.sender_search_chunk_size):
+            label = f"{len(chunk)} domains"
+            if mode == 'gmail':
+                raw_query = f"from:({' OR '.join(chunk)})"
+                if since_uid is None:
+                    raw_query += f" after:{cutoff_date.strftime('%Y/%m/%d')}"
+                    queries.append((label, f'X-GM-RAW {quote(raw_query)}'))
+                else:
+                    queries.append((label, f'X-GM-RAW {quote(raw_query)} {window}'))
+            else:
+                from_keys = [f'FROM {quote(domain)}' for domain in chunk]
+                queries.append((label, f'({build_or_query(from_keys)}) {window}'))
+        return queries
+    
+    def count_by_domain(self, email_ids):
+        """Count prefetched emails per sender domain (IMAP FROM is a substring match)."""
+        counts = {domain: 0 for domain in self.sender_domains}
+        for email_id in email_ids:
+            headers = self.headers.get(email_id)
+            sender = str(headers['from'] or '').lower() if headers is not None else ''
+            for domain in self.sender_domains:
+                if domain.lower() in sender:
+                    counts[domain] += 1
+        return counts
+    
+    def filter_by_sender(self, mail, since_uid=None):
         """Filter emails by sender domains using IMAP search."""
         # Calculate date range for filtering
         cutoff_date = datetime.now() - timedelta(days=self.date_range_days)
-        date_str = cutoff_date.strftime("%d-%b-%Y")
         
         all_email_ids = set()
+        search_failed = False
         
-        print(f"\n🔍 Filtering emails by sender domains (since {date_str})...")
+        if since_uid is not None:
+            print(f"\n🔍 Filtering emails by sender domains (new since UID {since_uid})...")
+        else:
+            print(f"\n🔍 Filtering emails by sender domains (since {cutoff_date.strftime('%d-%b-%Y')})...")
         
-        for domain in self.sender_domains:
+        for label, search_criteria in self.sender_queries(mail, cutoff_date, since_uid):
             try:
-                # Search for emails from this domain within date range
-                search_criteria = f'(FROM "{domain}" SINCE "{date_str}")'
-                status, messages = mail.search(None, search_criteria)
-                
-                if status == 'OK' and messages[0]:
-                    domain_emails = messages[0].split()
-                    all_email_ids.update(domain_emails)
-                    if domain_emails:
-                        print(f"  ✅ Found {len(domain_emails)} emails from {domain}")
+                domain_emails = self.search(mail, search_criteria)
+                if since_uid is not None:
+                    # 'UID n:*' always includes the newest message, even below n
+                    domain_emails = [uid for uid in domain_emails if int(uid) > since_uid]
+                all_email_ids.update(domain_emails)
+                if domain_emails and self.sender_search_mode == 'per_domain':
+                    print(f"  ✅ Found {len(domain_emails)} emails from {label}")
                 
             except Exception as e:
-                print(f"  ⚠️  Error searching {domain}: {e}")
+                print(f"  ⚠️  Error searching {label}: {e}")
+                search_failed = True
                 continue
         
-        return list(all_email_ids)
+        # Oldest first, so the most recent emails are at the end
+        email_ids = sorted(all_email_ids, key=int)
+        
+        # Everything below UIDNEXT has now been examined, unless a search failed
+        if not search_failed:
+            examined = [since_uid or 0, (self.uidnext or 1) - 1]
+            if email_ids:
+                examined.append(int(email_ids[-1]))
+            self.highest_uid = max(examined) or None
+        
+        if self.sender_search_mode != 'per_domain' and email_ids:
+            # Combined queries don't say which domain matched, use the From headers
+            self.fetch_headers(mail, email_ids)
+            for domain, count in self.count_by_domain(email_ids).items():
+                if count:
+                    print(f"  ✅ Found {count} emails from {domain}")
+        
+        return email_ids
+    
+    def fetch_headers(self, mail, email_ids):
+        """Fetch SUBJECT/FROM/DATE/MESSAGE-ID for many emails per FETCH command."""
+        items = f"(BODY.PEEK[HEADER.FIELDS ({' '.join(HEADER_FIELDS)})])"
+        header_parser = BytesHeaderParser()
+        missing = [email_id for email_id in email_ids if email_id not in self.headers]
+        
+        try:
+            with imap_stage(mail, 'headers'):
+                for email_id, fetched in self.fetcher.fetch(mail, missing, items):
+                    for name, value in fetched.items():
+                        if name.startswith('BODY[HEADER') and isinstance(value, bytes):
+                            self.headers[email_id] = header_parser.parsebytes(value)
+                            break
+        except Exception:
+            self.highest_uid = None
+            raise
+        
+        if self.fetcher.errors:
+            # The connection failed mid-prefetch; keep the saved progress as it was
+            self.highest_uid = None
+        # Emails without headers are dropped by the filters, so they must be searched again
+        self.hold_back(email_id for email_id in missing if email_id not in self.headers)
+        
+        return self.headers
+    
+    def hold_back(self, email_ids):
+        """Keep highest_uid below every id in `email_ids`, so the next run examines them again."""
+        lowest = min((int(email_id) for email_id in email_ids), default=None)
+        if lowest is not None and self.highest_uid is not None:
+            self.highest_uid = min(self.highest_uid, lowest - 1)
     
     def filter_by_subject(self, mail, email_ids):
         """Filter emails by subject patterns."""
@@ -47,39 +220,90 @@ class EmailFilter:
         filtered_emails = []
         print(f"\n🔍 Filtering {len(email_ids)} emails by subject patterns...")
         
+        # Pull the headers of every candidate in a handful of round-trips
+        self.fetch_headers(mail, email_ids)
+        
         for email_id in email_ids:
+            headers = self.headers.get(email_id)
+            if headers is None:
+                print(f"  ⚠️  No headers returned for email {email_id}")
+                continue
+            
+            subject = decode_mime_header(headers['subject']).strip()
+            if not subject:
+                continue
+            
+            # Check against all patterns in one scan
+            pattern = self.subject_matcher.match(subject)
+            if pattern:
+                filtered_emails.append(email_id)
+                if self.verbose:
+                    print(f"  ✅ Match: {subject[:50]}... ({pattern})")
+        
+        return filtered_emails
+    
+    def matches_headers(self, headers):
+        """Apply the sender and subject filters to already parsed headers."""
+        sender = str(headers['from'] or '').lower()
+        if not any(domain.lower() in sender for domain in self.sender_domains):
+            return False
+        
+        subject = decode_mime_header(headers['subject']).strip()
+        return self.subject_matcher.match(subject) is not None
+    
+    def filter_archive(self, archive, max_emails=None):
+        """Filter an offline MailArchive by headers only, before any body is read."""
+        header_parser = BytesHeaderParser()
+        self.headers = {}
+        filtered_emails = []
+        scanned = 0
+        
+        print(f"\n🔍 Filtering {archive.format} archive {archive.path} by sender and subject...")
+        
+        for key, header_bytes in archive.iter_headers():
+            scanned += 1
             try:
-                # Fetch only the header for subject checking
-                status, msg_data = mail.fetch(email_id, '(BODY[HEADER.FIELDS (SUBJECT)])')
-                
-                if status == 'OK':
-                    header_data = msg_data[0][1].decode('utf-8', errors='ignore')
-                    
-                    # Extract subject
-                    subject_match = re.search(r'Subject: (.+)', header_data, re.IGNORECASE)
-                    if subject_match:
-                        subject = subject_match.group(1).strip()
-                        
-                        # Check against patterns
-                        for pattern in self.subject_patterns:
-                            if re.search(pattern, subject, re.IGNORECASE):
-                                filtered_emails.append(email_id)
-                                print(f"  ✅ Match: {subject[:50]}...")
-                                break
-                                
+                headers = header_parser.parsebytes(header_bytes)
             except Exception as e:
-                print(f"  ⚠️  Error checking email {email_id}: {e}")
+                print(f"  ⚠️  Error parsing headers of {key}: {e}")
                 continue
+            
+            if self.matches_headers(headers):
+                filtered_emails.append(key)
+                self.headers[key] = header_fields(headers)
+        
+        # No sync state for archives, so the limit keeps the newest like a first IMAP run
+        if max_emails and len(filtered_emails) > max_emails:
+            filtered_emails = filtered_emails[-max_emails:]
+        
+        print(f"\n📧 Final result: {len(filtered_emails)} filtered e-receipt emails (of {scanned} scanned)")
         
         return filtered_emails
     
-    def get_filtered_emails(self, mail, max_emails=10):
-        """Get filtered emails that are likely e-receipts."""
+    def get_filtered_emails(self, mail, max_emails=10, last_uid=None, uidvalidity=None):
+        """Get filtered emails that are likely e-receipts.
+        
+        `last_uid`/`uidvalidity` come from the previous run's sync state; when
+        UIDVALIDITY still matches only newer UIDs are searched.
+        """
         # Select inbox
-        mail.select('INBOX')
+        self.select_mailbox(mail, self.mailbox)
+        self.headers = {}
+        self.highest_uid = None
+        
+        since_uid = None
+        if last_uid is not None:
+            if uidvalidity is None or uidvalidity != self.uidvalidity:
+                print(f"\n⚠️  UIDVALIDITY changed ({uidvalidity} -> {self.uidvalidity}), doing a full scan")
+            elif self.uidnext is not None and self.uidnext <= last_uid + 1:
+                print(f"\n📭 No new emails since last run (UID {last_uid})")
+                self.highest_uid = last_uid
+                return []
+            else:
+                since_uid = last_uid
         
         # Step 1: Filter by sender domains
-        sender_filtered_emails = self.filter_by_sender(mail)
+        sender_filtered_emails = self.filter_by_sender(mail, since_uid)
         
         if not sender_filtered_emails:
             print("\n❌ No emails found from known e-wallet/payment domains")
@@ -92,8 +316,13 @@ class EmailFilter:
             print("\n❌ No emails found matching receipt subject patterns")
             return []
         
-        # Step 3: Limit to max_emails (get most recent)
-        final_emails = subject_filtered_emails[-max_emails:] if len(subject_filtered_emails) > max_emails else subject_filtered_emails
+        # Step 3: Limit to max_emails. An incremental run works through its backlog oldest
+        # first and holds the rest back for the next run; a first or full scan keeps the newest
+        if since_uid is not None:
+            final_emails = subject_filtered_emails[:max_emails]
+            self.hold_back(subject_filtered_emails[max_emails:])
+        else:
+            final_emails = subject_filtered_emails[-max_emails:]
         
         print(f"\n📧 Final result: {len(final_emails)} filtered e-receipt emails")
         print(f"   (from {len(sender_filtered_emails)} sender matches, {len(subject_filtered_emails)} subject matches)")
@@ -1,8 +1,104 @@
+import codecs
+import functools
+import hashlib
 import re
 import html
-from email.header import decode_header
+from email.header import decode_header, make_header
 from email.utils import parsedate_to_datetime
 
+from .record import EmailRecord
+
+
+# One scan over the markup: <style>/<script> elements and comments are dropped
+# whole and every other tag becomes a word break.
+_MARKUP_RE = re.compile(
+    r'<(?:(style|script)\b.*?(?:</\1\s*>|\Z)|!--.*?(?:-->|\Z)|[^>]+>)',
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def html_to_text(content):
+    """Convert HTML (or plain text) to whitespace-collapsed text.
+    
+    Markup is removed in a single regex pass before anything else, so entity
+    unescaping and whitespace collapsing only touch the remaining text.
+    """
+    text = _MARKUP_RE.sub(' ', content)
+    if '&' in text:
+        # &nbsp; is by far the most common entity and ends up as whitespace anyway
+        text = html.unescape(text.replace('&nbsp;', ' '))
+    return ' '.join(text.split())
+
+
+# Declared Latin-1 is almost always Windows-1252 in practice (as in browsers);
+# the two only differ in 0x80-0x9F, where Latin-1 has control characters.
+_LATIN1_CODECS = {'latin-1', 'iso8859-1', 'cp1252'}
+
+
+@functools.lru_cache(maxsize=64)
+def charset_codec(charset):
+    """Python codec name for a declared MIME charset, or None to detect from the bytes.
+
+    A us-ascii label carries no information (8-bit bodies mislabelled as
+    ASCII are common), so it is treated as undeclared.
+    """
+    if not charset:
+        return None
+    try:
+        name = codecs.lookup(charset.strip().strip('"\'')).name
+    except LookupError:
+        return None
+    if name == 'ascii':
+        return None
+    return 'cp1252' if name in _LATIN1_CODECS else name
+
+
+def decode_payload(content, charset=None):
+    """Decode a text part's bytes, trusting the declared charset first.
+    
+    Without a usable declaration (missing, unknown or wrong) the bytes
+    decide: pure ASCII, then strict UTF-8 (random 8-bit text is almost
+    never valid UTF-8), then Windows-1252, a superset of Latin-1 that
+    never raises with errors='replace'. A correctly labelled part costs
+    exactly one decode.
+    """
+    codec = charset_codec(charset)
+    if codec is not None:
+        try:
+            return content.decode(codec)
+        except (UnicodeDecodeError, LookupError):
+            pass
+    if content.isascii():
+        return content.decode('ascii')
+    if codec != 'utf-8':
+        try:
+            return content.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    return content.decode('cp1252', errors='replace')
+
+
+def fallback_email_id(sender, subject, date, text):
+    """Id for an email without a Message-ID: a digest of its header fields and decoded text.
+    
+    Full and text-only fetches (and cached copies of either) decode to the
+    same values, so the id doesn't depend on which bytes were fetched.
+    """
+    digest = hashlib.sha1()
+    for value in (sender, subject, date, text):
+        digest.update(str(value or '').encode('utf-8', errors='surrogateescape') + b'\0')
+    return f"no-id-{digest.hexdigest()}"
+
+
+def decode_mime_header(value):
+    """Decode an RFC 2047 encoded header value into a plain string."""
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return str(value)
+
 
 class EmailParser:
     """Extracts and processes email content."""
@@ -15,16 +111,8 @@ class EmailParser:
         try:
             content = part.get_payload(decode=True)
             if content:
-                # Handle different encodings
                 if isinstance(content, bytes):
-                    # Try different encodings
-                    for encoding in ['utf-8', 'iso-8859-1', 'windows-1252']:
-                        try:
-                            return content.decode(encoding)
-                        except (UnicodeDecodeError, AttributeError):
-                            continue
-                    # If all fail, use error handling
-                    return content.decode('utf-8', errors='ignore')
+                    return decode_payload(content, part.get_content_charset())
                 return str(content)
             return ""
         except Exception as e:
@@ -41,33 +129,27 @@ class EmailParser:
         if isinstance(body_content, bytes):
             body_content = body_content.decode('utf-8', errors='ignore')
         
-        # Unescape HTML entities first
-        cleaned_text = html.unescape(body_content)
-        
-        # Remove HTML tags using regex
-        cleaned_text = re.sub(r'<[^>]+>', '', cleaned_text)
-        
-        # Remove excessive whitespace and normalize line breaks
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
-        cleaned_text = re.sub(r'\n\s*\n', '\n', cleaned_text)
+        return html_to_text(body_content)
+    
+    def extract_email_info(self, email_message, headers=None):
+        """Extract complete information from an email message as an EmailRecord.
         
-        # Strip leading/trailing whitespace
-        cleaned_text = cleaned_text.strip()
+        `headers` may hold SUBJECT/FROM/DATE/MESSAGE-ID already fetched by
+        EmailFilter; they are used instead of the message's own headers.
+        Emails without a Message-ID get a fallback id from fallback_email_id.
+        """
+        header_source = headers if headers is not None else email_message
         
-        return cleaned_text
-    
-    def extract_email_info(self, email_message):
-        """Extract complete information from an email message for CSV export."""
         # Extract subject
-        subject = decode_header(email_message['subject'])[0][0]
+        subject = decode_header(header_source['subject'])[0][0]
         if isinstance(subject, bytes):
             subject = subject.decode('utf-8', errors='ignore')
         
         # Extract sender (from)
-        sender = email_message['from']
+        sender = header_source['from']
         
         # Extract and normalize date to ISO format
-        raw_date = email_message['date']
+        raw_date = header_source['date']
         try:
             # Parse email date and convert to ISO format
             parsed_date = parsedate_to_datetime(raw_date)
@@ -76,8 +158,8 @@ class EmailParser:
             # Fallback to raw date if parsing fails
             normalized_date = raw_date
         
-        # Extract unique email ID (Message-ID)
-        email_id = email_message['Message-ID'] or f"no-id-{hash(str(email_message))}"
+        # Extract unique email ID (Message-ID); the fallback needs the text, below
+        email_id = header_source['Message-ID']
         
         # Get email body content with robust extraction
         body_content = ""
@@ -114,11 +196,8 @@ class EmailParser:
         # Clean raw message content
         raw_message = self.clean_raw_message(body_content)
         
-        return {
-            'from': sender,
-            'subject': subject,
-            'date': normalized_date,
-            'email_id': email_id,
-            'raw': raw_message,
-            'body_content': body_content  # Keep original for amount extraction
-        } 
\ No newline at end of file
+        if not email_id:
+            email_id = fallback_email_id(sender, subject, normalized_date, raw_message)
+        
+        # The body is kept for amount extraction; ReceiptParser drops it afterwards
+        return EmailRecord(sender, subject, normalized_date, email_id, raw_message, body=body_content) 
\ No newline at end of file
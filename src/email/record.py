@@ -0,0 +1,65 @@
+class EmailRecord:
+    """One parsed email on its way from EmailParser to the exporters.
+
+    Slots instead of a dict: one small object per email, and a fixed set of
+    fields. `body` holds the decoded text/HTML only until ReceiptParser has
+    read the amount from it. Exporters look fields up by their column name
+    with get()/[] ('from' is the sender).
+    """
+
+    __slots__ = (
+        'sender', 'subject', 'date', 'email_id', 'raw', 'body', 'total_amount',
+        'currency', 'merchant', 'transaction_date', 'reference_id',
+    )
+
+    # Column name -> attribute, for the exporters' field-driven lookups
+    FIELDS = {
+        'from': 'sender',
+        'subject': 'subject',
+        'date': 'date',
+        'email_id': 'email_id',
+        'raw': 'raw',
+        'total_amount': 'total_amount',
+        'currency': 'currency',
+        'merchant': 'merchant',
+        'transaction_date': 'transaction_date',
+        'reference_id': 'reference_id',
+    }
+
+    def __init__(self, sender, subject, date, email_id, raw, body=None, total_amount=None,
+                 currency=None, merchant=None, transaction_date=None, reference_id=None):
+        self.sender = sender
+        self.subject = subject
+        self.date = date
+        self.email_id = email_id
+        self.raw = raw
+        self.body = body
+        self.total_amount = total_amount
+        self.currency = currency
+        self.merchant = merchant
+        self.transaction_date = transaction_date
+        self.reference_id = reference_id
+
+    def get(self, field, default=None):
+        attribute = self.FIELDS.get(field)
+        if attribute is None:
+            return default
+        value = getattr(self, attribute)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return getattr(self, self.FIELDS[field])
+
+    def as_dict(self):
+        """The exported fields as a plain dict."""
+        return {field: getattr(self, attribute) for field, attribute in self.FIELDS.items()}
+
+    def __eq__(self, other):
+        if not isinstance(other, EmailRecord):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f"EmailRecord(email_id={self.email_id!r}, total_amount={self.total_amount!r})"
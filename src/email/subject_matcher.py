@@ -0,0 +1,65 @@
+import re
+
+
+def _strip_wildcards(pattern):
+    """Drop leading/trailing '.*', which never change the outcome of re.search."""
+    body = pattern
+    while body.startswith('.*'):
+        body = body[2:]
+    while body.endswith('.*'):
+        # Keep escaped dots such as r'\.*'
+        backslashes = len(body[:-2]) - len(body[:-2].rstrip('\\'))
+        if backslashes % 2:
+            break
+        body = body[:-2]
+    return body
+
+
+class SubjectMatcher:
+    """Matches a subject against all configured patterns in a single scan.
+
+    Patterns are compiled once into one case-insensitive alternation with a
+    named group per pattern, so `match` reports which pattern hit. Patterns
+    that cannot live inside an alternation (global inline flags, numbered
+    backreferences, group names already used by another pattern) are kept
+    as separately compiled fallbacks.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._fallback = []
+
+        alternatives = []
+        for index, pattern in enumerate(self.patterns):
+            body = _strip_wildcards(pattern)
+            alternative = f'(?P<p{index}>{body})'
+            try:
+                if re.search(r'\\\d', body):
+                    raise re.error('numbered backreference')
+                # Compiled with the alternatives so far, since named groups in the
+                # patterns themselves may clash with each other or with p<index>
+                re.compile('|'.join(alternatives + [alternative]))
+                alternatives.append(alternative)
+            except re.error:
+                try:
+                    self._fallback.append((pattern, re.compile(pattern, re.IGNORECASE)))
+                except re.error as e:
+                    print(f"⚠️  Skipping invalid subject pattern {pattern!r}: {e}")
+
+        self._regex = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def match(self, subject):
+        """Return the pattern that matched first in the subject, or None."""
+        if not subject:
+            return None
+
+        if self._regex is not None:
+            match = self._regex.search(subject)
+            if match:
+                return self.patterns[int(match.lastgroup[1:])]
+
+        for pattern, regex in self._fallback:
+            if regex.search(subject):
+                return pattern
+
+        return None
@@ -0,0 +1,200 @@
+import errno
+import imaplib
+import re
+import select
+import socket
+import ssl
+import threading
+import time
+
+
+# RFC 2177: servers may drop a client idling for 30 minutes, so IDLE is re-issued well before that
+DEFAULT_IDLE_TIMEOUT = 9 * 60
+
+EXISTS_RE = re.compile(rb'^\* \d+ EXISTS\b', re.IGNORECASE)
+
+# Errors that mean the connection or the server went away. Anything else raised while
+# processing, such as a full disk or an unwritable CSV, stops the watcher instead.
+CONNECTION_ERRORS = (imaplib.IMAP4.error, ConnectionError, TimeoutError, socket.gaierror, ssl.SSLError, EOFError)
+NETWORK_ERRNOS = {errno.ENETDOWN, errno.ENETUNREACH, errno.ENETRESET, errno.EHOSTDOWN, errno.EHOSTUNREACH}
+
+
+def is_connection_error(error):
+    """True if `error` means the IMAP connection is gone and reconnecting may help."""
+    return isinstance(error, CONNECTION_ERRORS) or (isinstance(error, OSError) and error.errno in NETWORK_ERRNOS)
+
+
+def exists_since_select(mail):
+    """True if the server reported EXISTS after the last SELECT; clears the reports.
+
+    Notifications that arrive during other commands (the sync's SEARCH and
+    FETCH) are kept by imaplib in untagged_responses, where IDLE never sees
+    them. SELECT resets that dict and adds its own EXISTS first, so any
+    further entry is mail that arrived since.
+    """
+    _, counts = mail.response('EXISTS')
+    return len([count for count in counts if count is not None]) > 1
+
+
+def _read_line(mail):
+    """Read one response line, treating EOF and BYE as a dropped connection."""
+    line = mail.readline()
+    if not line:
+        raise imaplib.IMAP4.abort('connection closed by server')
+    if line.upper().startswith(b'* BYE'):
+        raise imaplib.IMAP4.abort(line.decode('utf-8', errors='replace').strip())
+    return line
+
+
+def _pending_input(mail):
+    """True when a response is buffered or waiting on the socket; never blocks.
+
+    imaplib reads through a buffered file, so a notification that arrived in
+    the same packet as the previous line may already sit in its buffer, where
+    select() cannot see it.
+    """
+    sock = mail.sock
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def _finish_idle(mail, tag):
+    """Send DONE and read up to the tagged IDLE response; returns True if EXISTS came in meanwhile."""
+    mail.send(b'DONE\r\n')
+    new_mail = False
+    while True:
+        line = _read_line(mail)
+        if line.startswith(tag + b' '):
+            break
+        new_mail = new_mail or bool(EXISTS_RE.match(line))
+    if not line[len(tag) + 1:].upper().startswith(b'OK'):
+        raise imaplib.IMAP4.error(f"IDLE failed: {line.decode('utf-8', errors='replace').strip()}")
+    return new_mail
+
+
+def idle(mail, timeout=DEFAULT_IDLE_TIMEOUT, stop_event=None):
+    """Hold an imaplib connection in IDLE until new mail, `timeout` seconds or `stop_event`.
+
+    Returns True when the server reported EXISTS. imaplib has no IDLE
+    command, so this speaks it over the connection's socket directly; the
+    connection is back to normal (IDLE ended with DONE) when it returns.
+    """
+    tag = mail._new_tag()
+    mail.send(tag + b' IDLE\r\n')
+    new_mail = False
+    while True:
+        line = _read_line(mail)
+        if line.startswith(b'+'):
+            break
+        if line.startswith(tag + b' '):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line.decode('utf-8', errors='replace').strip()}")
+        new_mail = new_mail or bool(EXISTS_RE.match(line))
+
+    deadline = time.monotonic() + timeout
+    try:
+        while not new_mail and not (stop_event is not None and stop_event.is_set()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Wake up every second to notice stop_event
+            if _pending_input(mail) or select.select([mail.sock], [], [], min(remaining, 1.0))[0]:
+                new_mail = bool(EXISTS_RE.match(_read_line(mail)))
+    except KeyboardInterrupt:
+        # Leave IDLE so the caller can still log out cleanly
+        _finish_idle(mail, tag)
+        raise
+
+    return _finish_idle(mail, tag) or new_mail
+
+
+def poll(mail, interval, stop_event):
+    """Wait `interval` seconds, then NOOP; returns True if the server reported EXISTS."""
+    if stop_event.wait(interval):
+        return False
+    mail.noop()
+    _, counts = mail.response('EXISTS')
+    return bool(counts and counts[-1] is not None)
+
+
+class MailboxWatcher:
+    """Keeps one IMAP connection waiting for new mail and calls back when it arrives.
+
+    `on_new_mail(mail)` must select the mailbox and process what is new; it
+    runs after every (re)connect, to catch up on mail that arrived while
+    disconnected, after each EXISTS notification, and again straight away
+    when mail arrived while it was running. Between calls the
+    connection sits in IDLE, or is polled with NOOP every `poll_interval`
+    seconds on servers without the IDLE capability. A dropped connection is
+    reopened through the EmailConnector, waiting `initial_backoff` seconds
+    and doubling up to `max_backoff` while reconnects keep failing. Other
+    errors from `on_new_mail` are raised.
+
+    IDLE needs the plain imaplib client; the connector must not use 'asyncio'.
+    """
+
+    def __init__(self, connector, idle_timeout=DEFAULT_IDLE_TIMEOUT, poll_interval=60, max_backoff=300,
+                 initial_backoff=1):
+        self.connector = connector
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.max_backoff = max(initial_backoff, max_backoff)
+        self.initial_backoff = initial_backoff
+        self.reconnects = 0
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Make run() return; safe to call from another thread."""
+        self._stop.set()
+
+    def _discard(self, mail):
+        """Drop a broken connection without waiting for a clean LOGOUT."""
+        try:
+            mail.shutdown()
+        except Exception:
+            pass
+
+    def _reconnect(self):
+        print(f"🔌 Reconnecting to {self.connector.host}...")
+        mail = self.connector.open_connection()
+        self.connector.connection = mail
+        self.reconnects += 1
+        print("✅ Reconnected")
+        return mail
+
+    def wait_for_mail(self, mail):
+        """Block until the server reports new mail; returns False on idle timeout or stop()."""
+        if exists_since_select(mail):
+            return True
+        if 'IDLE' in getattr(mail, 'capabilities', ()):
+            return idle(mail, self.idle_timeout, self._stop)
+        return poll(mail, self.poll_interval, self._stop)
+
+    def run(self, on_new_mail, mail=None):
+        """Watch until stop() is called, starting with the already open connection `mail` if given."""
+        backoff = self.initial_backoff
+        while not self._stop.is_set():
+            try:
+                if mail is None:
+                    mail = self._reconnect()
+                on_new_mail(mail)
+                backoff = self.initial_backoff
+
+                while not self._stop.is_set():
+                    if self.wait_for_mail(mail):
+                        on_new_mail(mail)
+            except Exception as e:
+                if not is_connection_error(e):
+                    raise
+                print(f"⚠️  Connection lost ({e}), reconnecting in {backoff}s")
+                if mail is not None:
+                    self._discard(mail)
+                mail = None
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        return mail
@@ -0,0 +1,117 @@
+import email
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from ..email.parser import EmailParser
+from .receipt_parser import ReceiptParser
+
+
+# Parsers are created once per worker process
+_parsers = None
+
+_DONE = object()
+
+
+def parse_raw_email(raw_email, headers=None):
+    """Turn raw RFC822 bytes into an EmailRecord (runs inside a worker process)."""
+    global _parsers
+    if _parsers is None:
+        _parsers = (EmailParser(), ReceiptParser())
+    email_parser, receipt_parser = _parsers
+
+    email_message = email.message_from_bytes(raw_email)
+    email_info = email_parser.extract_email_info(email_message, headers)
+    return receipt_parser.parse_receipt_data(email_info)
+
+
+class ParsePipeline:
+    """Overlaps IMAP fetching with parsing in a pool of worker processes.
+
+    A fetch thread pushes raw RFC822 bytes onto a bounded queue while the
+    caller's thread hands them to a ProcessPoolExecutor. Results come back in
+    fetch order as (email_id, EmailRecord or exception) pairs.
+    """
+
+    def __init__(self, workers=None, queue_size=200):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = max(1, int(queue_size))
+
+    @staticmethod
+    def _put(raw_queue, stop, item):
+        """Queue `item`, giving up once `stop` is set; returns False if it was not queued."""
+        while not stop.is_set():
+            try:
+                raw_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch_into(self, raw_queue, stop, fetcher, mail, email_ids):
+        """Fetch thread: fill the queue, then signal completion (or the error).
+
+        Stops when `stop` is set, so it never blocks on a queue nobody reads.
+        """
+        try:
+            for email_id, raw_email in fetcher.fetch_messages(mail, email_ids):
+                if not self._put(raw_queue, stop, (email_id, raw_email)):
+                    return
+        except Exception as e:
+            self._put(raw_queue, stop, (None, e))
+        self._put(raw_queue, stop, _DONE)
+
+    def run(self, fetcher, mail, email_ids, headers=None):
+        """Yield (email_id, result) where result is an EmailRecord or an exception.
+
+        An exception raised by the fetcher is re-raised once the emails
+        fetched before it have been yielded, as with inline parsing.
+        """
+        headers = headers or {}
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        fetch_thread = threading.Thread(
+            target=self._fetch_into, args=(raw_queue, stop, fetcher, mail, email_ids), daemon=True
+        )
+        fetch_thread.start()
+        fetch_error = None
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                in_flight = []
+                done = False
+
+                try:
+                    while not done or in_flight:
+                        # Keep every worker busy, without pulling the whole queue into memory
+                        while not done and len(in_flight) < self.workers * 2:
+                            item = raw_queue.get()
+                            if item is _DONE:
+                                done = True
+                                break
+                            email_id, raw_email = item
+                            if email_id is None:
+                                fetch_error = raw_email
+                                continue
+                            future = executor.submit(parse_raw_email, raw_email, headers.get(email_id))
+                            in_flight.append((email_id, future))
+
+                        if not in_flight:
+                            continue
+
+                        email_id, future = in_flight.pop(0)
+                        try:
+                            yield email_id, future.result()
+                        except Exception as e:
+                            yield email_id, e
+                finally:
+                    # The consumer may stop early; don't parse what it will never read
+                    for _, future in in_flight:
+                        future.cancel()
+        finally:
+            stop.set()
+            fetch_thread.join()
+
+        if fetch_error is not None:
+            raise fetch_error
@@ -1,17 +1,193 @@
 import re
+from datetime import datetime
+
+from .wallets import DEFAULT_REGISTRY, GENERIC_PARSER
+
+
+# Amount patterns in priority order: the first pattern that matches anywhere in
+# the text wins. The old case variants (total/Total/TOTAL, ...) are covered by
+# IGNORECASE. Every pattern starts with an anchor keyword, so one scan for the
+# keywords finds every position where any of them can match.
+AMOUNT_PATTERNS = [
+    ('total', r'total\s*:?\s*Rp\s*([\d.,]+)'),                # total: Rp 123.456, total Rp 123.456
+    ('total', r'total\s+paid\s*:?\s*Rp\s*([\d.,]+)'),         # Total Paid: Rp 123.456
+    ('rp', r'Rp\s*([\d.,]+)\s*\(?total\)?'),                  # Rp 123.456 total, Rp 123.456 (total)
+    ('amount', r'amount\s*:?\s*Rp\s*([\d.,]+)'),              # amount: Rp 123.456
+    ('total', r'total\s*:?\s*([\d.,]+)'),                     # total: 123.456 (no currency symbol)
+    ('rp', r'Rp\s*([\d.,]+)'),                                # Rp 123.456 (anywhere in text)
+    ('idr', r'IDR\s*([\d.,]+)'),                              # IDR 123.456
+    ('rupiah', r'Rupiah\s*([\d.,]+)'),                        # Rupiah 123.456
+]
+
+_COMPILED_AMOUNT_PATTERNS = [
+    (anchor, re.compile(pattern, re.IGNORECASE)) for anchor, pattern in AMOUNT_PATTERNS
+]
+
+# Searching lowercased text is several times faster than an IGNORECASE alternation
+_AMOUNT_ANCHOR_RE = re.compile(r'total|amount|rupiah|rp|idr')
+_AMOUNT_ANCHOR_IGNORECASE_RE = re.compile(_AMOUNT_ANCHOR_RE.pattern, re.IGNORECASE)
+
+_PATTERNS_BY_ANCHOR = {}
+for _priority, (_anchor, _regex) in enumerate(_COMPILED_AMOUNT_PATTERNS):
+    _PATTERNS_BY_ANCHOR.setdefault(_anchor, []).append((_priority, _regex))
+
+
+def parse_idr_amount(amount_str):
+    """Convert an IDR amount string (e.g. '123.456,78') to float, or None."""
+    # Handle IDR format: remove dots (thousand separators) and replace comma with dot (decimal)
+    # IDR format: 123.456,78 -> 123456.78
+    if '.' in amount_str and ',' in amount_str:
+        # Has both dots and commas - assume IDR format
+        amount_str = amount_str.replace('.', '').replace(',', '.')
+    elif '.' in amount_str and ',' not in amount_str:
+        # Only dots - could be IDR or decimal, check if it looks like IDR (3+ digits after dot)
+        parts = amount_str.split('.')
+        if len(parts) > 1 and len(parts[-1]) <= 2:
+            # Looks like decimal format (e.g., 123.45)
+            amount_str = amount_str.replace(',', '')
+        else:
+            # Looks like IDR format (e.g., 123.456)
+            amount_str = amount_str.replace('.', '').replace(',', '.')
+    else:
+        # No dots or only commas - treat as regular decimal
+        amount_str = amount_str.replace(',', '')
+    
+    try:
+        return float(amount_str)
+    except ValueError:
+        return None
+
+
+# English and Indonesian month names and abbreviations
+MONTHS = {
+    'jan': 1, 'januari': 1, 'january': 1, 'feb': 2, 'februari': 2, 'february': 2,
+    'mar': 3, 'maret': 3, 'march': 3, 'apr': 4, 'april': 4, 'mei': 5, 'may': 5,
+    'jun': 6, 'juni': 6, 'june': 6, 'jul': 7, 'juli': 7, 'july': 7,
+    'agu': 8, 'agt': 8, 'ags': 8, 'aug': 8, 'agustus': 8, 'august': 8,
+    'sep': 9, 'sept': 9, 'september': 9, 'okt': 10, 'oct': 10, 'oktober': 10, 'october': 10,
+    'nov': 11, 'nopember': 11, 'november': 11, 'des': 12, 'dec': 12, 'desember': 12, 'december': 12,
+}
+
+_DATE_PATTERNS = [
+    # 12 Okt 2024 09:40, 12 October 2024, 09.40 WIB
+    re.compile(r'(?P<day>\d{1,2})\s+(?P<month>[A-Za-z]{3,9})\.?\s+(?P<year>\d{4})'
+               r'(?:\s*,?\s*(?:pukul\s+)?(?P<hour>\d{1,2})[:.](?P<minute>\d{2})(?:[:.](?P<second>\d{2}))?)?'),
+    # 2024-10-12 09:40:00
+    re.compile(r'(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})'
+               r'(?:[ T](?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?)?'),
+    # 12/10/2024 09:40 (day first, as in Indonesia)
+    re.compile(r'(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{4})'
+               r'(?:\s+(?P<hour>\d{1,2})[:.](?P<minute>\d{2})(?:[:.](?P<second>\d{2}))?)?'),
+]
+
+# The amount right after a total label, with its currency marker in front or behind
+_LABELED_AMOUNT_RE = re.compile(
+    r'(?P<prefix>Rp\.?|IDR|Rupiah|S\$|SGD|RM|MYR|€|EUR|US\$|USD|\$)?\s*(?P<number>\d[\d.,]*\d|\d)'
+    r'(?:\s*(?P<suffix>IDR|Rupiah|SGD|MYR|EUR|USD)(?![A-Za-z]))?',
+    re.IGNORECASE
+)
+
+# Smallest unmarked number taken as a labeled total; below it, 'Jumlah: 2' is a quantity
+MIN_BARE_AMOUNT = 1000
+
+# Currency markers, checked in order (S$ before $)
+CURRENCY_MARKERS = [
+    ('IDR', re.compile(r'\bRp|\bIDR(?![A-Za-z])|\bRupiah\b', re.IGNORECASE)),
+    ('SGD', re.compile(r'S\$|\bSGD(?![A-Za-z])')),
+    ('MYR', re.compile(r'\bRM\s*\d|\bMYR(?![A-Za-z])')),
+    ('EUR', re.compile(r'€|\bEUR(?![A-Za-z])')),
+    ('USD', re.compile(r'\$|\bUSD(?![A-Za-z])')),
+]
+
+# The generic amount patterns are all rupiah (or unmarked) amounts
+DEFAULT_CURRENCY = 'IDR'
+
+
+def detect_currency(value):
+    """Currency code printed with an amount, or None."""
+    for code, pattern in CURRENCY_MARKERS:
+        if pattern.search(value):
+            return code
+    return None
+
+
+def parse_transaction_date(value):
+    """Normalize a printed transaction date to 'YYYY-MM-DD HH:MM:SS', or None."""
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(value or '')
+        if not match:
+            continue
+        month = match.group('month')
+        month = int(month) if month.isdigit() else MONTHS.get(month.lower())
+        if month is None:
+            continue
+        try:
+            parsed = datetime(
+                int(match.group('year')), month, int(match.group('day')),
+                int(match.group('hour') or 0), int(match.group('minute') or 0), int(match.group('second') or 0)
+            )
+        except ValueError:
+            continue
+        return parsed.strftime('%Y-%m-%d %H:%M:%S')
+    return None
+
+
+def find_amount_candidates(text):
+    """Find the leftmost match of every amount pattern in a single keyword scan.
+    
+    Returns {priority: amount string}. Scanning stops early once the
+    top-priority pattern has produced a parseable amount.
+    """
+    candidates = {}
+    remaining = len(_COMPILED_AMOUNT_PATTERNS)
+    
+    # Scan a lowercased copy for keywords; offsets only line up if lowering kept the length
+    haystack = text.lower()
+    anchor_re = _AMOUNT_ANCHOR_RE
+    if len(haystack) != len(text):
+        haystack, anchor_re = text, _AMOUNT_ANCHOR_IGNORECASE_RE
+    anchor_match = anchor_re.search(haystack)
+    
+    while anchor_match:
+        position = anchor_match.start()
+        for priority, regex in _PATTERNS_BY_ANCHOR[anchor_match.group(0).lower()]:
+            if priority in candidates:
+                continue
+            match = regex.match(text, position)
+            if match:
+                candidates[priority] = match.group(1)
+                remaining -= 1
+        
+        if not remaining or (0 in candidates and parse_idr_amount(candidates[0]) is not None):
+            break
+        
+        # Resume one character later so overlapping keywords ("IDRp", "amountotal") are seen
+        anchor_match = anchor_re.search(haystack, position + 1)
+    
+    return candidates
 
 
 class ReceiptParser:
-    """Parses transaction data from email content."""
+    """Parses transaction data from email content.
+    
+    Emails are read by their printed labels (total, merchant, date,
+    reference), using the wallet-specific parser for the sender from
+    `registry` or else `generic_parser`. The generic amount patterns are
+    the fallback when no labeled total is found.
+    """
     
-    def __init__(self):
-        pass
+    def __init__(self, registry=None, generic_parser=None):
+        self.registry = registry if registry is not None else DEFAULT_REGISTRY
+        self.generic_parser = generic_parser if generic_parser is not None else GENERIC_PARSER
     
     def extract_total_amount(self, text):
         """
         Extract total amount from text using regex.
         Looks for patterns like 'total: Rp 123.456', 'Total: 123.456', 'TOTAL Rp 123.456', etc.
         Supports IDR (Indonesian Rupiah) currency format.
+        
+        All candidates are collected in one pass over the text, then ranked by
+        AMOUNT_PATTERNS priority; the best one that parses is returned.
         """
         if not text:
             return None
@@ -20,70 +196,66 @@ class ReceiptParser:
         if isinstance(text, bytes):
             text = text.decode('utf-8', errors='ignore')
         
-        # Multiple regex patterns to catch different total formats (IDR focused)
-        patterns = [
-            # IDR specific patterns
-            r'total\s*:?\s*Rp\s*([\d.,]+)',  # total: Rp 123.456, total Rp 123.456
-            r'Total\s*:?\s*Rp\s*([\d.,]+)',  # Total: Rp 123.456, Total Rp 123.456
-            r'TOTAL\s*:?\s*Rp\s*([\d.,]+)',  # TOTAL: Rp 123.456, TOTAL Rp 123.456
-            r'total\s+paid\s*:?\s*Rp\s*([\d.,]+)',  # Total Paid: Rp 123.456, total paid Rp 123.456
-            r'Total\s+Paid\s*:?\s*Rp\s*([\d.,]+)',  # Total Paid: Rp 123.456, Total Paid Rp 123.456
-            r'TOTAL\s+PAID\s*:?\s*Rp\s*([\d.,]+)',  # TOTAL PAID: Rp 123.456, TOTAL PAID Rp 123.456
-            r'Rp\s*([\d.,]+)\s*\(?total\)?',  # Rp 123.456 total, Rp 123.456 (total)
-            r'amount\s*:?\s*Rp\s*([\d.,]+)',  # amount: Rp 123.456
-            r'Amount\s*:?\s*Rp\s*([\d.,]+)',  # Amount: Rp 123.456
-            
-            # IDR without currency symbol
-            r'total\s*:?\s*([\d.,]+)',  # total: 123.456, total 123.456
-            r'Total\s*:?\s*([\d.,]+)',  # Total: 123.456, Total 123.456
-            r'TOTAL\s*:?\s*([\d.,]+)',  # TOTAL: 123.456, TOTAL 123.456
-            
-            # Alternative IDR formats
-            r'Rp\s*([\d.,]+)',  # Rp 123.456 (anywhere in text)
-            r'IDR\s*([\d.,]+)',  # IDR 123.456
-            r'Rupiah\s*([\d.,]+)',  # Rupiah 123.456
-            
-        ]
+        candidates = find_amount_candidates(text)
+        for priority in sorted(candidates):
+            amount = parse_idr_amount(candidates[priority])
+            if amount is not None:
+                return amount
         
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                amount_str = match.group(1)
-                # Handle IDR format: remove dots (thousand separators) and replace comma with dot (decimal)
-                # IDR format: 123.456,78 -> 123456.78
-                if '.' in amount_str and ',' in amount_str:
-                    # Has both dots and commas - assume IDR format
-                    amount_str = amount_str.replace('.', '').replace(',', '.')
-                elif '.' in amount_str and ',' not in amount_str:
-                    # Only dots - could be IDR or decimal, check if it looks like IDR (3+ digits after dot)
-                    parts = amount_str.split('.')
-                    if len(parts) > 1 and len(parts[-1]) <= 2:
-                        # Looks like decimal format (e.g., 123.45)
-                        amount_str = amount_str.replace(',', '')
-                    else:
-                        # Looks like IDR format (e.g., 123.456)
-                        amount_str = amount_str.replace('.', '').replace(',', '.')
-                else:
-                    # No dots or only commas - treat as regular decimal
-                    amount_str = amount_str.replace(',', '')
-                
-                try:
-                    return float(amount_str)
-                except ValueError:
-                    continue
+        return None
+    
+    def parse_labeled_amount(self, value):
+        """Return (amount, currency) printed at the start of a total label's value, or (None, None).
+        
+        Accepts 'Rp393.000', 'IDR 50.000', '50.000 IDR' and bare numbers of
+        at least MIN_BARE_AMOUNT.
+        """
+        match = _LABELED_AMOUNT_RE.match(value)
+        if not match:
+            return None, None
+        amount = parse_idr_amount(match.group('number'))
+        if amount is None:
+            return None, None
+        marked = match.group('prefix') or match.group('suffix')
+        if not marked and amount < MIN_BARE_AMOUNT:
+            return None, None
+        return amount, detect_currency(match.group(0)) or DEFAULT_CURRENCY
+    
+    def parse_labeled_fields(self, email_info):
+        """Fill the record from one tokenize pass over its cleaned text; returns the amount found, or None.
         
+        The sender's wallet parser supplies the labels, or the generic
+        parser when there is none. Each field takes its best-ranked
+        candidate that parses (see WalletParser.candidates).
+        """
+        parser = self.registry.lookup(email_info.sender, email_info.subject) or self.generic_parser
+        
+        # The cleaned text is a fraction of the HTML body, and labels survive cleaning
+        values = parser.candidates(email_info.raw)
+        email_info.merchant = next(iter(values.get('merchant', ())), None)
+        email_info.reference_id = next(iter(values.get('reference_id', ())), None)
+        for value in values.get('transaction_date', ()):
+            email_info.transaction_date = parse_transaction_date(value)
+            if email_info.transaction_date is not None:
+                break
+        for value in values.get('total_amount', ()):
+            amount, currency = self.parse_labeled_amount(value)
+            if amount is not None:
+                email_info.currency = currency
+                return amount
         return None
     
     def parse_receipt_data(self, email_info):
-        """Parse receipt data from email info and add total amount."""
-        # Extract total amount from body content
-        total_amount = self.extract_total_amount(email_info.get('body_content', ''))
-        
-        # Add total amount to email info
-        email_info['total_amount'] = total_amount if total_amount is not None else 0.0
+        """Add the total amount and labeled fields to an EmailRecord and release its body."""
+        total_amount = self.parse_labeled_fields(email_info)
+        if total_amount is None:
+            # No labeled total: fall back to the amount patterns over the body
+            total_amount = self.extract_total_amount(email_info.body)
+            if total_amount is not None:
+                email_info.currency = DEFAULT_CURRENCY
+        email_info.total_amount = total_amount if total_amount is not None else 0.0
         
-        # Remove body_content from final result (not needed in CSV)
-        if 'body_content' in email_info:
-            del email_info['body_content']
+        # The body is not exported; drop it so only the cleaned text stays in memory
+        email_info.body = None
         
-        return email_info 
\ No newline at end of file
+        return email_info
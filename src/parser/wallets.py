@@ -0,0 +1,177 @@
+import re
+from email.utils import parseaddr
+
+
+# Labels most Indonesian wallets and banks print next to these fields
+MERCHANT_LABELS = ('Merchant', 'Nama Merchant', 'Nama Toko', 'Penerima')
+DATE_LABELS = ('Tanggal Transaksi', 'Waktu Transaksi', 'Tanggal', 'Transaction Date', 'Date')
+REFERENCE_LABELS = (
+    'No. Referensi', 'Nomor Referensi', 'No. Transaksi', 'ID Transaksi', 'Order ID', 'Reference ID',
+    'Transaction ID',
+)
+# Labels that are not extracted but end the value before them
+STOP_LABELS = (
+    'Metode Pembayaran', 'Payment Method', 'Status', 'Biaya Admin', 'Diskon', 'Cashback', 'Voucher',
+    'Potongan', 'Saldo', 'Sisa Saldo', 'Balance',
+)
+
+# Longest values kept for free-text fields; a label missing from the layout must not swallow the footer
+MAX_VALUE_LENGTH = {'merchant': 100, 'transaction_date': 40, 'reference_id': 40, 'total_amount': 40}
+
+
+class WalletParser:
+    """Finds receipt fields in one sender's emails by the labels it prints.
+
+    Subclasses set the sender `domains`, optional `subject_patterns` (the
+    parser only applies when one matches) and `total_labels`. Label lists
+    are ordered most specific first. tokenize() makes one pass over the
+    cleaned text: every known label is located, and its value is the text
+    up to the next label. Every field extractor works from these
+    candidates instead of scanning the text again. Values are returned as
+    printed; ReceiptParser turns them into amounts and dates.
+    """
+
+    name = None
+    domains = ()
+    subject_patterns = ()
+    total_labels = ('Total',)
+    merchant_labels = MERCHANT_LABELS
+    date_labels = DATE_LABELS
+    reference_labels = REFERENCE_LABELS
+    stop_labels = STOP_LABELS
+
+    def __init__(self):
+        self._subject_res = [re.compile(pattern, re.IGNORECASE) for pattern in self.subject_patterns]
+        self._fields = {}
+        # Label -> its position in the field's list, lower is more specific
+        self._priority = {}
+        for field, labels in (
+            ('total_amount', self.total_labels), ('merchant', self.merchant_labels),
+            ('transaction_date', self.date_labels), ('reference_id', self.reference_labels),
+            (None, self.stop_labels),
+        ):
+            for index, label in enumerate(labels):
+                self._fields.setdefault(label.lower(), field)
+                self._priority.setdefault(label.lower(), index)
+        # Longest first, so 'Tanggal Transaksi' wins over 'Tanggal'
+        alternation = '|'.join(re.escape(label) for label in sorted(self._fields, key=len, reverse=True))
+        self._label_re = re.compile(rf'(?<!\w)({alternation})(?!\w)\s*:?\s*', re.IGNORECASE)
+
+    def matches_subject(self, subject):
+        return not self._subject_res or any(regex.search(subject or '') for regex in self._subject_res)
+
+    def tokenize(self, text):
+        """Yield (field, label, value) for each labeled value in `text`, in order of appearance."""
+        text = text or ''
+        matches = list(self._label_re.finditer(text))
+        for match, following in zip(matches, matches[1:] + [None]):
+            field = self._fields[match.group(1).lower()]
+            if field is None:
+                continue
+            end = following.start() if following is not None else len(text)
+            value = text[match.end():end].strip(' :-|')
+            if value:
+                yield field, match.group(1), value[:MAX_VALUE_LENGTH[field]].strip()
+
+    def candidates(self, text):
+        """Return {field: [value, ...]}, most specific label first, then in order of appearance.
+
+        'Grand Total' ranks ahead of a 'Total' printed earlier (a subtotal
+        line), whatever the layout.
+        """
+        ranked = {}
+        for field, label, value in self.tokenize(text):
+            ranked.setdefault(field, []).append((self._priority[label.lower()], value))
+        # sort() is stable, so equal labels keep their order of appearance
+        return {
+            field: [value for _, value in sorted(entries, key=lambda entry: entry[0])]
+            for field, entries in ranked.items()
+        }
+
+
+class GenericParser(WalletParser):
+    """Labels common across senders, for emails without a wallet-specific parser."""
+
+    name = 'generic'
+    # No bare 'Jumlah' or 'Amount': without a known sender layout they label quantities as often as totals
+    total_labels = (
+        'Grand Total', 'Total Pembayaran', 'Total Bayar', 'Total Tagihan', 'Total Belanja', 'Total payment',
+        'Total Paid', 'Jumlah Pembayaran', 'Total',
+    )
+
+
+class ParserRegistry:
+    """Maps sender domains to WalletParsers.
+
+    lookup() walks the sender's domain from the most to the least specific
+    suffix (mail.shopee.co.id, shopee.co.id, co.id, id) against a dict, so
+    dispatch costs a few lookups however many parsers are registered.
+    """
+
+    def __init__(self):
+        self._by_domain = {}
+
+    def register(self, parser):
+        for domain in parser.domains:
+            self._by_domain.setdefault(domain.lower(), []).append(parser)
+        return parser
+
+    def lookup(self, sender, subject=''):
+        """The parser registered for this sender and subject, or None."""
+        domain = parseaddr(str(sender or ''))[1].rpartition('@')[2].lower()
+        while domain:
+            for parser in self._by_domain.get(domain, ()):
+                if parser.matches_subject(subject):
+                    return parser
+            domain = domain.partition('.')[2]
+        return None
+
+
+class ShopeePayParser(WalletParser):
+    name = 'ShopeePay'
+    domains = ('shopee.co.id', 'shopeepay.co.id')
+    subject_patterns = (r'shopee\s*pay',)
+    total_labels = ('Total Pembayaran', 'Total Bayar')
+
+
+class GoPayParser(WalletParser):
+    name = 'GoPay'
+    domains = ('gojek.com', 'gopay.co.id')
+    subject_patterns = (r'gopay',)
+    total_labels = ('Total payment', 'Total pembayaran', 'Total')
+
+
+class OVOParser(WalletParser):
+    name = 'OVO'
+    domains = ('ovo.id', 'ovo.co.id')
+    total_labels = ('Total Bayar', 'Total Pembayaran', 'Total')
+
+
+class DANAParser(WalletParser):
+    name = 'DANA'
+    domains = ('dana.id',)
+    total_labels = ('Total Bayar', 'Total', 'Jumlah')
+
+
+class BCAParser(WalletParser):
+    name = 'BCA'
+    domains = ('bca.co.id', 'klikbca.com')
+    total_labels = ('Jumlah', 'Nominal', 'Total')
+    merchant_labels = MERCHANT_LABELS + ('Tujuan', 'Keterangan')
+
+
+class TokopediaParser(WalletParser):
+    name = 'Tokopedia'
+    domains = ('tokopedia.com',)
+    subject_patterns = (r'tagihan', r'invoice', r'pembelian', r'pembayaran')
+    total_labels = ('Total Tagihan', 'Total Bayar', 'Total Pembayaran')
+    reference_labels = REFERENCE_LABELS + ('Nomor Invoice', 'No. Invoice')
+
+
+WALLET_PARSERS = (ShopeePayParser, GoPayParser, OVOParser, DANAParser, BCAParser, TokopediaParser)
+
+GENERIC_PARSER = GenericParser()
+
+DEFAULT_REGISTRY = ParserRegistry()
+for _parser_class in WALLET_PARSERS:
+    DEFAULT_REGISTRY.register(_parser_class())
@@ -1,47 +1,309 @@
 import csv
 import os
+import time
+
+
+# CSV columns, in file order
+CSV_FIELDNAMES = [
+    'from', 'subject', 'date', 'total_amount', 'currency', 'merchant', 'transaction_date', 'reference_id',
+    'email_id', 'raw',
+]
+
+# Sidecar file listing the email_id of every row, next to the CSV
+INDEX_SUFFIX = '.ids'
+
+
+def index_key(email_id):
+    """Index form of an email_id: one line, surrounding whitespace removed."""
+    return ' '.join(str(email_id or '').split())
+
+
+def truncate_partial_row(filename):
+    """Cut a torn last row (left by a crash mid-write) back to the last newline."""
+    with open(filename, 'rb+') as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        if size == 0:
+            return False
+        file.seek(size - 1)
+        if file.read(1) == b'\n':
+            return False
+
+        # Walk back in blocks until the previous newline
+        position = size
+        while position > 0:
+            start = max(0, position - 65536)
+            file.seek(start)
+            block = file.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                file.truncate(start + newline + 1)
+                return True
+            position = start
+        file.truncate(0)
+        return True
+
+
+def read_header(filename):
+    """Column names from the first row of a CSV file."""
+    with open(filename, 'r', newline='', encoding='utf-8') as file:
+        return next(csv.reader(file), [])
+
+
+def upgrade_columns(filename, fieldnames):
+    """Rewrite a CSV from an older version with the current columns (new ones left empty)."""
+    temp_path = f"{filename}.upgrade.tmp"
+    with open(filename, 'r', newline='', encoding='utf-8') as source, \
+            open(temp_path, 'w', newline='', encoding='utf-8') as target:
+        writer = csv.DictWriter(target, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(csv.DictReader(source))
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(temp_path, filename)
+
+
+class MessageIdIndex:
+    """Set of the email_ids stored in a CSV, persisted as one id per line.
+
+    The index is read once when a stream opens and then checked in memory,
+    so appends never rescan the CSV. It is rebuilt from the CSV when it is
+    missing, or older than the CSV (a run that stopped between writing a
+    row and its index line).
+    """
+
+    def __init__(self, path, csv_path):
+        self.path = path
+        self.csv_path = csv_path
+        self.ids = set()
+        self._pending = []
+        self._file = None
+
+    def load(self, file_mode='a'):
+        """Read the ids and open the file for appending (`file_mode` 'w' starts empty)."""
+        if file_mode == 'a' and os.path.exists(self.csv_path):
+            if self._is_current():
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    self.ids = {line.rstrip('\n') for line in file}
+                self.ids.discard('')
+            else:
+                self._rebuild()
+        self._file = open(self.path, file_mode, encoding='utf-8')
+
+    def _is_current(self):
+        return (
+            os.path.exists(self.path)
+            and os.path.getmtime(self.path) >= os.path.getmtime(self.csv_path)
+        )
+
+    def _rebuild(self):
+        with open(self.csv_path, 'r', newline='', encoding='utf-8') as file:
+            self.ids = {index_key(row.get('email_id')) for row in csv.DictReader(file)}
+        self.ids.discard('')
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.writelines(f"{email_id}\n" for email_id in self.ids)
+        os.replace(temp_path, self.path)
+        print(f"🗂️  Indexed {len(self.ids)} email ids from {self.csv_path}")
+
+    def __contains__(self, email_id):
+        return index_key(email_id) in self.ids
+
+    def add(self, email_id):
+        key = index_key(email_id)
+        if key:
+            self.ids.add(key)
+            self._pending.append(key)
+
+    def flush(self, sync=False):
+        """Write the ids added since the last flush; call only after the CSV rows are flushed."""
+        self._file.writelines(f"{key}\n" for key in self._pending)
+        self._pending = []
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CSVStream:
+    """Writes records to a CSV file one row at a time.
+
+    Rows are flushed every `flush_every` records and fsynced at most every
+    `fsync_interval` seconds, so a crash loses at most the last few rows
+    and the file stays a valid CSV. In append mode a torn last row from an
+    earlier crash is removed first. With `replace`, the records replace the
+    stored rows with the same email_id and every other row is kept: rows go
+    to a temporary file, the untouched old rows are copied after them on
+    close, and the result replaces the old file, so the previous output
+    survives a failed run. The file is only created once a record arrives.
+
+    Records whose email_id is already in the CSV (see MessageIdIndex) are
+    skipped, so overlapping runs never write a receipt twice.
+    """
+
+    def __init__(self, filename, fieldnames=CSV_FIELDNAMES, replace=False, flush_every=50, fsync_interval=5.0):
+        self.filename = filename
+        self.fieldnames = fieldnames
+        self.replace = replace
+        self.flush_every = max(1, int(flush_every))
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        self.skipped = 0
+        self.kept = 0
+        self._file = None
+        self._writer = None
+        self._index = None
+        self._last_sync = 0.0
+
+    @property
+    def _path(self):
+        return f"{self.filename}.tmp" if self.replace else self.filename
+
+    @property
+    def _index_path(self):
+        return f"{self._path}{INDEX_SUFFIX}"
+
+    def _open(self):
+        file_exists = (
+            not self.replace and os.path.exists(self.filename) and os.path.getsize(self.filename) > 0
+        )
+        if file_exists and truncate_partial_row(self.filename):
+            print(f"⚠️  Removed an incomplete last row from {self.filename}")
+        if file_exists:
+            self._match_columns()
+
+        self._index = MessageIdIndex(self._index_path, self.filename)
+        self._index.load('a' if file_exists else 'w')
+        self._file = open(self._path, 'a' if file_exists else 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        self._last_sync = time.monotonic()
+
+        # Write header only if file is new
+        if not file_exists:
+            self._writer.writeheader()
+            if not self.replace:
+                print(f"📄 Created new CSV file: {self.filename}")
+
+    def _match_columns(self):
+        """Make appended rows line up with the existing header."""
+        header = read_header(self.filename)
+        if header == self.fieldnames:
+            return
+        if set(header) <= set(self.fieldnames):
+            added = [field for field in self.fieldnames if field not in header]
+            upgrade_columns(self.filename, self.fieldnames)
+            print(f"📄 Added columns {', '.join(added)} to {self.filename}")
+        else:
+            # Written by something else; keep its layout rather than drop columns
+            print(f"⚠️  {self.filename} has unexpected columns, appending with its existing header")
+            self.fieldnames = header
+
+    def write(self, record):
+        """Append one record unless its email_id is already stored; returns True if written.
+
+        Missing fields are written empty.
+        """
+        if self._file is None:
+            self._open()
+        email_id = record.get('email_id')
+        if email_id and email_id in self._index:
+            self.skipped += 1
+            return False
+        self._writer.writerow({field: record.get(field, '') for field in self.fieldnames})
+        self._index.add(email_id)
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush(sync=time.monotonic() - self._last_sync >= self.fsync_interval)
+        return True
+
+    def flush(self, sync=False):
+        """Hand buffered rows to the OS, and with `sync` to the disk.
+
+        The index is written after the rows, so it never lists an id whose
+        row is not in the CSV.
+        """
+        if self._file is None:
+            return
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+        self._index.flush(sync)
+
+    def _keep_existing_rows(self):
+        """Copy the old file's rows whose email_id was not rewritten (replace mode)."""
+        if not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0:
+            return
+        truncate_partial_row(self.filename)
+        with open(self.filename, 'r', newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                email_id = row.get('email_id')
+                if email_id and email_id in self._index:
+                    continue
+                self._writer.writerow(row)
+                self._index.add(email_id)
+                self.kept += 1
+
+    def close(self, discard=False):
+        """Flush and fsync the rows; with `discard`, drop an unfinished replace instead."""
+        if self._file is None:
+            return
+        if self.replace and not discard:
+            self._keep_existing_rows()
+        self.flush(sync=True)
+        self._file.close()
+        self._file = None
+        self._index.close()
+        if self.replace:
+            if discard:
+                os.remove(self._path)
+                os.remove(self._index_path)
+            else:
+                os.replace(self._path, self.filename)
+                os.replace(self._index_path, f"{self.filename}{INDEX_SUFFIX}")
+                print(f"📄 Rewrote CSV file: {self.filename} ({self.kept} other rows kept)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+        if exc_type is None and self.skipped:
+            print(f"⏭️  Skipped {self.skipped} email records already in {self.filename}")
+        if exc_type is None and self.count:
+            print(f"💾 Successfully saved {self.count} email records to {self.filename}")
 
 
 class CSVExporter:
     """Handles data persistence to CSV."""
-    
+
     def __init__(self, filename='receipts.csv'):
         self.filename = filename
-    
-    def save_records(self, records):
-        """Save email records to CSV file with proper headers."""
-        if not records:
-            print("⚠️  No email records to save")
-            return False
-        
-        # Define CSV headers in the correct order
-        fieldnames = ['from', 'subject', 'date', 'total_amount', 'email_id', 'raw']
-        
+
+    def open_stream(self, replace=False):
+        """A CSVStream for writing records as they are produced."""
+        return CSVStream(self.filename, CSV_FIELDNAMES, replace=replace)
+
+    def save_records(self, records, replace=False):
+        """Save email records (any iterable) to the CSV file (replacing rows with the same email_id if `replace`)."""
         try:
-            # Check if file exists to determine if we need headers
-            file_exists = os.path.exists(self.filename)
-            
-            with open(self.filename, 'a', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                # Write header only if file is new
-                if not file_exists:
-                    writer.writeheader()
-                    print(f"📄 Created new CSV file: {self.filename}")
-                
-                # Write email records
+            with self.open_stream(replace) as stream:
                 for record in records:
-                    # Ensure all required fields are present
-                    csv_record = {field: record.get(field, '') for field in fieldnames}
-                    writer.writerow(csv_record)
-                
-                print(f"💾 Successfully saved {len(records)} email records to {self.filename}")
-                return True
-                
+                    stream.write(record)
+
+            if not stream.count and not stream.skipped:
+                print("⚠️  No email records to save")
+                return False
+            return True
+
         except Exception as e:
             print(f"❌ Error saving to CSV: {e}")
             return False
-    
+
     def append_records(self, records):
         """Alias for save_records for consistency."""
-        return self.save_records(records) 
\ No newline at end of file
+        return self.save_records(records)
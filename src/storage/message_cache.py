@@ -0,0 +1,317 @@
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+
+from ..utils.helpers import chunked
+from .sqlite_store import MAX_QUERY_PARAMS
+
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    mailbox TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    uid INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (mailbox, uidvalidity, uid, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_last_used ON messages (last_used);
+CREATE INDEX IF NOT EXISTS idx_messages_digest ON messages (digest);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+# What a cached entry holds: the full message or only its text parts
+CACHE_KINDS = ('rfc822', 'text')
+
+
+class MessageCache:
+    """Compressed, content-addressed cache of fetched messages on local disk.
+
+    Entries are keyed by (account:mailbox, UIDVALIDITY, UID, kind) and point at
+    zlib-compressed blobs named by the SHA-256 of the raw bytes, so identical
+    messages are stored once. When the blobs exceed `max_bytes`, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, directory='.cache/messages', max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.connection = None
+        # Running total of the blob sizes, summed from the index once per connection
+        self._total_bytes = None
+
+    def connect(self):
+        """Open the cache index, creating the directory and schema if needed."""
+        if self.connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # The parse pipeline reads through the cache from its fetch thread
+            self.connection = sqlite3.connect(
+                os.path.join(self.directory, 'index.db'), check_same_thread=False
+            )
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(INDEX_SCHEMA)
+        return self.connection
+
+    def close(self):
+        """Close the cache index."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+            self._total_bytes = None
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest + '.z')
+
+    def _read_blob(self, digest):
+        with open(self._blob_path(digest), 'rb') as file:
+            return zlib.decompress(file.read())
+
+    def get(self, mailbox, uidvalidity, uid, kind='rfc822'):
+        """Return cached raw bytes for a message, or None."""
+        connection = self.connect()
+        row = connection.execute(
+            'SELECT digest FROM messages WHERE mailbox = ? AND uidvalidity = ? AND uid = ? AND kind = ?',
+            (mailbox, int(uidvalidity), int(uid), kind)
+        ).fetchone()
+        if row is None:
+            return None
+
+        try:
+            raw_email = self._read_blob(row[0])
+        except (OSError, zlib.error) as e:
+            print(f"  ⚠️  Dropping unreadable cache entry for UID {int(uid)}: {e}")
+            with connection:
+                connection.execute(
+                    'DELETE FROM messages WHERE mailbox = ? AND uidvalidity = ? AND uid = ? AND kind = ?',
+                    (mailbox, int(uidvalidity), int(uid), kind)
+                )
+            return None
+
+        with connection:
+            connection.execute(
+                'UPDATE messages SET last_used = ? WHERE mailbox = ? AND uidvalidity = ? AND uid = ? AND kind = ?',
+                (time.time(), mailbox, int(uidvalidity), int(uid), kind)
+            )
+        return raw_email
+
+    def put(self, mailbox, uidvalidity, uid, raw_email, kind='rfc822'):
+        """Store raw bytes for a message, then evict old entries if over the size cap."""
+        connection = self.connect()
+        digest = hashlib.sha256(raw_email).hexdigest()
+        path = self._blob_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zlib.compress(raw_email, 6)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(compressed)
+            os.replace(temp_path, path)
+            total = self.total_bytes()
+            with connection:
+                # A row is left behind when the blob file was deleted by hand
+                previous = connection.execute('SELECT size FROM blobs WHERE digest = ?', (digest,)).fetchone()
+                connection.execute(
+                    'INSERT OR REPLACE INTO blobs (digest, size) VALUES (?, ?)', (digest, len(compressed))
+                )
+            self._total_bytes = total + len(compressed) - (previous[0] if previous else 0)
+
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO messages (mailbox, uidvalidity, uid, kind, digest, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (mailbox, int(uidvalidity), int(uid), kind, digest, time.time())
+            )
+        self.evict()
+
+    def total_bytes(self):
+        """Compressed size of every stored blob."""
+        if self._total_bytes is None:
+            self._total_bytes = self.connect().execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        return self._total_bytes
+
+    def evict(self):
+        """Drop least recently used entries until the blobs fit in max_bytes."""
+        if not self.max_bytes:
+            return 0
+        connection = self.connect()
+        excess = self.total_bytes() - self.max_bytes
+        evicted = 0
+
+        while excess > 0:
+            row = connection.execute(
+                'SELECT mailbox, uidvalidity, uid, kind, digest FROM messages ORDER BY last_used LIMIT 1'
+            ).fetchone()
+            if row is None:
+                break
+            digest = row[4]
+            with connection:
+                connection.execute(
+                    'DELETE FROM messages WHERE mailbox = ? AND uidvalidity = ? AND uid = ? AND kind = ?', row[:4]
+                )
+                # Blobs are shared by identical messages; keep them while referenced
+                still_used = connection.execute(
+                    'SELECT 1 FROM messages WHERE digest = ? LIMIT 1', (digest,)
+                ).fetchone()
+                if still_used is None:
+                    size = connection.execute('SELECT size FROM blobs WHERE digest = ?', (digest,)).fetchone()
+                    connection.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+                    excess -= size[0] if size else 0
+                    self._total_bytes -= size[0] if size else 0
+                    try:
+                        os.remove(self._blob_path(digest))
+                    except OSError:
+                        pass
+            evicted += 1
+
+        return evicted
+
+    def cached_uids(self, mailbox, uidvalidity, uids, kind='rfc822'):
+        """Return the subset of UIDs (as ints) that have a cache entry."""
+        connection = self.connect()
+        cached = set()
+        for chunk in chunked([int(uid) for uid in uids], MAX_QUERY_PARAMS):
+            placeholders = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f'SELECT uid FROM messages WHERE mailbox = ? AND uidvalidity = ? AND kind = ? '
+                f'AND uid IN ({placeholders})',
+                [mailbox, int(uidvalidity), kind] + chunk
+            )
+            cached.update(row[0] for row in rows)
+        return cached
+
+    def iter_entries(self):
+        """Return an iterator of (mailbox, uidvalidity, uid) for every cached message."""
+        rows = self.connect().execute(
+            'SELECT DISTINCT mailbox, uidvalidity, uid FROM messages ORDER BY mailbox, uidvalidity, uid'
+        ).fetchall()
+        return iter(rows)
+
+    def scope(self, mailbox, uidvalidity, kind='rfc822'):
+        """The entries for one mailbox ('account:mailbox') and UIDVALIDITY."""
+        return CacheScope(self, mailbox, uidvalidity, kind)
+
+    def reader(self):
+        """A fetcher over every cached message, for re-parsing without a server."""
+        return CacheReader(self)
+
+
+class CachedFetcher:
+    """Serves UIDs from a MessageCache and fetches only the rest.
+
+    Exposes the BatchFetcher fetch_messages/missing_ids interface; results
+    keep the input order.
+    """
+
+    def __init__(self, cache, fetcher, mailbox, uidvalidity, kind='rfc822'):
+        self.cache = cache
+        self.fetcher = fetcher
+        self.mailbox = mailbox
+        self.uidvalidity = uidvalidity
+        self.kind = kind
+        self.missing_ids = []
+        self.hits = 0
+
+    def fetch_messages(self, mail, email_ids):
+        """Yield (email_id, raw bytes), hitting the server only for cache misses."""
+        self.missing_ids = []
+        email_ids = list(email_ids)
+        cached = self.cache.cached_uids(self.mailbox, self.uidvalidity, email_ids, self.kind)
+        self.hits = len(cached)
+
+        to_fetch = [email_id for email_id in email_ids if int(email_id) not in cached]
+        if cached:
+            print(f"🗄️  {len(cached)} emails served from cache, fetching {len(to_fetch)}")
+
+        fetched = iter(self.fetcher.fetch_messages(mail, to_fetch)) if to_fetch else iter(())
+        # The fetcher yields in input order and skips ids it could not get
+        pending = None
+        unreadable = []
+        for email_id in email_ids:
+            if int(email_id) in cached:
+                raw_email = self.cache.get(self.mailbox, self.uidvalidity, email_id, self.kind)
+                if raw_email is None:
+                    unreadable.append(email_id)
+                else:
+                    yield email_id, raw_email
+                continue
+            if pending is None:
+                pending = next(fetched, None)
+            if pending is None or pending[0] != email_id:
+                continue
+            raw_email = pending[1]
+            pending = None
+            yield email_id, self._store(email_id, raw_email)
+        missing_ids = list(self.fetcher.missing_ids) if to_fetch else []
+
+        # Entries whose blob could not be read were dropped; fetch them again
+        if unreadable:
+            for email_id, raw_email in self.fetcher.fetch_messages(mail, unreadable):
+                yield email_id, self._store(email_id, raw_email)
+            missing_ids += self.fetcher.missing_ids
+        self.missing_ids = missing_ids
+
+    def _store(self, email_id, raw_email):
+        try:
+            self.cache.put(self.mailbox, self.uidvalidity, email_id, raw_email, self.kind)
+        except Exception as e:
+            print(f"  ⚠️  Could not cache UID {int(email_id)}: {e}")
+        return raw_email
+
+
+class CacheScope:
+    """The entries of a MessageCache for one mailbox, UIDVALIDITY and kind."""
+
+    def __init__(self, cache, mailbox, uidvalidity, kind='rfc822'):
+        self.cache = cache
+        self.mailbox = mailbox
+        self.uidvalidity = uidvalidity
+        self.kind = kind
+        self._fetcher = None
+
+    def wrap(self, fetcher):
+        """Wrap a fetcher so cached messages are served locally and new ones are stored."""
+        self._fetcher = CachedFetcher(self.cache, fetcher, self.mailbox, self.uidvalidity, self.kind)
+        return self._fetcher
+
+    @property
+    def missing_ids(self):
+        """Ids the most recently wrapped fetcher could neither read nor fetch."""
+        return self._fetcher.missing_ids if self._fetcher is not None else []
+
+
+class CacheReader:
+    """Reads every cached message back, preferring full copies over text-only ones.
+
+    Ids are (mailbox, uidvalidity, uid) tuples; it exposes the BatchFetcher
+    fetch_messages/missing_ids interface for process_emails_batch.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.missing_ids = []
+
+    def keys(self):
+        """Every cached (mailbox, uidvalidity, uid)."""
+        return list(self.cache.iter_entries())
+
+    def fetch_messages(self, mail, keys):
+        """Yield (key, raw bytes); `mail` is unused."""
+        self.missing_ids = []
+        for key in keys:
+            raw_email = None
+            for kind in CACHE_KINDS:
+                raw_email = self.cache.get(*key, kind=kind)
+                if raw_email is not None:
+                    break
+            if raw_email is None:
+                self.missing_ids.append(key)
+                continue
+            yield key, raw_email
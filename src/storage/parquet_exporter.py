@@ -0,0 +1,213 @@
+import glob
+import os
+import uuid
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+    pc = None
+    pq = None
+
+
+# Analytics columns: (record field, column name, arrow type name)
+RECEIPT_COLUMNS = [
+    ('email_id', 'email_id', 'string'),
+    ('from', 'sender', 'string'),
+    ('subject', 'subject', 'string'),
+    ('date', 'date', 'timestamp'),
+    ('total_amount', 'total_amount', 'float64'),
+    ('currency', 'currency', 'string'),
+    ('merchant', 'merchant', 'string'),
+    ('transaction_date', 'transaction_date', 'timestamp'),
+    ('reference_id', 'reference_id', 'string'),
+]
+
+# The cleaned text lives in its own files, keyed by email_id
+RAW_COLUMNS = [
+    ('email_id', 'email_id', 'string'),
+    ('raw', 'raw', 'string'),
+]
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def arrow_schema(columns):
+    types = {'string': pa.string(), 'float64': pa.float64(), 'timestamp': pa.timestamp('s')}
+    return pa.schema([(name, types[type_name]) for _, name, type_name in columns])
+
+
+def column_value(value, type_name):
+    """Convert a record value to what the Arrow column expects (None when it does not fit)."""
+    if value is None or value == '':
+        return None
+    if type_name == 'timestamp':
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.strptime(str(value), DATE_FORMAT)
+        except ValueError:
+            return None
+    if type_name == 'float64':
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+class ParquetPartWriter:
+    """Writes one Parquet part file, a row group at a time.
+
+    The part is written under a dot-prefixed temporary name, which Arrow
+    dataset readers skip, and renamed into place on close.
+    """
+
+    def __init__(self, directory, part_name, columns, compression):
+        self.directory = directory
+        self.columns = columns
+        self.path = os.path.join(directory, part_name)
+        self.temp_path = os.path.join(directory, f".{part_name}.tmp")
+        self.schema = arrow_schema(columns)
+        self.compression = compression
+        self._writer = None
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        if self._writer is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.temp_path, self.schema, compression=self.compression)
+        arrays = [
+            pa.array([column_value(row.get(field), type_name) for row in rows], type=self.schema.field(name).type)
+            for field, name, type_name in self.columns
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def remove_rows(self, email_ids):
+        """Drop rows with these email_ids from the older parts, rewriting only parts that have any."""
+        value_set = pa.array(sorted(email_ids), type=pa.string())
+        for path in glob.glob(os.path.join(self.directory, 'part-*.parquet')):
+            if path == self.path:
+                continue
+            table = pq.read_table(path)
+            kept = table.filter(pc.invert(pc.is_in(table['email_id'], value_set=value_set)))
+            if kept.num_rows == table.num_rows:
+                continue
+            if not kept.num_rows:
+                os.remove(path)
+                continue
+            temp_path = os.path.join(self.directory, f".{os.path.basename(path)}.tmp")
+            pq.write_table(kept, temp_path, compression=self.compression)
+            os.replace(temp_path, path)
+
+    def close(self, discard=False):
+        """Finish the file; returns True if a part was published."""
+        if self._writer is None:
+            return False
+        self._writer.close()
+        self._writer = None
+        if discard:
+            os.remove(self.temp_path)
+            return False
+        os.replace(self.temp_path, self.path)
+        return True
+
+
+class ParquetStream:
+    """Buffers records and writes them as Parquet row groups.
+
+    Each run adds one part file to `<directory>/receipts/` (amounts, dates,
+    merchants, senders) and one to `<directory>/raw/` (the cleaned text), so analytics
+    queries never read the text column. With `replace`, rows with the same
+    email_id are removed from the older parts once the new ones are in
+    place; all other rows are kept.
+    """
+
+    def __init__(self, directory, replace=False, row_group_size=10000, compression='zstd'):
+        self.directory = directory
+        self.replace = replace
+        self.row_group_size = max(1, int(row_group_size))
+        self.count = 0
+        part_name = f"part-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        self._parts = {
+            'receipts': ParquetPartWriter(os.path.join(directory, 'receipts'), part_name, RECEIPT_COLUMNS, compression),
+            'raw': ParquetPartWriter(os.path.join(directory, 'raw'), part_name, RAW_COLUMNS, compression),
+        }
+        self._pending = []
+        # email_ids written by this stream, to drop from older parts on replace
+        self._email_ids = set()
+
+    def write(self, record):
+        self._pending.append(record)
+        self.count += 1
+        if self.replace and record.get('email_id'):
+            self._email_ids.add(str(record.get('email_id')))
+        if len(self._pending) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records as one row group in each part."""
+        for part in self._parts.values():
+            part.write_rows(self._pending)
+        self._pending = []
+
+    def close(self, discard=False):
+        if not discard:
+            self.flush()
+        self._pending = []
+        published = [part.close(discard) for part in self._parts.values()]
+        if self.replace and self._email_ids and any(published):
+            for part in self._parts.values():
+                part.remove_rows(self._email_ids)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Rows of a failed run are still valid; only an unfinished replace is dropped
+        self.close(discard=exc_type is not None and self.replace)
+        if exc_type is None and self.count:
+            print(f"💾 Successfully saved {self.count} email records to {self.directory} (Parquet)")
+
+
+class ParquetExporter:
+    """Columnar export for analytics, next to the CSV.
+
+    Needs the optional pyarrow package. Read the amounts with
+    pandas.read_parquet('<directory>/receipts'), and join the text from
+    '<directory>/raw' on email_id only when it is needed.
+    """
+
+    def __init__(self, directory='receipts.parquet', row_group_size=10000):
+        self.directory = directory
+        self.row_group_size = row_group_size
+
+    @staticmethod
+    def available():
+        return pa is not None
+
+    def open_stream(self, replace=False):
+        """A ParquetStream for writing records as they are produced."""
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        return ParquetStream(self.directory, replace, self.row_group_size)
+
+    def save_records(self, records, replace=False):
+        """Save email records (any iterable) as a new part of the Parquet dataset."""
+        try:
+            with self.open_stream(replace) as stream:
+                for record in records:
+                    stream.write(record)
+
+            if not stream.count:
+                print("⚠️  No email records to save")
+                return False
+            return True
+
+        except Exception as e:
+            print(f"❌ Error saving to Parquet: {e}")
+            return False
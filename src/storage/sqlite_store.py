@@ -0,0 +1,180 @@
+import json
+import sqlite3
+from datetime import datetime
+
+from ..email.record import EmailRecord
+from ..utils.helpers import chunked
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT NOT NULL UNIQUE,
+    processed_at DATETIME NOT NULL,
+    email_from TEXT,
+    email_subject TEXT,
+    email_date DATETIME,
+    transaction_date DATETIME,
+    amount DECIMAL,
+    currency TEXT DEFAULT 'IDR',
+    merchant TEXT,
+    reference_id TEXT,
+    raw_data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_receipts_transaction_date ON receipts (transaction_date);
+CREATE INDEX IF NOT EXISTS idx_receipts_email_date ON receipts (email_date);
+CREATE INDEX IF NOT EXISTS idx_receipts_merchant ON receipts (merchant);
+"""
+
+INSERT_SQL = """
+INSERT OR IGNORE INTO receipts (
+    message_id, processed_at, email_from, email_subject, email_date,
+    transaction_date, amount, currency, merchant, reference_id, raw_data
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Used when rebuilding output: the fresh parse wins over the stored row
+REPLACE_SQL = INSERT_SQL.replace('INSERT OR IGNORE', 'INSERT OR REPLACE')
+
+# Columns added after the first release: (name, type), added to older databases on connect
+ADDED_COLUMNS = [
+    ('reference_id', 'TEXT'),
+]
+
+# SQLite limits the number of bound parameters per statement
+MAX_QUERY_PARAMS = 500
+
+
+class SQLiteStore:
+    """Handles data persistence to SQLite with Message-ID deduplication."""
+
+    def __init__(self, filename='receipts.db'):
+        self.filename = filename
+        self.connection = None
+
+    def connect(self):
+        """Open the database (WAL mode) and create the schema if needed."""
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.filename)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(SCHEMA)
+            self._add_missing_columns()
+        return self.connection
+
+    def _add_missing_columns(self):
+        """Bring a database created by an older version up to the current columns."""
+        existing = {row[1] for row in self.connection.execute('PRAGMA table_info(receipts)')}
+        for name, column_type in ADDED_COLUMNS:
+            if name not in existing:
+                with self.connection:
+                    self.connection.execute(f'ALTER TABLE receipts ADD COLUMN {name} {column_type}')
+
+    def close(self):
+        """Close the database connection."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def stored_message_ids(self, message_ids):
+        """Return the subset of message ids that are already stored."""
+        message_ids = [message_id for message_id in message_ids if message_id]
+        stored = set()
+        if not message_ids:
+            return stored
+
+        connection = self.connect()
+        for chunk in chunked(message_ids, MAX_QUERY_PARAMS):
+            placeholders = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f'SELECT message_id FROM receipts WHERE message_id IN ({placeholders})', chunk
+            )
+            stored.update(row[0] for row in rows)
+        return stored
+
+    def has_message(self, message_id):
+        """Check whether a Message-ID has already been stored."""
+        return bool(self.stored_message_ids([message_id]))
+
+    @staticmethod
+    def _row(record, processed_at):
+        """Map an email record (EmailRecord or dict) onto the receipts table columns."""
+        raw_data = record.as_dict() if isinstance(record, EmailRecord) else record
+        return (
+            record.get('email_id'),
+            processed_at,
+            record.get('from'),
+            record.get('subject'),
+            record.get('date'),
+            record.get('transaction_date'),
+            record.get('total_amount'),
+            record.get('currency') or 'IDR',
+            record.get('merchant'),
+            record.get('reference_id'),
+            json.dumps(raw_data, ensure_ascii=False, default=str),
+        )
+
+    def open_stream(self, replace=False, batch_size=100):
+        """A SQLiteStream for inserting records as they are produced."""
+        return SQLiteStream(self, replace, batch_size)
+
+    def save_records(self, records, replace=False):
+        """Insert records (any iterable), ignoring (or, with `replace`, overwriting) stored Message-IDs."""
+        try:
+            with self.open_stream(replace) as stream:
+                for record in records:
+                    stream.write(record)
+
+            if not stream.count:
+                print("⚠️  No email records to save")
+                return False
+            return True
+
+        except Exception as e:
+            print(f"❌ Error saving to SQLite: {e}")
+            return False
+
+
+class SQLiteStream:
+    """Inserts records in transactions of `batch_size` rows as they arrive.
+
+    Each committed batch survives a crash later in the run; memory use
+    does not grow with the number of records.
+    """
+
+    def __init__(self, store, replace=False, batch_size=100):
+        self.store = store
+        self.replace = replace
+        self.batch_size = max(1, int(batch_size))
+        self.processed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.count = 0
+        self.inserted = 0
+        self._pending = []
+
+    def write(self, record):
+        self._pending.append(self.store._row(record, self.processed_at))
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        """Insert and commit the pending rows."""
+        if not self._pending:
+            return
+        connection = self.store.connect()
+        before = connection.total_changes
+        with connection:
+            connection.executemany(REPLACE_SQL if self.replace else INSERT_SQL, self._pending)
+        self.inserted += connection.total_changes - before
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Rows parsed before a failure are still worth keeping
+        self.commit()
+        if exc_type is None and self.count:
+            print(f"💾 Successfully saved {self.inserted} email records to {self.store.filename}")
+            if self.inserted < self.count:
+                print(f"   ({self.count - self.inserted} already stored, skipped)")
@@ -0,0 +1,57 @@
+import json
+import os
+
+
+class SyncStateStore:
+    """Persists UIDVALIDITY and the highest processed UID per mailbox."""
+
+    def __init__(self, filename='sync_state.json'):
+        self.filename = filename
+        self.state = None
+
+    def load(self):
+        """Load sync state from disk (empty state if the file is missing or broken)."""
+        if self.state is not None:
+            return self.state
+
+        self.state = {}
+        if not os.path.exists(self.filename):
+            return self.state
+
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file:
+                self.state = json.load(file) or {}
+        except Exception as e:
+            print(f"⚠️  Could not read sync state {self.filename}, doing a full scan: {e}")
+            self.state = {}
+
+        return self.state
+
+    @staticmethod
+    def _key(account, mailbox):
+        return f"{account}:{mailbox}"
+
+    def get(self, account, mailbox='INBOX'):
+        """Return {'uidvalidity': int, 'last_uid': int} for a mailbox, or None."""
+        return self.load().get(self._key(account, mailbox))
+
+    def update(self, account, mailbox, uidvalidity, last_uid):
+        """Record the highest processed UID for a mailbox."""
+        if uidvalidity is None or last_uid is None:
+            return
+        self.load()[self._key(account, mailbox)] = {
+            'uidvalidity': int(uidvalidity),
+            'last_uid': int(last_uid),
+        }
+
+    def save(self):
+        """Write sync state atomically so a crash never leaves a partial file."""
+        temp_filename = f"{self.filename}.tmp"
+        try:
+            with open(temp_filename, 'w', encoding='utf-8') as file:
+                json.dump(self.load(), file, indent=2, sort_keys=True)
+            os.replace(temp_filename, self.filename)
+            return True
+        except Exception as e:
+            print(f"❌ Error saving sync state: {e}")
+            return False
@@ -1,17 +1,27 @@
 import getpass
 
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most `size` items."""
+    size = max(1, int(size))
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 def display_email_info(index, email_info):
     """Display formatted email information."""
-    print(f"{index:2d}. From: {email_info['from']}")
-    print(f"    Subject: {email_info['subject']}")
-    print(f"    Date: {email_info['date']}")
-    print(f"    Email ID: {email_info['email_id'][:50]}...")  # Truncate long IDs
+    print(f"{index:2d}. From: {email_info.sender}")
+    print(f"    Subject: {email_info.subject}")
+    print(f"    Date: {email_info.date}")
+    print(f"    Email ID: {email_info.email_id[:50]}...")  # Truncate long IDs
     
     # Display total amount if found
-    if email_info.get('total_amount') and email_info['total_amount'] > 0:
-        print(f"    💰 Total Amount: Rp {email_info['total_amount']:,.0f}")
+    if email_info.total_amount and email_info.total_amount > 0:
+        print(f"    💰 Total Amount: Rp {email_info.total_amount:,.0f}")
     else:
         print(f"    💰 Total Amount: Not found")
+    if email_info.merchant:
+        print(f"    🏪 Merchant: {email_info.merchant}")
     
     print(f"    {'-'*50}")
 
@@ -0,0 +1,337 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from email.utils import parseaddr
+
+
+# Commands the instrumented connection counts; anything else passes through untouched
+COUNTED_COMMANDS = ('login', 'select', 'uid', 'fetch', 'search', 'noop', 'logout')
+
+METRIC_PREFIX = 'receipt_parser'
+
+# subject_pattern label of failures no configured pattern accounts for
+UNMATCHED_PATTERN = 'unmatched'
+
+
+def response_size(data):
+    """Bytes carried by an imaplib response payload (lines and literals)."""
+    size = 0
+    for item in data or ():
+        if isinstance(item, tuple):
+            size += sum(len(part) for part in item if isinstance(part, bytes))
+        elif isinstance(item, bytes):
+            size += len(item)
+    return size
+
+
+def imap_stage(mail, name):
+    """Attribute the IMAP commands sent meanwhile to stage `name` when `mail` is instrumented."""
+    stage = getattr(mail, 'imap_stage', None)
+    return stage(name) if stage is not None else contextlib.nullcontext()
+
+
+def sender_domain(sender):
+    """Domain of a From header value, or 'unknown'."""
+    address = parseaddr(str(sender or ''))[1]
+    return address.rpartition('@')[2].lower() or 'unknown'
+
+
+def escape_label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RunMetrics:
+    """Collects per-stage timings and counters for one run.
+
+    Thread-safe, since the connection pool and the parse pipeline report
+    from their own threads. IMAP commands and response bytes are also
+    attributed to the IMAP stage active when they were sent: every stage()
+    is one, and imap_stage() marks finer ones such as the header prefetch.
+    The stage is shared by all threads, which works because only one stage
+    talks to the server at a time. Parse failures are counted by sender
+    domain and by the subject pattern that selected the email, taken from
+    `subject_matcher` (EmailFilter's SubjectMatcher). summary() gives a
+    JSON-ready dict; write() saves it as JSON or as a Prometheus textfile.
+    """
+
+    def __init__(self, subject_matcher=None):
+        self.started_at = time.time()
+        self.stages = {}
+        self.imap_commands = Counter()
+        self.bytes_fetched = 0
+        # IMAP stage -> {'commands': Counter, 'bytes': int}
+        self.imap_stages = {}
+        self.subject_matcher = subject_matcher
+        # (domain, subject pattern, reason) -> count
+        self.parse_failures = Counter()
+        self.memory = None
+        self.active_imap_stage = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block as stage `name`; set `items` on the yielded dict to report throughput."""
+        result = {'items': 0}
+        started = time.perf_counter()
+        try:
+            with self.imap_stage(name):
+                yield result
+        finally:
+            self.add_stage_time(name, time.perf_counter() - started, result['items'])
+
+    @contextlib.contextmanager
+    def imap_stage(self, name):
+        """Attribute IMAP commands sent during the block, from any thread, to stage `name`."""
+        previous, self.active_imap_stage = self.active_imap_stage, name
+        try:
+            yield
+        finally:
+            self.active_imap_stage = previous
+
+    def add_stage_time(self, name, seconds, items=0):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'items': 0})
+            stage['seconds'] += seconds
+            stage['items'] += items
+
+    def record_command(self, name, data=None, stage=None):
+        """Count one command and its response bytes, in `stage` or else the active IMAP stage."""
+        size = response_size(data)
+        with self._lock:
+            self.imap_commands[name] += 1
+            self.bytes_fetched += size
+            totals = self.imap_stages.setdefault(
+                stage or self.active_imap_stage or 'other', {'commands': Counter(), 'bytes': 0}
+            )
+            totals['commands'][name] += 1
+            totals['bytes'] += size
+
+    def record_parse_failure(self, sender, subject, reason):
+        """Count one email that failed to parse or had no amount, from its From and decoded Subject."""
+        pattern = self.subject_matcher.match(subject) if self.subject_matcher is not None else None
+        with self._lock:
+            self.parse_failures[(sender_domain(sender), pattern or UNMATCHED_PATTERN, reason)] += 1
+
+    def summary(self):
+        """Everything recorded so far as a JSON-serializable dict."""
+        with self._lock:
+            stages = {
+                name: {
+                    'seconds': round(stage['seconds'], 6),
+                    'items': stage['items'],
+                    'messages_per_second': (
+                        round(stage['items'] / stage['seconds'], 1) if stage['items'] and stage['seconds'] else None
+                    ),
+                }
+                for name, stage in self.stages.items()
+            }
+            total = sum(stage['seconds'] for stage in self.stages.values())
+            processed = self.stages.get('parse', {}).get('items', 0)
+            return {
+                'started_at': self.started_at,
+                'stages': stages,
+                'total_seconds': round(total, 6),
+                'messages_per_second': round(processed / total, 1) if total else None,
+                'imap_commands': dict(self.imap_commands),
+                'imap_commands_total': sum(self.imap_commands.values()),
+                'bytes_fetched': self.bytes_fetched,
+                'imap_stages': {
+                    name: {
+                        'imap_commands': dict(totals['commands']),
+                        'imap_commands_total': sum(totals['commands'].values()),
+                        'bytes_fetched': totals['bytes'],
+                    }
+                    for name, totals in self.imap_stages.items()
+                },
+                'parse_failures': [
+                    {'domain': domain, 'subject_pattern': pattern, 'reason': reason, 'count': count}
+                    for (domain, pattern, reason), count in sorted(self.parse_failures.items())
+                ],
+                'memory': self.memory,
+            }
+
+    def to_prometheus(self):
+        """Render the summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, help_text, samples, kind='gauge'):
+            lines.append(f'# HELP {METRIC_PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{escape_label(val)}"' for key, val in labels.items())
+                lines.append(f'{METRIC_PREFIX}_{name}{{{label_text}}} {value}' if label_text
+                             else f'{METRIC_PREFIX}_{name} {value}')
+
+        stages = summary['stages']
+        metric('stage_seconds', 'Wall time spent in each stage.',
+               [({'stage': name}, stage['seconds']) for name, stage in stages.items()])
+        metric('stage_items', 'Messages handled by each stage.',
+               [({'stage': name}, stage['items']) for name, stage in stages.items()])
+        metric('messages_per_second', 'Parsed messages per second over the whole run.',
+               [({}, summary['messages_per_second'] or 0)])
+        metric('imap_commands_total', 'IMAP commands sent, by command.',
+               [({'command': name}, count) for name, count in summary['imap_commands'].items()], 'counter')
+        metric('imap_bytes_fetched_total', 'Bytes received in IMAP responses.',
+               [({}, summary['bytes_fetched'])], 'counter')
+        imap_stages = summary['imap_stages']
+        metric('imap_stage_commands_total', 'IMAP commands sent, by stage and command.',
+               [({'stage': name, 'command': command}, count)
+                for name, totals in imap_stages.items() for command, count in totals['imap_commands'].items()],
+               'counter')
+        metric('imap_stage_bytes_fetched_total', 'Bytes received in IMAP responses, by stage.',
+               [({'stage': name}, totals['bytes_fetched']) for name, totals in imap_stages.items()], 'counter')
+        metric('parse_failures_total',
+               'Messages that failed to parse or had no amount, by sender domain and subject pattern.',
+               [({'domain': failure['domain'], 'subject_pattern': failure['subject_pattern'],
+                  'reason': failure['reason']}, failure['count'])
+                for failure in summary['parse_failures']], 'counter')
+        if summary['memory']:
+            metric('peak_memory_bytes', 'Peak traced Python memory.', [({}, summary['memory']['peak_bytes'])])
+        metric('last_run_timestamp_seconds', 'When the run started.', [({}, round(summary['started_at'], 3))])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, output_format=None):
+        """Save the summary; the format follows the extension (.prom = Prometheus) unless given."""
+        output_format = output_format or ('prometheus' if path.endswith('.prom') else 'json')
+        if output_format == 'prometheus':
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.summary(), indent=2) + '\n'
+
+        # Textfile collectors may read at any moment; never expose a partial file
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(temp_path, path)
+        print(f"📈 Metrics written to {path}")
+
+
+class InstrumentedConnection:
+    """Wraps an IMAP connection to count commands and response bytes in RunMetrics."""
+
+    def __init__(self, connection, metrics):
+        self._connection = connection
+        self._metrics = metrics
+
+    def imap_stage(self, name):
+        """Attribute the commands sent during the block to stage `name` (see RunMetrics.imap_stage)."""
+        return self._metrics.imap_stage(name)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._connection, name)
+        if name == 'submit':
+            return self._counted_submit(attribute)
+        if name not in COUNTED_COMMANDS:
+            return attribute
+
+        def counted(*args, **kwargs):
+            command = name.upper()
+            if name == 'uid' and args:
+                command = f'UID {str(args[0]).upper()}'
+            result = attribute(*args, **kwargs)
+            self._metrics.record_command(command, result[1] if isinstance(result, tuple) else None)
+            return result
+        return counted
+
+    def _counted_submit(self, submit):
+        """Pipelined commands (BlockingIMAPClient) are counted once their response arrives."""
+        def counted(name, *args):
+            command = f'{name} {args[0]}'.upper() if name.upper() == 'UID' and args else name.upper()
+            # The response may arrive after the stage has moved on
+            stage = self._metrics.active_imap_stage
+            future = submit(name, *args)
+
+            def done(completed):
+                if not completed.cancelled() and completed.exception() is None:
+                    self._metrics.record_command(command, completed.result()[1], stage)
+                else:
+                    self._metrics.record_command(command, stage=stage)
+            future.add_done_callback(done)
+            return future
+        return counted
+
+
+class TimedFetcher:
+    """Wraps a fetcher and adds the time spent waiting on it, and its IMAP commands, to the 'fetch' stage."""
+
+    def __init__(self, fetcher, metrics):
+        self.fetcher = fetcher
+        self.metrics = metrics
+        self.seconds = 0.0
+
+    def __getattr__(self, name):
+        # missing_ids, hits, keys() and friends come from the wrapped fetcher
+        return getattr(self.fetcher, name)
+
+    def fetch_messages(self, mail, email_ids):
+        messages = iter(self.fetcher.fetch_messages(mail, email_ids))
+        with self.metrics.imap_stage('fetch'):
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(messages)
+                except StopIteration:
+                    self._add(time.perf_counter() - started, 0)
+                    return
+                self._add(time.perf_counter() - started, 1)
+                yield item
+
+    def _add(self, seconds, items):
+        self.seconds += seconds
+        self.metrics.add_stage_time('fetch', seconds, items)
+
+
+class Profiler:
+    """Optional cProfile and tracemalloc hooks around a run."""
+
+    def __init__(self, profile_path=None, trace_memory=False, top=25):
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self.top = top
+        self._profile = None
+
+    def start(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profile_path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self, metrics=None):
+        """Stop profiling, print the hot spots and attach memory figures to `metrics`."""
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.profile_path)
+            output = io.StringIO()
+            pstats.Stats(self._profile, stream=output).sort_stats('cumulative').print_stats(self.top)
+            print(f"\n🔬 Profile saved to {self.profile_path} (top {self.top} by cumulative time):")
+            print(output.getvalue())
+            self._profile = None
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top_stats = snapshot.statistics('lineno')[:10]
+            print(f"\n🧠 Memory: {current / 1024 / 1024:.1f} MB traced now, {peak / 1024 / 1024:.1f} MB peak")
+            for stat in top_stats:
+                print(f"   {stat}")
+            if metrics is not None:
+                metrics.memory = {
+                    'current_bytes': current,
+                    'peak_bytes': peak,
+                    'top': [{'location': str(stat.traceback[0]), 'bytes': stat.size} for stat in top_stats],
+                }
@@ -0,0 +1,171 @@
+import json
+import sys
+import time
+
+from .helpers import display_email_info
+
+
+PROGRESS_MODES = ('progress', 'detail', 'quiet')
+
+# Output that still gets through in quiet mode
+QUIET_MARKERS = ('❌', '⚠️')
+
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS or M:SS."""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ProgressReporter:
+    """Reports per-email progress while a batch is processed.
+
+    Modes:
+      - 'progress': one status line (rate, ETA, found/parsed/failed) redrawn at
+        most every `interval` seconds on a terminal; when stderr is not a
+        terminal (cron, CI) a plain line is logged every `log_interval` seconds.
+      - 'detail': the per-email listing from display_email_info.
+      - 'quiet': nothing.
+
+    With `events` (a path, or '-' for stdout) every step is also written as
+    a JSON line for log shipping.
+    """
+
+    def __init__(self, mode='progress', events=None, interval=0.2, log_interval=30.0, stream=None):
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Unknown progress mode {mode!r}")
+        self.mode = mode
+        self.stream = stream or sys.stderr
+        self.is_tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.interval = interval if self.is_tty else log_interval
+        self._events = None
+        self._owns_events = False
+        if events == '-':
+            self._events = sys.stdout
+        elif events:
+            self._events = open(events, 'a', encoding='utf-8')
+            self._owns_events = True
+        self._reset(0)
+
+    def _reset(self, total):
+        self.total = total
+        self.parsed_count = 0
+        self.failed_count = 0
+        self.started = time.monotonic()
+        # The first line appears after one interval, once the rate means something
+        self._last_draw = self.started
+        self._line_width = 0
+
+    @property
+    def done(self):
+        return self.parsed_count + self.failed_count
+
+    def event(self, name, **fields):
+        """Write one JSON-lines event, if an event stream is configured."""
+        if self._events is None:
+            return
+        fields = {'ts': round(time.time(), 3), 'event': name, **fields}
+        self._events.write(json.dumps(fields, ensure_ascii=False, default=str) + '\n')
+
+    def start(self, total):
+        """Begin a batch of `total` emails."""
+        self._reset(total)
+        self.event('batch_started', found=total)
+
+    def parsed(self, index, record):
+        self.parsed_count += 1
+        if self.mode == 'detail':
+            display_email_info(index, record)
+        self.event(
+            'email_parsed', email_id=record.email_id, sender=record.sender,
+            subject=record.subject, date=record.date, total_amount=record.total_amount,
+            currency=record.currency, merchant=record.merchant
+        )
+        self._maybe_draw()
+
+    def failed(self, index, email_id, error):
+        self.failed_count += 1
+        if self.mode == 'detail':
+            print(f"{index:2d}. Error processing email: {error}")
+            print(f"    {'-'*50}")
+        self.event('email_failed', email_id=email_id, error=str(error))
+        self._maybe_draw()
+
+    def status_line(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        parts = [f"⏳ {self.done:,}/{self.total:,}"]
+        if self.total:
+            parts[0] += f" ({self.done / self.total:.0%})"
+        parts.append(f"{rate:,.0f} emails/s")
+        if rate > 0 and self.total > self.done:
+            parts.append(f"ETA {format_duration((self.total - self.done) / rate)}")
+        parts.append(f"found {self.total:,} parsed {self.parsed_count:,} failed {self.failed_count:,}")
+        return ' | '.join(parts)
+
+    def _maybe_draw(self):
+        if self.mode != 'progress':
+            return
+        now = time.monotonic()
+        if now - self._last_draw < self.interval:
+            return
+        self._last_draw = now
+        self._draw()
+
+    def _draw(self, final=False):
+        line = self.status_line()
+        if self.is_tty:
+            # Pad over the previous, possibly longer, line
+            self.stream.write('\r' + line.ljust(self._line_width) + ('\n' if final else ''))
+            self._line_width = len(line)
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def finish(self):
+        """End the batch: draw the final status line and emit a summary event."""
+        elapsed = time.monotonic() - self.started
+        if self.mode == 'progress' and self.total:
+            self._draw(final=True)
+        self.event(
+            'batch_finished', found=self.total, parsed=self.parsed_count, failed=self.failed_count,
+            seconds=round(elapsed, 3)
+        )
+        if self._events is not None:
+            self._events.flush()
+
+    def close(self):
+        if self._owns_events and self._events is not None:
+            self._events.close()
+        self._events = None
+
+
+class QuietStdout:
+    """Stdout wrapper for --quiet that only lets warning and error lines through.
+
+    Text flushed without a trailing newline (an input() prompt) is passed
+    through as well, so interactive prompts stay visible.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._buffer = ''
+
+    def write(self, text):
+        self._buffer += text
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            if any(marker in line for marker in QUIET_MARKERS):
+                self.stream.write(line + '\n')
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self.stream.write(self._buffer)
+            self._buffer = ''
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
@@ -0,0 +1,23 @@
+import pytest
+
+from src.email.record import EmailRecord
+
+
+@pytest.fixture
+def filter_config():
+    """EmailFilter settings matching the senders and subjects of benchmarks.corpus."""
+    return {
+        'sender_domains': ['shopee.co.id', 'gojek.com', 'ovo.id', 'dana.id', 'bca.co.id', 'tokopedia.com'],
+        'subject_patterns': ['.*pembayaran.*', '.*receipt.*', '.*transaksi.*', '.*tagihan.*'],
+        'date_range_days': 30,
+        'fetch_batch_size': 50,
+    }
+
+
+@pytest.fixture
+def make_record():
+    """Factory for EmailRecords with Message-ID <r{index}@example.com>."""
+    def make(index, amount=1.0):
+        return EmailRecord('Shop <noreply@example.com>', f'Receipt {index}', '2024-10-12 09:40:00',
+                           f'<r{index}@example.com>', 'text', total_amount=amount)
+    return make
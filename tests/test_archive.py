@@ -0,0 +1,33 @@
+from src.email.archive import MailArchive
+from src.email.filter import EmailFilter
+
+def message(sender, subject, body):
+    return (f'From: {sender}\nTo: me@example.com\nSubject: {subject}\n'
+            f'Received: from mx.example.com\nDate: Mon, 05 Oct 2026 10:00:00 +0700\n\n{body}\n')
+
+
+def write_mbox(path, messages):
+    path.write_text(''.join(f'From sender@example.com Mon Oct  5 10:00:00 2026\n{text}\n' for text in messages))
+    return str(path)
+
+
+def test_mbox_matches_keep_only_header_fields_and_read_back(tmp_path, filter_config):
+    messages = [
+        message('OVO <noreply@ovo.id>', 'Bukti Pembayaran', 'Total Bayar Rp 25.000\n>From the OVO team'),
+        message('News <news@example.com>', 'Weekly receipt tips', 'Not a receipt'),
+        message('DANA <noreply@dana.id>', 'Your receipt', 'Total Rp 40.000'),
+    ]
+    archive = MailArchive(write_mbox(tmp_path / 'inbox.mbox', messages))
+    email_filter = EmailFilter(filter_config)
+    try:
+        keys = email_filter.filter_archive(archive)
+        assert len(keys) == 2
+        for key in keys:
+            headers = email_filter.headers[key]
+            assert sorted(headers.keys()) == ['Date', 'From', 'Subject']
+        raw = [archive.read_message(key).decode() for key in keys]
+    finally:
+        archive.close()
+
+    assert raw[0] == messages[0].replace('>From', 'From') + '\n'
+    assert raw[1] == messages[2] + '\n'
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_imap_async import AsyncFakeIMAPServer
+from src.email.async_client import BlockingIMAPClient, IMAPError
+
+LATENCY = 0.2
+
+
+@pytest.fixture
+def messages():
+    return generate_corpus(4, noise_ratio=0, attachment_kb=1)[0]
+
+
+@pytest.fixture
+def server(messages):
+    with AsyncFakeIMAPServer(messages, latency=LATENCY) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    client = BlockingIMAPClient('127.0.0.1', server.port, use_ssl=False)
+    client.login('me@example.com', 'secret')
+    client.select('INBOX')
+    yield client
+    client.shutdown()
+
+
+def literals(data):
+    return [item[1] for item in data if isinstance(item, tuple)]
+
+
+def test_submitted_commands_overlap_and_keep_their_own_results(client, messages):
+    started = time.perf_counter()
+    futures = [client.submit('UID', 'FETCH', str(uid), '(RFC822)') for uid in range(len(messages), 0, -1)]
+    results = [future.result(timeout=10) for future in futures]
+    elapsed = time.perf_counter() - started
+
+    # Serially these would take len(messages) round trips
+    assert elapsed < LATENCY * (len(messages) - 1)
+    assert [status for status, _ in results] == ['OK'] * len(messages)
+    assert [literals(data) for _, data in results] == [[raw] for raw in reversed(messages)]
+
+
+def test_bad_command_fails_only_its_own_future(client, messages):
+    before = client.submit('NOOP')
+    bad = client.submit('FROBNICATE')
+    after = client.submit('UID', 'FETCH', '1', '(RFC822)')
+
+    assert before.result(timeout=10) == ('OK', [None])
+    with pytest.raises(IMAPError, match='FROBNICATE'):
+        bad.result(timeout=10)
+    status, data = after.result(timeout=10)
+    assert status == 'OK' and literals(data) == [messages[0]]
+
+
+def test_lost_connection_fails_pending_and_later_commands(messages):
+    server = AsyncFakeIMAPServer(messages, latency=LATENCY).start()
+    client = BlockingIMAPClient('127.0.0.1', server.port, use_ssl=False)
+    try:
+        client.login('me@example.com', 'secret')
+        pending = client.submit('NOOP')
+        server.stop()
+        with pytest.raises(IMAPError, match='Connection lost'):
+            pending.result(timeout=10)
+        with pytest.raises(IMAPError, match='Connection lost'):
+            client.noop()
+    finally:
+        client.shutdown()
+
+
+def test_shutdown_closes_without_logout(server):
+    client = BlockingIMAPClient('127.0.0.1', server.port, use_ssl=False)
+    client.login('me@example.com', 'secret')
+    client.shutdown()
+
+    assert not client._thread.is_alive()
+    assert client._loop.is_closed()
+    assert server.command_counts['LOGOUT'] == 0
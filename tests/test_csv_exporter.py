@@ -0,0 +1,68 @@
+import csv
+import os
+
+import pytest
+
+from main import save_email_records
+from src.storage.csv_exporter import CSV_FIELDNAMES, CSVExporter
+
+
+def row_ids(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return sorted(row['email_id'] for row in csv.DictReader(file))
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return {row['email_id']: row['total_amount'] for row in csv.DictReader(file)}
+
+
+def test_stored_email_ids_are_skipped_in_later_runs(tmp_path, make_record):
+    exporter = CSVExporter(str(tmp_path / 'receipts.csv'))
+    exporter.save_records([make_record(1), make_record(2)])
+    exporter.save_records([make_record(2, 5.0), make_record(3)])
+
+    assert read_rows(exporter.filename) == {
+        '<r1@example.com>': '1.0', '<r2@example.com>': '1.0', '<r3@example.com>': '1.0'
+    }
+    with open(f'{exporter.filename}.ids', encoding='utf-8') as file:
+        assert sorted(file.read().split()) == ['<r1@example.com>', '<r2@example.com>', '<r3@example.com>']
+
+
+def test_missing_or_stale_index_is_rebuilt_from_the_csv(tmp_path, make_record):
+    exporter = CSVExporter(str(tmp_path / 'receipts.csv'))
+    exporter.save_records([make_record(1), make_record(2)])
+    index_path = f'{exporter.filename}.ids'
+
+    os.remove(index_path)
+    exporter.save_records([make_record(1, 5.0)])
+    assert row_ids(exporter.filename) == ['<r1@example.com>', '<r2@example.com>']
+
+    # A run that wrote a row but stopped before its index line
+    with open(exporter.filename, 'a', newline='', encoding='utf-8') as file:
+        csv.DictWriter(file, CSV_FIELDNAMES, extrasaction='ignore').writerow(make_record(3).as_dict())
+    stat = os.stat(exporter.filename)
+    os.utime(index_path, (stat.st_atime, stat.st_mtime - 10))
+    exporter.save_records([make_record(3, 5.0), make_record(4)])
+    assert row_ids(exporter.filename) == [f'<r{i}@example.com>' for i in range(1, 5)]
+
+
+def test_replace_keeps_rows_it_does_not_rewrite(tmp_path, make_record):
+    exporter = CSVExporter(str(tmp_path / 'receipts.csv'))
+    exporter.save_records([make_record(i) for i in range(5)])
+    exporter.save_records([make_record(1, 2.0), make_record(7, 2.0)], replace=True)
+
+    rows = read_rows(exporter.filename)
+    assert len(rows) == 6
+    assert rows['<r1@example.com>'] == '2.0'
+    assert rows['<r0@example.com>'] == '1.0'
+    # The index lists every row, so a later append still skips them
+    exporter.save_records([make_record(0, 3.0), make_record(7, 3.0)])
+    assert read_rows(exporter.filename) == rows
+
+
+def test_save_email_records_raises_when_the_csv_cannot_be_written(tmp_path, make_record):
+    # A directory in place of the CSV file, standing in for a full disk or missing permissions
+    (tmp_path / 'receipts.csv').mkdir()
+    with pytest.raises(OSError):
+        save_email_records(iter([make_record(1)]), CSVExporter(str(tmp_path / 'receipts.csv')))
@@ -0,0 +1,69 @@
+import pytest
+
+from src.email.parser import charset_codec, decode_payload, html_to_text
+
+
+@pytest.mark.parametrize('charset, codec', [
+    ('UTF-8', 'utf-8'),
+    ('"utf-8"', 'utf-8'),
+    ('iso-8859-1', 'cp1252'),
+    ('latin1', 'cp1252'),
+    ('windows-1252', 'cp1252'),
+    ('iso-8859-2', 'iso8859-2'),
+    ('us-ascii', None),
+    ('x-unknown', None),
+    ('', None),
+    (None, None),
+])
+def test_charset_codec(charset, codec):
+    assert charset_codec(charset) == codec
+
+
+@pytest.mark.parametrize('content, charset, text', [
+    # Declared charset
+    ('Harga: 25.000 – Café'.encode('utf-8'), 'utf-8', 'Harga: 25.000 – Café'),
+    ('Żółć'.encode('iso-8859-2'), 'iso-8859-2', 'Żółć'),
+    # Declared Latin-1 is read as Windows-1252, which has the en dash
+    ('Café – Rp'.encode('cp1252'), 'iso-8859-1', 'Café – Rp'),
+    # ASCII fast path, with or without a label
+    (b'Total Rp 10.000', None, 'Total Rp 10.000'),
+    (b'Total Rp 10.000', 'us-ascii', 'Total Rp 10.000'),
+    # Unknown label: the bytes decide
+    ('Café'.encode('utf-8'), 'x-unknown', 'Café'),
+    ('Café'.encode('cp1252'), 'x-unknown', 'Café'),
+    # Wrong label: UTF-8 bytes declared as Shift_JIS fail and fall back to UTF-8
+    ('Rp 5.000 – lunas ✓'.encode('utf-8'), 'shift_jis', 'Rp 5.000 – lunas ✓'),
+    # Mislabelled 8-bit text declared as UTF-8 falls back to Windows-1252
+    ('Café – Rp'.encode('cp1252'), 'utf-8', 'Café – Rp'),
+    ('Café'.encode('cp1252'), None, 'Café'),
+])
+def test_decode_payload(content, charset, text):
+    assert decode_payload(content, charset) == text
+
+
+def test_decode_payload_never_raises():
+    # 0x81 is unassigned in Windows-1252
+    assert decode_payload(b'Rp \x81 5.000', 'utf-8') == 'Rp � 5.000'
+
+
+@pytest.mark.parametrize('content, text', [
+    ('<p>Total</p><p>Rp 25.000</p>', 'Total Rp 25.000'),
+    ('<b\n class="x">Total</b>', 'Total'),
+    # Every tag is a word break, inline ones too; the old cleaner deleted tags
+    # and would have given 'Total' and 'Rp 25.000' here
+    ('Tot<span>al</span>', 'Tot al'),
+    ('Rp 25<b>.000</b>', 'Rp 25 .000'),
+    # Style, script and comments are dropped with their content, even unterminated
+    ('<STYLE>p { color: red }</STYLE >Total', 'Total'),
+    ('<script>if (a < b) {}</script>Rp', 'Rp'),
+    ('<!-- <b>x</b> -->Total', 'Total'),
+    ('Total<style>p { color: red }', 'Total'),
+    ('Total<!-- unterminated', 'Total'),
+    # Entities are unescaped after the markup is gone, so they never become tags
+    ('Kopi &amp; Co.&nbsp;Jaya', 'Kopi & Co. Jaya'),
+    ('&lt;b&gt;Rp', '<b>Rp'),
+    ('Total\n\n  Rp\t5.000', 'Total Rp 5.000'),
+    ('', ''),
+])
+def test_html_to_text(content, text):
+    assert html_to_text(content) == text
@@ -0,0 +1,139 @@
+import email
+import email.policy
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_imap import FakeIMAPServer
+from src.email.connector import EmailConnector
+from src.email.fetcher import BatchFetcher, compress_sequence_set, parse_fetch_response
+from src.email.parser import EmailParser
+from src.parser.receipt_parser import ReceiptParser
+
+
+def test_compress_sequence_set():
+    assert compress_sequence_set(['3', b'1', 2, '5', b'7', 8, '8', '10']) == '1:3,5,7:8,10'
+    assert compress_sequence_set([42]) == '42'
+    assert compress_sequence_set([]) == ''
+
+
+# FETCH data shaped as imaplib returns it: a literal is a (line up to {n}, bytes)
+# tuple and the rest of that line follows as bytes
+def test_parse_fetch_response_multi_message_literals():
+    data = [
+        (b'1 (UID 10 RFC822 {14}', b'Subject: a\r\n\r\n'),
+        b')',
+        (b'2 (UID 11 RFC822.SIZE 5 RFC822 {5}', b'hello'),
+        b' FLAGS (\\Seen))',
+    ]
+    assert parse_fetch_response(data) == [
+        (1, {'UID': '10', 'RFC822': b'Subject: a\r\n\r\n'}),
+        (2, {'UID': '11', 'RFC822.SIZE': '5', 'RFC822': b'hello', 'FLAGS': ['\\Seen']}),
+    ]
+
+
+def test_parse_fetch_response_section_atoms_and_several_literals():
+    data = [
+        (b'7 (UID 42 BODY[HEADER.FIELDS (SUBJECT FROM)] {12}', b'Subject: x\r\n'),
+        (b' BODY[1.2] {3}', b'abc'),
+        b')',
+    ]
+    assert parse_fetch_response(data) == [
+        (7, {'UID': '42', 'BODY[HEADER.FIELDS (SUBJECT FROM)]': b'Subject: x\r\n', 'BODY[1.2]': b'abc'}),
+    ]
+
+
+def test_parse_fetch_response_quoted_strings_and_nil():
+    data = [
+        b'3 (UID 9 BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "utf-8" "NAME" "a \\"b\\" \\\\ c.txt") '
+        b'NIL NIL "QUOTED-PRINTABLE" 120 4))',
+    ]
+    assert parse_fetch_response(data) == [
+        (3, {'UID': '9', 'BODYSTRUCTURE': [
+            'TEXT', 'PLAIN', ['CHARSET', 'utf-8', 'NAME', 'a "b" \\ c.txt'], None, None, 'QUOTED-PRINTABLE', '120', '4'
+        ]}),
+    ]
+
+
+def test_parse_fetch_response_skips_what_is_not_a_message():
+    assert parse_fetch_response([None]) == []
+    assert parse_fetch_response([b'BYE (x)', b'5 EXISTS', b'6 (FLAGS ())']) == [(6, {'FLAGS': []})]
+
+
+def test_parse_fetch_response_of_a_live_imaplib_fetch():
+    messages = [b'Subject: one\r\nFrom: a@ovo.id\r\n\r\nbody 1\r\n', b'Subject: two\r\n\r\nbody 2\r\n']
+    with FakeIMAPServer(messages) as server:
+        connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+        connector.connect('me@example.com', 'secret')
+        mail = connector.get_connection()
+        mail.select('INBOX')
+        _, data = mail.uid('FETCH', '1:2', '(RFC822.SIZE BODY.PEEK[HEADER.FIELDS (SUBJECT)])')
+        connector.disconnect()
+
+    assert parse_fetch_response(data) == [
+        (seq, {'UID': str(seq), 'RFC822.SIZE': str(len(raw)),
+               'BODY[HEADER.FIELDS (SUBJECT)]': raw.split(b'\r\n')[0] + b'\r\n\r\n'})
+        for seq, raw in enumerate(messages, 1)
+    ]
+
+
+def receipt_without_message_id():
+    message = MIMEMultipart('mixed')
+    message['From'] = 'OVO <noreply@ovo.id>'
+    message['Subject'] = 'Bukti Pembayaran'
+    message['Date'] = 'Mon, 05 Oct 2026 10:00:00 +0700'
+    message.attach(MIMEText('Terima kasih telah berbelanja', 'plain'))
+    message.attach(MIMEApplication(b'%PDF' * 256, Name='receipt.pdf'))
+    message.attach(MIMEText('Total Bayar Rp 25.000', 'plain'))
+    return message.as_bytes(policy=email.policy.SMTP)
+
+
+def test_text_only_fetch_gives_the_same_fallback_id_every_run():
+    with FakeIMAPServer([receipt_without_message_id()]) as server:
+        connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+        connector.connect('me@example.com', 'secret')
+        mail = connector.get_connection()
+        mail.select('INBOX')
+        fetcher = BatchFetcher(use_uid=True, text_only=True)
+        runs = [dict(fetcher.fetch_messages(mail, ['1'])) for _ in range(2)]
+        full = dict(BatchFetcher(use_uid=True).fetch_messages(mail, ['1']))
+        connector.disconnect()
+
+    assert runs[0] == runs[1]
+    email_parser = EmailParser()
+    record = email_parser.extract_email_info(email.message_from_bytes(runs[0]['1']))
+    assert record.email_id.startswith('no-id-')
+    # Switching partial_body_fetch off must not give the same email a new id
+    assert email_parser.extract_email_info(email.message_from_bytes(full['1'])).email_id == record.email_id
+    assert b'%PDF' not in runs[0]['1'] and b'boundary=' in runs[0]['1']
+    assert 'Rp 25.000' in record.body
+
+
+def test_text_only_fetch_parses_like_the_full_message():
+    # The corpus mixes charsets and transfer encodings, 8bit windows-1252 included
+    messages, expected = generate_corpus(40, noise_ratio=0, attachment_kb=1)
+    with FakeIMAPServer(messages) as server:
+        connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+        connector.connect('me@example.com', 'secret')
+        mail = connector.get_connection()
+        mail.select('INBOX')
+        email_ids = [str(uid) for uid in range(1, len(messages) + 1)]
+        full_fetcher = BatchFetcher(use_uid=True)
+        text_fetcher = BatchFetcher(use_uid=True, text_only=True)
+        full = dict(full_fetcher.fetch_messages(mail, email_ids))
+        partial = dict(text_fetcher.fetch_messages(mail, email_ids))
+        connector.disconnect()
+
+    assert not text_fetcher.missing_ids and not text_fetcher.errors
+    assert set(partial) == set(full) == set(email_ids)
+    email_parser, receipt_parser = EmailParser(), ReceiptParser()
+    for email_id in email_ids:
+        records = [
+            receipt_parser.parse_receipt_data(
+                email_parser.extract_email_info(email.message_from_bytes(raw))
+            )
+            for raw in (full[email_id], partial[email_id])
+        ]
+        assert records[1].body == records[0].body
+        assert records[1].total_amount == records[0].total_amount == expected[int(email_id) - 1]['amount']
@@ -0,0 +1,77 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_imap import FakeIMAPServer
+from src.email.connector import EmailConnector
+from src.email.filter import EmailFilter, build_or_query, quote
+
+CUTOFF = datetime(2026, 9, 17)
+
+
+def queries(filter_config, mode, capabilities=(), since_uid=None, **settings):
+    email_filter = EmailFilter({**filter_config, 'sender_search_mode': mode, **settings})
+    mail = SimpleNamespace(capabilities=capabilities)
+    return [criteria for _, criteria in email_filter.sender_queries(mail, CUTOFF, since_uid)]
+
+
+def test_build_or_query_nests_pairs():
+    assert build_or_query(['A']) == 'A'
+    assert build_or_query(['A', 'B']) == 'OR A B'
+    assert build_or_query(['A', 'B', 'C', 'D']) == 'OR A OR B OR C D'
+
+
+def test_quote_escapes_backslashes_and_quotes():
+    assert quote('ovo.id') == '"ovo.id"'
+    assert quote('a "b" \\c') == '"a \\"b\\" \\\\c"'
+
+
+def test_or_queries_are_chunked_and_windowed(filter_config):
+    assert queries(filter_config, 'or', sender_search_chunk_size=4) == [
+        '(OR FROM "shopee.co.id" OR FROM "gojek.com" OR FROM "ovo.id" FROM "dana.id") SINCE "17-Sep-2026"',
+        '(OR FROM "bca.co.id" FROM "tokopedia.com") SINCE "17-Sep-2026"',
+    ]
+    assert queries(filter_config, 'or', since_uid=41, sender_search_chunk_size=5) == [
+        '(OR FROM "shopee.co.id" OR FROM "gojek.com" OR FROM "ovo.id" OR FROM "dana.id" FROM "bca.co.id") UID 42:*',
+        '(FROM "tokopedia.com") UID 42:*',
+    ]
+
+
+def test_per_domain_queries(filter_config):
+    assert queries(filter_config, 'per_domain', since_uid=9)[:2] == [
+        '(FROM "shopee.co.id" UID 10:*)', '(FROM "gojek.com" UID 10:*)',
+    ]
+
+
+def test_gmail_raw_queries(filter_config):
+    assert queries(filter_config, 'gmail', ('X-GM-EXT-1',), sender_search_chunk_size=3) == [
+        'X-GM-RAW "from:(shopee.co.id OR gojek.com OR ovo.id) after:2026/09/17"',
+        'X-GM-RAW "from:(dana.id OR bca.co.id OR tokopedia.com) after:2026/09/17"',
+    ]
+    assert queries(filter_config, 'gmail', ('X-GM-EXT-1',), since_uid=7, sender_search_chunk_size=6) == [
+        'X-GM-RAW "from:(shopee.co.id OR gojek.com OR ovo.id OR dana.id OR bca.co.id OR tokopedia.com)" UID 8:*',
+    ]
+    # Without the Gmail extension the OR search is used
+    assert queries(filter_config, 'gmail', sender_search_chunk_size=6)[0].startswith('(OR FROM "shopee.co.id"')
+
+
+@pytest.mark.parametrize('since_uid', [None, 12])
+def test_search_modes_find_the_same_emails(filter_config, since_uid):
+    messages, _ = generate_corpus(30, noise_ratio=0.5, attachment_kb=1)
+    found = {}
+    with FakeIMAPServer(messages, capabilities=('IMAP4rev1', 'X-GM-EXT-1')) as server:
+        connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+        connector.connect('me@example.com', 'secret')
+        mail = connector.get_connection()
+        for mode in ('per_domain', 'or', 'gmail'):
+            email_filter = EmailFilter({**filter_config, 'sender_search_mode': mode, 'sender_search_chunk_size': 4})
+            email_filter.select_mailbox(mail)
+            found[mode] = email_filter.filter_by_sender(mail, since_uid)
+        connector.disconnect()
+
+    assert found['per_domain']
+    assert found['per_domain'] == found['or'] == found['gmail']
+    if since_uid is not None:
+        assert min(int(uid) for uid in found['or']) > since_uid
@@ -0,0 +1,93 @@
+import email.policy
+from email.mime.text import MIMEText
+
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_imap import FakeIMAPServer
+from main import process_emails_batch
+from src.email.connector import EmailConnector
+from src.email.filter import EmailFilter
+from src.email.parser import EmailParser
+from src.email.subject_matcher import SubjectMatcher
+from src.parser.receipt_parser import ReceiptParser
+from src.utils.metrics import RunMetrics
+
+
+@pytest.mark.parametrize('client', ['imaplib', 'asyncio'])
+def test_imap_commands_are_attributed_to_their_stage(client, filter_config):
+    messages, _ = generate_corpus(10, noise_ratio=0, attachment_kb=4)
+    metrics = RunMetrics()
+    with FakeIMAPServer(messages) as server:
+        connector = EmailConnector('127.0.0.1', server.port, use_ssl=False, client=client, metrics=metrics)
+        with metrics.stage('connect'):
+            connector.connect('me@example.com', 'secret')
+        mail = connector.get_connection()
+        email_filter = EmailFilter(filter_config)
+        with metrics.stage('search'):
+            email_ids = email_filter.get_filtered_emails(mail, 100)
+        records = process_emails_batch(
+            mail, email_ids, EmailParser(), ReceiptParser(), batch_size=50, headers=email_filter.headers,
+            use_uid=True, metrics=metrics
+        )
+        connector.disconnect()
+
+    assert len(records) == 10
+    stages = metrics.summary()['imap_stages']
+    assert set(stages['connect']['imap_commands']) == {'LOGIN'}
+    assert set(stages['search']['imap_commands']) == {'SELECT', 'UID SEARCH'}
+    assert set(stages['headers']['imap_commands']) == {'UID FETCH'}
+    assert set(stages['fetch']['imap_commands']) == {'UID FETCH'}
+    assert stages['fetch']['bytes_fetched'] > 10 * 4096 > stages['headers']['bytes_fetched']
+    assert sum(stage['imap_commands_total'] for stage in stages.values()) == metrics.summary()['imap_commands_total']
+    assert sum(stage['bytes_fetched'] for stage in stages.values()) == metrics.bytes_fetched
+    assert 'receipt_parser_imap_stage_bytes_fetched_total{stage="fetch"}' in metrics.to_prometheus()
+
+
+def test_parse_failures_are_keyed_by_domain_and_subject_pattern(filter_config):
+    metrics = RunMetrics(SubjectMatcher(filter_config['subject_patterns']))
+    metrics.record_parse_failure('OVO <noreply@ovo.id>', 'Bukti Pembayaran', 'no_amount')
+    metrics.record_parse_failure('OVO <noreply@ovo.id>', 'Bukti Pembayaran #2', 'no_amount')
+    metrics.record_parse_failure('OVO <noreply@ovo.id>', 'Your receipt', 'no_amount')
+    metrics.record_parse_failure('DANA <no-reply@dana.id>', 'Your receipt', 'error')
+    metrics.record_parse_failure(None, None, 'error')
+
+    assert metrics.summary()['parse_failures'] == [
+        {'domain': 'dana.id', 'subject_pattern': '.*receipt.*', 'reason': 'error', 'count': 1},
+        {'domain': 'ovo.id', 'subject_pattern': '.*pembayaran.*', 'reason': 'no_amount', 'count': 2},
+        {'domain': 'ovo.id', 'subject_pattern': '.*receipt.*', 'reason': 'no_amount', 'count': 1},
+        {'domain': 'unknown', 'subject_pattern': 'unmatched', 'reason': 'error', 'count': 1},
+    ]
+    assert ('receipt_parser_parse_failures_total{domain="ovo.id",subject_pattern=".*pembayaran.*",'
+            'reason="no_amount"} 2') in metrics.to_prometheus()
+
+
+def test_emails_without_an_amount_count_against_their_subject_pattern(filter_config):
+    def receipt(subject, text):
+        message = MIMEText(text, 'plain', 'utf-8')
+        message['From'] = 'GoPay <no-reply@gojek.com>'
+        message['Subject'] = subject
+        message['Date'] = 'Mon, 05 Oct 2026 10:00:00 +0700'
+        return message.as_bytes(policy=email.policy.SMTP)
+
+    messages = [
+        receipt('Transaksi berhasil', 'Total Bayar Rp 25.000'),
+        receipt('Transaksi berhasil', 'Terima kasih'),
+        receipt('=?utf-8?q?Tagihan_bulan_ini?=', 'Lihat aplikasi'),
+    ]
+    email_filter = EmailFilter(filter_config)
+    metrics = RunMetrics(email_filter.subject_matcher)
+    with FakeIMAPServer(messages) as server:
+        connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+        connector.connect('me@example.com', 'secret')
+        mail = connector.get_connection()
+        email_ids = email_filter.get_filtered_emails(mail, 100)
+        process_emails_batch(
+            mail, email_ids, EmailParser(), ReceiptParser(), batch_size=50, headers=email_filter.headers,
+            use_uid=True, metrics=metrics
+        )
+        connector.disconnect()
+
+    assert [(f['subject_pattern'], f['count']) for f in metrics.summary()['parse_failures']] == [
+        ('.*tagihan.*', 1), ('.*transaksi.*', 1),
+    ]
@@ -0,0 +1,58 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from src.storage.parquet_exporter import ParquetExporter
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def read(directory, dataset):
+    """Rows of one dataset ('receipts' or 'raw') as {email_id: row}."""
+    table = pq.read_table(os.path.join(directory, dataset))
+    return {row['email_id']: row for row in table.to_pylist()}
+
+
+def test_append_adds_a_part_per_run(tmp_path, make_record):
+    exporter = ParquetExporter(str(tmp_path / 'receipts.parquet'))
+    assert exporter.save_records([make_record(1, 10.0), make_record(2, 20.0)])
+    assert exporter.save_records([make_record(3, 30.0)])
+
+    receipts = read(exporter.directory, 'receipts')
+    assert sorted(receipts) == ['<r1@example.com>', '<r2@example.com>', '<r3@example.com>']
+    assert receipts['<r2@example.com>']['total_amount'] == 20.0
+    assert receipts['<r2@example.com>']['sender'] == 'Shop <noreply@example.com>'
+    assert receipts['<r2@example.com>']['date'] == datetime(2024, 10, 12, 9, 40)
+    assert 'raw' not in receipts['<r2@example.com>']
+    assert len(os.listdir(os.path.join(exporter.directory, 'receipts'))) == 2
+
+
+def test_raw_text_goes_to_the_sidecar_dataset(tmp_path, make_record):
+    exporter = ParquetExporter(str(tmp_path / 'receipts.parquet'))
+    exporter.save_records([make_record(1), make_record(2)])
+
+    raw = read(exporter.directory, 'raw')
+    assert {email_id: row['raw'] for email_id, row in raw.items()} == {
+        '<r1@example.com>': 'text', '<r2@example.com>': 'text',
+    }
+    assert set(raw) == set(read(exporter.directory, 'receipts'))
+
+
+def test_replace_removes_the_old_rows(tmp_path, make_record):
+    exporter = ParquetExporter(str(tmp_path / 'receipts.parquet'))
+    exporter.save_records([make_record(1, 1.0), make_record(2, 1.0)])
+    exporter.save_records([make_record(3, 1.0)])
+    exporter.save_records([make_record(1, 5.0), make_record(3, 5.0)], replace=True)
+
+    for dataset in ('receipts', 'raw'):
+        rows = pq.read_table(os.path.join(exporter.directory, dataset)).to_pylist()
+        assert sorted(row['email_id'] for row in rows) == [
+            '<r1@example.com>', '<r2@example.com>', '<r3@example.com>'
+        ]
+    receipts = read(exporter.directory, 'receipts')
+    assert {email_id: row['total_amount'] for email_id, row in receipts.items()} == {
+        '<r1@example.com>': 5.0, '<r2@example.com>': 1.0, '<r3@example.com>': 5.0,
+    }
+    # The second part only held <r3>, so it is gone; no temporary files are left
+    assert len(os.listdir(os.path.join(exporter.directory, 'receipts'))) == 2
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from benchmarks.bench_amount import fuzz_text, legacy_extract_total_amount
+from src.email.record import EmailRecord
+from src.parser.receipt_parser import (
+    _COMPILED_AMOUNT_PATTERNS, ReceiptParser, find_amount_candidates, parse_idr_amount,
+)
+
+
+def parse(text, sender='Shop <noreply@example.com>', subject='Receipt'):
+    record = EmailRecord(sender, subject, None, '<test@example.com>', text, body=text)
+    return ReceiptParser().parse_receipt_data(record)
+
+
+@pytest.mark.parametrize('text, amount', [
+    # A quantity printed before the total is not the total
+    ('Jumlah: 2 Total: Rp 100.000', 100000.0),
+    ('Jumlah barang 1 Harga Rp 150.000 Ongkir Rp 10.000 Total Rp 160.000', 160000.0),
+    ('Order ID 12345 Amount 1 pcs Grand Total Rp 99.000', 99000.0),
+    # The most specific label wins over an earlier, broader one
+    ('Total Rp 90.000 Diskon Rp 5.000 Grand Total Rp 85.000', 85000.0),
+    ('Voucher -Rp10.000 Total Pembayaran Rp50.000', 50000.0),
+])
+def test_labeled_total_ranking(text, amount):
+    record = parse(text)
+    assert record.total_amount == amount
+    assert record.currency == 'IDR'
+
+
+def test_bare_number_needs_currency_or_minimum():
+    parser = ReceiptParser()
+    assert parser.parse_labeled_amount('2') == (None, None)
+    assert parser.parse_labeled_amount('2 pcs') == (None, None)
+    assert parser.parse_labeled_amount('150.000') == (150000.0, 'IDR')
+    assert parser.parse_labeled_amount('Rp 5.000') == (5000.0, 'IDR')
+    assert parser.parse_labeled_amount('S$ 12.50') == (12.5, 'SGD')
+
+
+def test_wallet_parser_labels():
+    text = ('Pembayaran DANA Merchant PLN Prabayar Tanggal Transaksi 12 Okt 2024 09:40 WIB '
+            'No. Referensi 123456789012 Jumlah 1 Total Rp 176.000')
+    record = parse(text, sender='DANA <no-reply@dana.id>', subject='Transaksi DANA Berhasil')
+    assert record.total_amount == 176000.0
+    assert record.merchant == 'PLN Prabayar'
+    assert record.reference_id == '123456789012'
+    assert record.transaction_date == '2024-10-12 09:40:00'
+
+
+def test_no_amount_defaults_to_zero():
+    record = parse('Terima kasih telah berbelanja')
+    assert record.total_amount == 0.0
+    assert record.currency is None
+
+
+AMOUNT_TEXTS = [
+    'Total: Rp 123.456',
+    'TOTAL PAID Rp 1.250.000,00',
+    'Subtotal Rp 90.000 Diskon Rp 5.000 Total Rp 85.000',
+    'Rp 12.500 (total)',
+    'amount: Rp 99,5',
+    'Total 7.5 Rp 3',
+    'IDRp 5.000',
+    'amountotal: 12.500',
+    'Bayar IDR 50.000 atau Rupiah 50.000',
+    # A keyword with no amount after it, then one with an unparseable amount
+    'Total belum tersedia, Rp , lalu Rp 10.000',
+    'Total: .,. Total: 20.000',
+    # 'İ' lowercases to two characters, so the scan falls back to the original text
+    'İstanbul Total Rp 45.000',
+    'Terima kasih telah berbelanja',
+    '',
+]
+
+
+def per_pattern_candidates(text):
+    """The leftmost match of every amount pattern, one re.search each."""
+    candidates = {}
+    for priority, (_, regex) in enumerate(_COMPILED_AMOUNT_PATTERNS):
+        match = regex.search(text)
+        if match:
+            candidates[priority] = match.group(1)
+    return candidates
+
+
+def best_amount(candidates):
+    return next(
+        (amount for amount in (parse_idr_amount(candidates[p]) for p in sorted(candidates)) if amount is not None),
+        None
+    )
+
+
+@pytest.mark.parametrize('text', AMOUNT_TEXTS)
+def test_amount_candidates_match_a_search_per_pattern(text):
+    expected = per_pattern_candidates(text)
+    candidates = find_amount_candidates(text)
+
+    # The scan may stop early, but every candidate it found is the leftmost one
+    assert candidates == {priority: expected[priority] for priority in candidates}
+    if 0 not in candidates:
+        assert candidates == expected
+    assert best_amount(candidates) == best_amount(expected)
+
+
+def test_total_amount_matches_the_legacy_pattern_loop():
+    rng = random.Random(7)
+    texts = AMOUNT_TEXTS + [fuzz_text(rng, rng.randint(1, 12)) for _ in range(2000)]
+    parser = ReceiptParser()
+    assert [parser.extract_total_amount(text) for text in texts] == [legacy_extract_total_amount(text) for text in texts]
@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from src.parser.pipeline import ParsePipeline
+
+
+def raw_email(index):
+    return (f'From: ShopeePay <noreply@shopee.co.id>\r\nSubject: Receipt {index}\r\n'
+            f'Message-ID: <r{index}@shopee.co.id>\r\n\r\nTotal Pembayaran Rp{index}.000\r\n').encode()
+
+
+class FailingFetcher:
+    """Returns `count` emails, then raises like a dropped connection."""
+
+    def __init__(self, count, error=None):
+        self.count = count
+        self.error = error
+        self.missing_ids = []
+
+    def fetch_messages(self, mail, email_ids):
+        for email_id in email_ids[:self.count]:
+            yield email_id, raw_email(email_id)
+        if self.error is not None:
+            raise self.error
+
+
+def test_fetch_error_is_raised_after_fetched_emails():
+    results = []
+    with pytest.raises(OSError, match='connection reset'):
+        for email_id, record in ParsePipeline(2, queue_size=2).run(
+            FailingFetcher(3, OSError('connection reset')), None, list(range(1, 11))
+        ):
+            results.append((email_id, record.total_amount))
+    assert results == [(1, 1000.0), (2, 2000.0), (3, 3000.0)]
+
+
+def test_early_stop_releases_fetch_thread():
+    before = threading.active_count()
+    results = ParsePipeline(1, queue_size=1).run(FailingFetcher(50), None, list(range(1, 51)))
+    assert next(results)[0] == 1
+    results.close()
+    assert threading.active_count() == before
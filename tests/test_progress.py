@@ -0,0 +1,128 @@
+import io
+import json
+import time
+import types
+
+import pytest
+
+from src.utils import progress as progress_module
+from src.utils.progress import ProgressReporter, QuietStdout
+
+
+class Terminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable monotonic clock for ProgressReporter; clock.now is in seconds."""
+    clock = types.SimpleNamespace(now=0.0)
+    monkeypatch.setattr(progress_module, 'time', types.SimpleNamespace(monotonic=lambda: clock.now, time=time.time))
+    return clock
+
+
+def run_batch(reporter, clock, make_record, timestamps, total=None):
+    """Report one parsed email at each timestamp, then finish at the last one."""
+    reporter.start(total or len(timestamps))
+    for index, now in enumerate(timestamps, 1):
+        clock.now = now
+        reporter.parsed(index, make_record(index))
+    reporter.finish()
+
+
+def test_log_lines_are_throttled_when_not_a_terminal(clock, make_record):
+    stream = io.StringIO()
+    reporter = ProgressReporter(stream=stream, interval=0.2, log_interval=30)
+    run_batch(reporter, clock, make_record, [1, 2, 31, 40, 61, 62])
+
+    lines = stream.getvalue().splitlines()
+    # At 31 and 61, then the final line from finish()
+    assert len(lines) == 3
+    assert lines[0].startswith('⏳ 3/6 (50%)')
+    assert lines[-1].startswith('⏳ 6/6 (100%)')
+    assert lines[-1].endswith('found 6 parsed 6 failed 0')
+    assert '\r' not in stream.getvalue()
+
+
+def test_terminal_line_is_redrawn_in_place(clock, make_record):
+    stream = Terminal()
+    reporter = ProgressReporter(stream=stream, interval=0.2, log_interval=30)
+    reporter.start(1000)
+    clock.now = 0.1
+    reporter.parsed(1, make_record(1))
+    assert stream.getvalue() == ''
+
+    clock.now = 0.3
+    reporter.parsed(2, make_record(2))
+    reporter.failed(3, '3', ValueError('bad'))
+    clock.now = 1.0
+    reporter.finish()
+
+    draws = stream.getvalue().split('\r')[1:]
+    assert len(draws) == 2
+    assert draws[0].startswith('⏳ 2/1,000 (0%)') and 'ETA' in draws[0]
+    # The final line pads over the previous one and ends the terminal line
+    assert draws[1].startswith('⏳ 3/1,000') and draws[1].endswith('\n')
+    assert len(draws[1]) - 1 >= len(draws[0])
+
+
+@pytest.mark.parametrize('mode', ['quiet', 'detail'])
+def test_only_progress_mode_draws_a_status_line(clock, make_record, capsys, mode):
+    stream = Terminal()
+    reporter = ProgressReporter(mode, stream=stream)
+    run_batch(reporter, clock, make_record, [1, 2, 3])
+
+    assert stream.getvalue() == ''
+    assert bool(capsys.readouterr().out) == (mode == 'detail')
+
+
+def test_empty_batch_draws_nothing(clock):
+    stream = Terminal()
+    reporter = ProgressReporter(stream=stream)
+    reporter.start(0)
+    reporter.finish()
+    assert stream.getvalue() == ''
+
+
+def test_events_are_json_lines(clock, make_record, tmp_path):
+    path = tmp_path / 'events.jsonl'
+    reporter = ProgressReporter('quiet', events=str(path))
+    reporter.start(2)
+    reporter.parsed(1, make_record(1, amount=25000.0))
+    reporter.failed(2, '2', ValueError('bad'))
+    reporter.finish()
+    reporter.close()
+
+    events = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [event['event'] for event in events] == ['batch_started', 'email_parsed', 'email_failed', 'batch_finished']
+    assert events[1]['email_id'] == '<r1@example.com>' and events[1]['total_amount'] == 25000.0
+    assert events[2]['error'] == 'bad'
+    assert (events[3]['found'], events[3]['parsed'], events[3]['failed']) == (2, 1, 1)
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match='verbose'):
+        ProgressReporter('verbose')
+
+
+def test_quiet_stdout_only_passes_warnings_and_errors():
+    stream = io.StringIO()
+    quiet = QuietStdout(stream)
+    print('📧 Processing 10 emails', file=quiet)
+    print('⚠️ Skipped 2 duplicates', file=quiet)
+    # A line written in pieces is judged once it is complete
+    quiet.write('❌ Export ')
+    assert stream.getvalue() == '⚠️ Skipped 2 duplicates\n'
+    quiet.write('failed\nDone\n')
+
+    assert stream.getvalue() == '⚠️ Skipped 2 duplicates\n❌ Export failed\n'
+
+
+def test_quiet_stdout_lets_prompts_through_on_flush():
+    stream = io.StringIO()
+    quiet = QuietStdout(stream)
+    quiet.write('Email password: ')
+    quiet.flush()
+    assert stream.getvalue() == 'Email password: '
+    assert quiet.getvalue() == stream.getvalue()
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.email.record import EmailRecord
+
+RAW_WITHOUT_ID = (b'From: OVO <noreply@ovo.id>\r\nSubject: Bukti Pembayaran\r\n'
+                  b'Date: Mon, 05 Oct 2026 10:00:00 +0700\r\n\r\nTotal Bayar Rp 25.000\r\n')
+
+FALLBACK_ID_SCRIPT = '''
+import email, sys
+from src.email.parser import EmailParser
+raw = sys.stdin.buffer.read()
+print(EmailParser().extract_email_info(email.message_from_bytes(raw)).email_id)
+'''
+
+
+def test_lookups_by_column_name(make_record):
+    record = make_record(1, 25000.0)
+    assert record['from'] == record.get('from') == 'Shop <noreply@example.com>'
+    assert record['email_id'] == '<r1@example.com>'
+    assert record['merchant'] is None
+    assert record.get('merchant') is None and record.get('merchant', '') == ''
+    assert record.get('body', 'x') == 'x'
+    with pytest.raises(KeyError):
+        record['sender']
+
+
+def test_as_dict_and_equality(make_record):
+    record = make_record(1, 25000.0)
+    assert record.as_dict() == {
+        'from': 'Shop <noreply@example.com>', 'subject': 'Receipt 1', 'date': '2024-10-12 09:40:00',
+        'email_id': '<r1@example.com>', 'raw': 'text', 'total_amount': 25000.0, 'currency': None,
+        'merchant': None, 'transaction_date': None, 'reference_id': None,
+    }
+    other = make_record(1, 25000.0)
+    other.body = 'not exported'
+    assert record == other
+    assert record != make_record(1, 1.0)
+    assert record != record.as_dict()
+
+
+def test_fallback_id_is_the_same_in_every_process():
+    # hash() changes with PYTHONHASHSEED; the fallback id must not
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ids = set()
+    for seed in ('1', '2'):
+        result = subprocess.run(
+            [sys.executable, '-c', FALLBACK_ID_SCRIPT], input=RAW_WITHOUT_ID, capture_output=True, check=True,
+            cwd=repo, env={**os.environ, 'PYTHONHASHSEED': seed},
+        )
+        ids.add(result.stdout.decode().strip())
+    assert len(ids) == 1
+    assert ids.pop().startswith('no-id-')
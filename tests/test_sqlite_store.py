@@ -0,0 +1,61 @@
+import sqlite3
+from email.message import Message
+
+from main import process_emails_batch
+from src.email.parser import EmailParser
+from src.parser.receipt_parser import ReceiptParser
+from src.storage.sqlite_store import SQLiteStore
+
+
+def stored_amounts(path):
+    with sqlite3.connect(path) as connection:
+        return dict(connection.execute('SELECT message_id, amount FROM receipts'))
+
+
+class RecordingFetcher:
+    """Serves raw emails by id and remembers which ids were fetched."""
+
+    def __init__(self):
+        self.missing_ids = []
+        self.requested = []
+
+    def fetch_messages(self, mail, email_ids):
+        for email_id in email_ids:
+            self.requested.append(email_id)
+            yield email_id, (f'From: Shop <noreply@example.com>\r\nSubject: Receipt {email_id}\r\n'
+                             f'Message-ID: <r{email_id}@example.com>\r\n\r\nTotal Rp {email_id}.000\r\n').encode()
+
+
+def test_stored_message_ids_are_ignored_unless_replacing(tmp_path, make_record):
+    store = SQLiteStore(str(tmp_path / 'receipts.db'))
+    try:
+        store.save_records([make_record(1), make_record(2)])
+        store.save_records([make_record(2, 5.0), make_record(3)])
+        assert store.stored_message_ids(['<r1@example.com>', '<r9@example.com>', None]) == {'<r1@example.com>'}
+        assert stored_amounts(store.filename) == {
+            '<r1@example.com>': 1.0, '<r2@example.com>': 1.0, '<r3@example.com>': 1.0
+        }
+        store.save_records([make_record(2, 5.0)], replace=True)
+        assert stored_amounts(store.filename)['<r2@example.com>'] == 5.0
+    finally:
+        store.close()
+
+
+def test_stored_emails_are_skipped_before_fetching(tmp_path, make_record):
+    store = SQLiteStore(str(tmp_path / 'receipts.db'))
+    store.save_records([make_record(2)])
+    headers = {}
+    for email_id in (1, 2, 3):
+        headers[email_id] = Message()
+        headers[email_id]['From'] = 'Shop <noreply@example.com>'
+        headers[email_id]['Subject'] = f'Receipt {email_id}'
+        headers[email_id]['Message-ID'] = f'<r{email_id}@example.com>'
+    fetcher = RecordingFetcher()
+    try:
+        records = process_emails_batch(
+            None, [1, 2, 3], EmailParser(), ReceiptParser(), headers=headers, fetcher=fetcher, store=store
+        )
+    finally:
+        store.close()
+    assert fetcher.requested == [1, 3]
+    assert [r.email_id for r in records] == ['<r1@example.com>', '<r3@example.com>']
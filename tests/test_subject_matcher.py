@@ -0,0 +1,25 @@
+import pytest
+
+from src.email.subject_matcher import SubjectMatcher
+
+
+@pytest.mark.parametrize('patterns, subject, expected', [
+    (['.*pembayaran.*', '.*receipt.*'], 'Your Receipt from GoPay', '.*receipt.*'),
+    # The same group name in two patterns
+    ([r'(?P<id>inv)\d+', r'(?P<id>ref)\d+'], 'Payment ref42', r'(?P<id>ref)\d+'),
+    # A group name the matcher uses for another pattern
+    (['.*tagihan.*', r'(?P<p0>struk)'], 'Struk belanja', r'(?P<p0>struk)'),
+    ([r'(?P<p1>inv)(?P<n>\d+)', '.*transaksi.*'], 'Transaksi berhasil', '.*transaksi.*'),
+    ([r'(?P<p1>inv)(?P<n>\d+)', '.*transaksi.*'], 'INV123', r'(?P<p1>inv)(?P<n>\d+)'),
+    # Numbered backreference and global inline flag
+    ([r'(\w+) \1', '(?s)bukti.*bayar'], 'Bukti\nbayar', '(?s)bukti.*bayar'),
+    ([r'(\w+) \1'], 'paid paid', r'(\w+) \1'),
+])
+def test_match_reports_the_pattern(patterns, subject, expected):
+    assert SubjectMatcher(patterns).match(subject) == expected
+
+
+def test_invalid_pattern_is_skipped():
+    matcher = SubjectMatcher(['(unclosed', '.*receipt.*'])
+    assert matcher.match('receipt') == '.*receipt.*'
+    assert matcher.match('(unclosed') is None
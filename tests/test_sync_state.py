@@ -0,0 +1,112 @@
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_imap import FakeIMAPServer, parse_sequence_set
+from main import save_sync_progress
+from src.email.connector import EmailConnector
+from src.email.fetcher import compress_sequence_set
+from src.email.filter import EmailFilter
+from src.storage.sync_state import SyncStateStore
+
+ACCOUNT = 'me@example.com'
+
+class HeaderFaults:
+    """Wraps a connection so the header prefetch fails or skips some UIDs."""
+
+    def __init__(self, mail, skip=(), error=None):
+        self._mail = mail
+        self.skip = {int(uid) for uid in skip}
+        self.error = error
+
+    def __getattr__(self, name):
+        return getattr(self._mail, name)
+
+    def uid(self, command, *args):
+        if command.upper() == 'FETCH' and 'HEADER.FIELDS' in args[-1]:
+            if self.error is not None:
+                raise self.error
+            wanted = parse_sequence_set(args[0], 10 ** 6) - self.skip
+            if not wanted:
+                return 'OK', [None]
+            args = (compress_sequence_set(wanted),) + args[1:]
+        return self._mail.uid(command, *args)
+
+
+@pytest.fixture
+def mail():
+    messages, _ = generate_corpus(20, noise_ratio=0, attachment_kb=1)
+    with FakeIMAPServer(messages) as server:
+        connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+        connector.connect(ACCOUNT, 'secret')
+        yield connector.get_connection()
+        connector.disconnect()
+
+
+@pytest.fixture
+def sync(tmp_path, filter_config):
+    def run(mail, max_emails=1000, missing_ids=()):
+        """One filter pass from the saved state; returns (filtered ids, state saved afterwards)."""
+        store = SyncStateStore(str(tmp_path / 'sync_state.json'))
+        state = store.get(ACCOUNT) or {}
+        email_filter = EmailFilter(filter_config)
+        emails = email_filter.get_filtered_emails(
+            mail, max_emails, state.get('last_uid'), state.get('uidvalidity')
+        )
+        save_sync_progress(store, ACCOUNT, email_filter, missing_ids)
+        return emails, SyncStateStore(store.filename).get(ACCOUNT)
+    return run
+
+
+def test_clean_run_saves_highest_uid(mail, sync):
+    emails, state = sync(mail)
+    assert len(emails) == 20
+    assert state == {'uidvalidity': 1, 'last_uid': 20}
+
+
+def test_header_fetch_error_saves_no_progress(mail, sync):
+    emails, state = sync(HeaderFaults(mail, error=OSError('connection reset')))
+    assert emails == []
+    assert state is None
+
+
+def save_state(tmp_path, last_uid):
+    store = SyncStateStore(str(tmp_path / 'sync_state.json'))
+    store.update(ACCOUNT, 'INBOX', 1, last_uid)
+    store.save()
+
+
+def test_header_fetch_error_keeps_earlier_progress(mail, sync, tmp_path):
+    save_state(tmp_path, 5)
+    _, state = sync(HeaderFaults(mail, error=OSError('connection reset')))
+    assert state['last_uid'] == 5
+
+
+def test_emails_without_headers_are_held_back(mail, sync):
+    emails, state = sync(HeaderFaults(mail, skip=(8, 12)))
+    assert b'8' not in emails and b'12' not in emails
+    assert state['last_uid'] == 7
+    # The next run picks the skipped emails up again
+    emails, state = sync(mail)
+    assert [int(uid) for uid in emails] == list(range(8, 21))
+    assert state['last_uid'] == 20
+
+
+def test_first_run_max_emails_keeps_the_newest(mail, sync):
+    emails, state = sync(mail, max_emails=6)
+    assert [int(uid) for uid in emails] == list(range(15, 21))
+    assert state['last_uid'] == 20
+
+
+def test_max_emails_works_through_backlog(mail, sync, tmp_path):
+    save_state(tmp_path, 2)
+    seen = []
+    for _ in range(4):
+        emails, state = sync(mail, max_emails=6)
+        seen.extend(int(uid) for uid in emails)
+    assert seen == list(range(3, 21))
+    assert state['last_uid'] == 20
+
+
+def test_failed_body_fetch_is_retried(mail, sync):
+    _, state = sync(mail, missing_ids=[b'14', b'17'])
+    assert state['last_uid'] == 13
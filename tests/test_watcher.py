@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_imap import FakeIMAPServer
+from src.email.connector import EmailConnector
+from src.email.watcher import MailboxWatcher
+
+
+@pytest.fixture
+def server():
+    messages, _ = generate_corpus(3, noise_ratio=0, attachment_kb=1)
+    with FakeIMAPServer(messages[:1], capabilities=('IMAP4rev1', 'IDLE')) as server:
+        server.pending = messages[1:]
+        yield server
+
+
+@pytest.fixture
+def connector(server):
+    connector = EmailConnector('127.0.0.1', server.port, use_ssl=False)
+    connector.connect('me@example.com', 'secret')
+    yield connector
+    connector.disconnect()
+
+
+def watch(connector, on_new_mail, **kwargs):
+    """Run a MailboxWatcher in the background; returns (watcher, thread, errors raised by run())."""
+    watcher = MailboxWatcher(connector, initial_backoff=0.1, **kwargs)
+    errors = []
+
+    def run():
+        try:
+            watcher.run(on_new_mail, connector.get_connection())
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return watcher, thread, errors
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+@pytest.mark.parametrize('capabilities', [('IMAP4rev1', 'IDLE'), ('IMAP4rev1',)])
+def test_mail_arriving_during_sync_is_picked_up(server, connector, capabilities):
+    counts = []
+
+    def on_new_mail(mail):
+        _, data = mail.select('INBOX')
+        counts.append(int(data[0]))
+        if len(counts) == 1:
+            # Arrives mid-sync; the server reports it in the response to the next command
+            server.deliver(server.pending[0])
+            mail.uid('SEARCH', None, 'ALL')
+
+    connector.get_connection().capabilities = capabilities
+    watcher, thread, errors = watch(connector, on_new_mail, idle_timeout=60, poll_interval=60)
+    try:
+        assert wait_until(lambda: len(counts) >= 2)
+        assert counts[:2] == [1, 2]
+    finally:
+        watcher.stop()
+        thread.join(5)
+    assert not errors
+
+
+def test_dropped_connection_reconnects(server, connector):
+    counts = []
+
+    def on_new_mail(mail):
+        _, data = mail.select('INBOX')
+        counts.append(int(data[0]))
+
+    watcher, thread, errors = watch(connector, on_new_mail, idle_timeout=60)
+    try:
+        assert wait_until(lambda: server.idle_sessions)
+        server.drop_connections()
+        assert wait_until(lambda: watcher.reconnects == 1 and len(counts) == 2)
+    finally:
+        watcher.stop()
+        thread.join(5)
+    assert not errors
+
+
+def test_export_error_is_not_retried_as_a_reconnect(server, connector):
+    def on_new_mail(mail):
+        mail.select('INBOX')
+        raise OSError(28, 'No space left on device')
+
+    watcher, thread, errors = watch(connector, on_new_mail, idle_timeout=60)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert watcher.reconnects == 0
+    assert len(errors) == 1 and errors[0].errno == 28